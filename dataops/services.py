@@ -3,8 +3,11 @@ from pathlib import Path
 import pandas as pd
 import yaml
 from django.conf import settings
+from knowella.db import write_lane
 from .models import DataRecord
 
+DB_LOAD_BATCH_SIZE = 1000
+
 def load_config(path_or_str):
     if os.path.exists(path_or_str):
         with open(path_or_str, "r", encoding="utf-8") as f:
@@ -55,8 +58,8 @@ def write_output(df, dest, run=None):
     if dest["type"] == "db":
         if run is None:
             raise ValueError("run required for db output")
-        for _, row in df.iterrows():
-            DataRecord.objects.create(run=run, data=row.to_dict())
+        records = [DataRecord(run=run, data=row.to_dict()) for _, row in df.iterrows()]
+        write_lane.run(DataRecord.objects.bulk_create, records, batch_size=DB_LOAD_BATCH_SIZE)
         return "db"
 
     raise ValueError("Unsupported destination")
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Category, HotPost, Post, Topic
+from .models import Category, HotPost, Post, RankingLease, RankingRun, Topic
 
 
 @admin.register(Category)
@@ -34,7 +34,26 @@ class PostAdmin(admin.ModelAdmin):
 
 @admin.register(HotPost)
 class HotPostAdmin(admin.ModelAdmin):
-    list_display = ("category", "rank", "post", "score", "computed_at")
+    list_display = ("generation", "category", "rank", "post", "score", "computed_at")
     list_filter = ("category", "computed_at")
 
+
+@admin.register(RankingRun)
+class RankingRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "started_at",
+        "mode",
+        "scoring",
+        "posts_scored",
+        "hot_rows_written",
+        "duration_ms",
+        "published_at",
+    )
+    list_filter = ("mode", "scoring")
+
+
+@admin.register(RankingLease)
+class RankingLeaseAdmin(admin.ModelAdmin):
+    list_display = ("name", "holder", "acquired_at", "expires_at")
+
 # Register your models here.
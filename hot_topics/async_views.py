@@ -0,0 +1,101 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+
+from .engagement import engagement_buffer, engagement_limiter
+from .models import Category, Topic
+from .search import alatest_page, search_cache, search_page
+from .services import (
+    acached_live_generation,
+    ageneration_available,
+    ahot_page,
+    ahot_payload,
+    alive_generation,
+    aremember_live_generation,
+    atrending_page,
+)
+from .views import (
+    _cursor_expired,
+    _hot_list_json,
+    _hot_list_params,
+    _payload_response,
+    _plain_first_page,
+    _search_json,
+    _search_params,
+)
+
+# Async versions of the read-only JSON endpoints, routed when ASYNC_API_VIEWS
+# is on. Request parsing and rendering come from views; only data access is
+# async. FTS search is raw SQL, which has no async API, so it goes through
+# sync_to_async.
+
+
+async def _precomputed_response(request, key):
+    if not _plain_first_page(request):
+        return None
+    generation = await acached_live_generation()
+    if generation is None:
+        generation = await alive_generation()
+        await aremember_live_generation(generation)
+    if generation is None:
+        return None
+    entry = await ahot_payload(generation, key)
+    if entry is None:
+        return None
+    return _payload_response(request, entry)
+
+
+async def _hot_list_response(request, scope="global", scope_object=None):
+    try:
+        horizon, kind, limit, generation, after_rank = _hot_list_params(request, scope)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if generation is None:
+        generation = await alive_generation()
+    elif not await ageneration_available(generation):
+        return _cursor_expired()
+
+    scope_id = scope_object.id if scope_object is not None else None
+    if horizon:
+        rows, more = await atrending_page(horizon, scope, scope_id, limit, after_rank, generation)
+    else:
+        rows, more = await ahot_page(scope_id, limit, after_rank, generation)
+    return _hot_list_json(generation, horizon, kind, rows, more, scope, scope_object)
+
+
+async def api_hot_landing(request):
+    return await _precomputed_response(request, "landing") or await _hot_list_response(request)
+
+
+async def api_category_hot(request, slug):
+    response = await _precomputed_response(request, f"category:{slug}")
+    if response is not None:
+        return response
+    category = await aget_object_or_404(Category, slug=slug)
+    return await _hot_list_response(request, "category", category)
+
+
+async def api_topic_hot(request, slug):
+    topic = await aget_object_or_404(Topic, slug=slug)
+    return await _hot_list_response(request, "topic", topic)
+
+
+async def api_category_search(request, slug):
+    category = await aget_object_or_404(Category, slug=slug)
+    try:
+        q, kind, limit, after = _search_params(request)
+        if q:
+            results, position = await sync_to_async(search_page)(category, q, limit, after)
+        else:
+            results, position = await alatest_page(category, limit, after)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return _search_json(category, q, kind, results, position)
+
+
+async def api_search_cache_stats(request):
+    return JsonResponse(search_cache.stats())
+
+
+async def api_engagement_stats(request):
+    return JsonResponse({**engagement_buffer.stats(), "rate_limit": engagement_limiter.stats()})
@@ -0,0 +1,234 @@
+import atexit
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from knowella.db import write_lane
+
+from .models import Post
+
+# Event type -> Post counter column, in the order deltas are kept.
+ENGAGEMENT_FIELDS = {"like": "likes", "comment": "comments", "share": "shares", "view": "views"}
+ENGAGEMENT_FLUSH_SECONDS = 2.0
+ENGAGEMENT_MAX_PENDING_POSTS = 10000
+# Ids per UPDATE; stays under SQLite's bound-parameter limit.
+FLUSH_IDS_PER_UPDATE = 500
+# Per-client limit on accepted engagement (summed event counts).
+ENGAGEMENT_RATE_PER_SECOND = 1000.0
+ENGAGEMENT_BURST = 20000
+
+_COLUMNS = list(ENGAGEMENT_FIELDS.values())
+_COLUMN_INDEX = {event_type: idx for idx, event_type in enumerate(ENGAGEMENT_FIELDS)}
+
+
+def _apply_deltas(pending, now):
+    """Add ``pending`` ({post_id: [likes, comments, shares, views]}) in one transaction.
+
+    Posts with identical deltas (most often a single view) share one UPDATE.
+    updated_at is set explicitly, since update() skips auto_now, so the next
+    incremental ranking pass rescores these posts.
+    """
+    groups = defaultdict(list)
+    for post_id, deltas in pending.items():
+        groups[tuple(deltas)].append(post_id)
+    statements = 0
+    with transaction.atomic():
+        for deltas, post_ids in groups.items():
+            changes = {
+                column: F(column) + delta for column, delta in zip(_COLUMNS, deltas) if delta
+            }
+            changes["updated_at"] = now
+            for start in range(0, len(post_ids), FLUSH_IDS_PER_UPDATE):
+                Post.objects.filter(id__in=post_ids[start : start + FLUSH_IDS_PER_UPDATE]).update(
+                    **changes
+                )
+                statements += 1
+    return statements
+
+
+class EngagementBuffer:
+    """Per-process counter deltas, written to Post in periodic batches.
+
+    Request threads only add to an in-memory dict. A background thread swaps
+    the dict out every ``flush_seconds`` (or as soon as ``max_pending`` posts
+    have deltas) and writes it through the write lane as batched F()
+    increments in one transaction. A failed flush merges its deltas back for
+    the next attempt. Deltas are also flushed at interpreter exit.
+
+    Loss is bounded: a crash or kill -9 drops only the deltas accepted since
+    the last flush, i.e. at most ``flush_seconds`` of events (or
+    ``max_pending`` posts' worth) per process. Nothing is ever counted twice.
+    Events for unknown post ids are dropped silently at flush time.
+    """
+
+    def __init__(
+        self, flush_seconds=ENGAGEMENT_FLUSH_SECONDS, max_pending=ENGAGEMENT_MAX_PENDING_POSTS
+    ):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats = {
+            "events": 0,
+            "flushes": 0,
+            "posts_flushed": 0,
+            "update_statements": 0,
+            "failed_flushes": 0,
+            "last_flush_ms": 0.0,
+            "last_error": "",
+        }
+
+    def _ensure_flusher(self):
+        # After a fork the thread object is copied but the thread is gone.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                with self._lock:
+                    self._pending = {}
+                self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="engagement-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def add(self, events):
+        """Buffer ``events``: (post_id, event_type, count) tuples, already validated."""
+        self._ensure_flusher()
+        with self._lock:
+            for post_id, event_type, count in events:
+                deltas = self._pending.get(post_id)
+                if deltas is None:
+                    deltas = self._pending[post_id] = [0] * len(_COLUMNS)
+                deltas[_COLUMN_INDEX[event_type]] += count
+                self._stats["events"] += 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def pending_posts(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Write all pending deltas now; returns the number of posts written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            start = time.perf_counter()
+            try:
+                statements = write_lane.run(_apply_deltas, pending, timezone.now())
+            except Exception as exc:
+                with self._lock:
+                    for post_id, deltas in pending.items():
+                        current = self._pending.get(post_id)
+                        if current is None:
+                            self._pending[post_id] = deltas
+                        else:
+                            for idx, delta in enumerate(deltas):
+                                current[idx] += delta
+                    self._stats["failed_flushes"] += 1
+                    self._stats["last_error"] = f"{type(exc).__name__}: {exc}"
+                raise
+            with self._lock:
+                self._stats["flushes"] += 1
+                self._stats["posts_flushed"] += len(pending)
+                self._stats["update_statements"] += statements
+                self._stats["last_flush_ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+            return len(pending)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "pending_posts": len(self._pending),
+                "flush_seconds": self.flush_seconds,
+                "max_pending_posts": self.max_pending,
+            }
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Counted in stats; the deltas are retried on the next tick.
+                pass
+
+    def close(self):
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+
+class ClientRateLimiter:
+    """Token bucket per client: ``rate`` units per second, at most ``burst`` at once.
+
+    Buckets live in process memory, so with several workers each one allows
+    the full rate.
+    """
+
+    def __init__(self, rate=ENGAGEMENT_RATE_PER_SECOND, burst=ENGAGEMENT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    def take(self, client_id, cost, now=None):
+        """Take ``cost`` units; returns 0.0, or the seconds to wait when they do not fit.
+
+        Nothing is taken from a rejected request. A cost above ``burst`` never
+        fits and returns math.inf.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(client_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if cost <= tokens:
+                self._buckets[client_id] = (tokens - cost, now)
+                return 0.0
+            self._buckets[client_id] = (tokens, now)
+            self._rejected += 1
+            if cost > self.burst:
+                return math.inf
+            return (cost - tokens) / self.rate
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "clients": len(self._buckets),
+                "rejected": self._rejected,
+            }
+
+
+engagement_buffer = EngagementBuffer(
+    getattr(settings, "HOT_TOPICS_ENGAGEMENT_FLUSH_SECONDS", ENGAGEMENT_FLUSH_SECONDS),
+    getattr(settings, "HOT_TOPICS_ENGAGEMENT_MAX_PENDING_POSTS", ENGAGEMENT_MAX_PENDING_POSTS),
+)
+atexit.register(engagement_buffer.close)
+engagement_limiter = ClientRateLimiter(
+    getattr(settings, "HOT_TOPICS_ENGAGEMENT_RATE_PER_SECOND", ENGAGEMENT_RATE_PER_SECOND),
+    getattr(settings, "HOT_TOPICS_ENGAGEMENT_BURST", ENGAGEMENT_BURST),
+)
@@ -0,0 +1,234 @@
+import asyncio
+import importlib
+import json
+import secrets
+import threading
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import clear_url_caches, resolve
+from django.utils import timezone
+
+from hot_topics.models import Category, Topic
+from knowella.asgi_buffer import (
+    ASGI_MAX_ACTIVE_REQUESTS,
+    ASGI_RESPONSE_BUFFER_BYTES,
+    ResponseBuffer,
+)
+from knowella.db import sqlite_profile
+from telemetry.models import AppClient
+
+BENCH_CLIENT_NAME = "bench-async-views"
+URL_MODULES = ("hot_topics.urls", "telemetry.urls", settings.ROOT_URLCONF)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(int(round(pct / 100.0 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[idx]
+
+
+def _latency_report(latencies_ms):
+    values = sorted(latencies_ms)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(_percentile(values, 50), 3),
+        "p95_ms": round(_percentile(values, 95), 3),
+        "p99_ms": round(_percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+    }
+
+
+def _route_views():
+    # URL modules pick sync or async views when imported.
+    for name in URL_MODULES:
+        importlib.reload(importlib.import_module(name))
+    clear_url_caches()
+
+
+async def _request(app, url, headers, client_delay):
+    """One GET through the ASGI app; the client reads each body chunk slowly.
+
+    Returns (status, ms until the response started, ms until the last byte).
+    """
+    parts = urlsplit(url)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode("ascii"),
+        "query_string": parts.query.encode("ascii"),
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), *headers],
+        "client": ("127.0.0.1", 40000),
+        "server": ("localhost", 80),
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client stays connected until the response is done.
+        await asyncio.Event().wait()
+
+    started = time.perf_counter()
+    result = {}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["first_ms"] = (time.perf_counter() - started) * 1000.0
+        elif message["type"] == "http.response.body" and client_delay:
+            await asyncio.sleep(client_delay)
+
+    await app(scope, receive, send)
+    return result["status"], result["first_ms"], (time.perf_counter() - started) * 1000.0
+
+
+class Command(BaseCommand):
+    help = "Compare sync and async API views under ASGI with many slow clients"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--views",
+            default="sync,async",
+            help="Comma-separated view modes to run: sync, async",
+        )
+        parser.add_argument("--requests", type=int, default=5000, help="Requests per mode")
+        parser.add_argument(
+            "--concurrency", type=int, default=1000, help="Connections open at once"
+        )
+        parser.add_argument(
+            "--client-delay-ms",
+            type=float,
+            default=200.0,
+            help="Time each client takes to read a response chunk (slow clients)",
+        )
+        parser.add_argument(
+            "--max-active",
+            type=int,
+            default=getattr(settings, "ASGI_MAX_ACTIVE_REQUESTS", ASGI_MAX_ACTIVE_REQUESTS),
+            help="Requests let into Django at once by the response buffer",
+        )
+        parser.add_argument(
+            "--no-buffer",
+            action="store_true",
+            help="Run the bare Django ASGI app, without knowella.asgi's response buffer",
+        )
+        parser.add_argument("--output", default="", help="Write the JSON report to this path")
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options["views"].split(",") if mode.strip()]
+        if not modes or any(mode not in ("sync", "async") for mode in modes):
+            raise CommandError("views must be a comma-separated list of sync, async")
+        if min(options["requests"], options["concurrency"], options["max_active"]) < 1:
+            raise CommandError("requests, concurrency and max-active must be >= 1")
+        if options["client_delay_ms"] < 0:
+            raise CommandError("client-delay-ms must be >= 0")
+        category = Category.objects.order_by("id").first()
+        topic = Topic.objects.order_by("id").first()
+        if category is None or topic is None:
+            raise CommandError("No categories found. Run seed_hot_topics first.")
+        client, _ = AppClient.objects.get_or_create(
+            name=BENCH_CLIENT_NAME,
+            defaults={"api_key": secrets.token_hex(16), "secret": secrets.token_hex(32)},
+        )
+        api_key = [(b"x-api-key", client.api_key.encode("ascii"))]
+        urls = [
+            ("/api/hot-topics/", []),
+            (f"/api/category/{category.slug}/hot/", []),
+            (f"/api/topic/{topic.slug}/hot/", []),
+            (f"/api/category/{category.slug}/search/?q=market", []),
+            (f"/api/category/{category.slug}/search/", []),
+            ("/telemetry/health/?minutes=60", api_key),
+            ("/telemetry/alerts/", api_key),
+        ]
+
+        results = {}
+        try:
+            for mode in modes:
+                with override_settings(ASYNC_API_VIEWS=mode == "async"):
+                    _route_views()
+                    app = get_asgi_application()
+                    if not options["no_buffer"]:
+                        max_bytes = getattr(
+                            settings, "ASGI_RESPONSE_BUFFER_BYTES", ASGI_RESPONSE_BUFFER_BYTES
+                        )
+                        app = ResponseBuffer(app, max_bytes, options["max_active"])
+                    routed_async = iscoroutinefunction(resolve("/api/hot-topics/").func)
+                    report = asyncio.run(self._load(app, urls, options))
+                    results[mode] = {"async_views_routed": routed_async, **report}
+        finally:
+            _route_views()
+
+        report = {
+            "generated_at": timezone.now().isoformat(),
+            "config": {
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "client_delay_ms": options["client_delay_ms"],
+                "response_buffer": not options["no_buffer"],
+                "max_active": None if options["no_buffer"] else options["max_active"],
+                "paths": [url for url, _ in urls],
+            },
+            "database": sqlite_profile(),
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        self.stdout.write(output)
+
+    async def _load(self, app, urls, options):
+        client_delay = options["client_delay_ms"] / 1000.0
+        for url, headers in urls:
+            await _request(app, url, headers, 0)
+
+        statuses = {}
+        first_ms, total_ms = [], []
+        peak = {"threads": threading.active_count()}
+        threads_before = peak["threads"]
+
+        async def sample_threads():
+            while True:
+                peak["threads"] = max(peak["threads"], threading.active_count())
+                await asyncio.sleep(0.005)
+
+        async def worker(indexes):
+            for index in indexes:
+                url, headers = urls[index % len(urls)]
+                status, first, total = await _request(app, url, headers, client_delay)
+                statuses[status] = statuses.get(status, 0) + 1
+                first_ms.append(first)
+                total_ms.append(total)
+
+        workers = options["concurrency"]
+        count = options["requests"]
+        sampler = asyncio.create_task(sample_threads())
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(range(w, count, workers)) for w in range(workers)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "requests_per_s": round(count / elapsed, 1) if elapsed else 0.0,
+            "statuses": {str(k): v for k, v in sorted(statuses.items())},
+            "response_start": _latency_report(first_ms),
+            "complete": _latency_report(total_ms),
+            "threads_before": threads_before,
+            "peak_threads": peak["threads"],
+        }
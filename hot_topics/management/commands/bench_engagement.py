@@ -0,0 +1,183 @@
+import json
+import math
+import random
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import F, Sum
+from django.test import Client
+from django.utils import timezone
+
+from hot_topics.engagement import ENGAGEMENT_FIELDS, engagement_buffer, engagement_limiter
+from hot_topics.models import Post
+from knowella.db import sqlite_profile, write_lane
+from telemetry.models import AppClient
+from telemetry.services import sign_payload
+
+# Share of each event type in generated traffic; views dominate.
+EVENT_MIX = (("view", 0.9), ("like", 0.07), ("comment", 0.02), ("share", 0.01))
+BENCH_CLIENT_NAME = "bench-engagement"
+
+
+def _totals(post_ids):
+    return Post.objects.filter(id__in=post_ids).aggregate(
+        **{column: Sum(column) for column in ENGAGEMENT_FIELDS.values()}
+    )
+
+
+class Command(BaseCommand):
+    help = "Measure engagement ingest throughput (buffered vs one UPDATE per event)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=20000, help="Total events to send")
+        parser.add_argument("--batch", type=int, default=1, help="Events per request")
+        parser.add_argument("--concurrency", type=int, default=8, help="Worker threads")
+        parser.add_argument("--posts", type=int, default=500, help="Distinct posts targeted")
+        parser.add_argument(
+            "--mode",
+            choices=["endpoint", "buffer", "direct"],
+            default="endpoint",
+            help=(
+                "endpoint: POST /api/engagement/ in-process; buffer: add to the buffer "
+                "without HTTP; direct: one F() UPDATE per event without HTTP (the naive baseline)"
+            ),
+        )
+        parser.add_argument(
+            "--rate-limit",
+            action="store_true",
+            help="Keep the per-client rate limit in endpoint mode (lifted by default)",
+        )
+        parser.add_argument("--seed", type=int, default=None, help="Random seed")
+        parser.add_argument("--output", default="", help="Write the JSON report to this path")
+
+    def handle(self, *args, **options):
+        if min(options["events"], options["batch"], options["concurrency"], options["posts"]) < 1:
+            raise CommandError("events, batch, concurrency and posts must be >= 1")
+        post_ids = list(
+            Post.objects.filter(is_active=True).order_by("?").values_list("id", flat=True)[
+                : options["posts"]
+            ]
+        )
+        if not post_ids:
+            raise CommandError("No posts found. Run seed_hot_topics first.")
+
+        rng = random.Random(options["seed"])
+        types, weights = zip(*EVENT_MIX)
+        events = [
+            {"post_id": rng.choice(post_ids), "type": event_type}
+            for event_type in rng.choices(types, weights, k=options["events"])
+        ]
+        batch = options["batch"]
+        requests = [
+            # The nonce keeps identical batches from looking like replays.
+            json.dumps({"events": events[i : i + batch], "nonce": i})
+            for i in range(0, len(events), batch)
+        ]
+        expected = {column: 0 for column in ENGAGEMENT_FIELDS.values()}
+        for event in events:
+            expected[ENGAGEMENT_FIELDS[event["type"]]] += 1
+
+        engagement_buffer.flush()
+        before = _totals(post_ids)
+        mode = options["mode"]
+        local = threading.local()
+        lock = threading.Lock()
+        statuses = {}
+
+        app, _ = AppClient.objects.get_or_create(
+            name=BENCH_CLIENT_NAME,
+            defaults={"api_key": secrets.token_hex(16), "secret": secrets.token_hex(32)},
+        )
+        limits = engagement_limiter.rate, engagement_limiter.burst
+        if mode == "endpoint" and not options["rate_limit"]:
+            engagement_limiter.rate = engagement_limiter.burst = math.inf
+
+        def send(body):
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = Client(HTTP_HOST="localhost")
+            timestamp = int(time.time())
+            raw = body.encode("utf-8")
+            status = client.post(
+                "/api/engagement/",
+                data=raw,
+                content_type="application/json",
+                headers={
+                    "X-API-Key": app.api_key,
+                    "X-Timestamp": str(timestamp),
+                    "X-Signature": sign_payload(app.secret, timestamp, raw),
+                },
+            ).status_code
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+        def buffer(body):
+            engagement_buffer.add(
+                (event["post_id"], event["type"], 1) for event in json.loads(body)["events"]
+            )
+
+        def update(body):
+            now = timezone.now()
+            for event in json.loads(body)["events"]:
+                column = ENGAGEMENT_FIELDS[event["type"]]
+                Post.objects.filter(id=event["post_id"]).update(
+                    **{column: F(column) + 1, "updated_at": now}
+                )
+
+        run_one = {"endpoint": send, "buffer": buffer, "direct": update}[mode]
+        workers = options["concurrency"]
+
+        def run_all(indexes):
+            try:
+                for index in indexes:
+                    run_one(requests[index])
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(run_all, [range(w, len(requests), workers) for w in range(workers)]))
+        finally:
+            engagement_limiter.rate, engagement_limiter.burst = limits
+        accepted_s = time.perf_counter() - started
+        flush_started = time.perf_counter()
+        engagement_buffer.flush()
+        final_flush_s = time.perf_counter() - flush_started
+        total_s = time.perf_counter() - started
+
+        after = _totals(post_ids)
+        applied = {column: (after[column] or 0) - (before[column] or 0) for column in expected}
+        report = {
+            "generated_at": timezone.now().isoformat(),
+            "config": {
+                "mode": mode,
+                "events": len(events),
+                "batch": batch,
+                "requests": len(requests),
+                "concurrency": workers,
+                "posts": len(post_ids),
+                "seed": options["seed"],
+                "rate_limit": mode == "endpoint" and options["rate_limit"],
+            },
+            "database": {**sqlite_profile(), "write_lane_stats": write_lane.stats()},
+            "accept_s": round(accepted_s, 3),
+            "final_flush_s": round(final_flush_s, 3),
+            "total_s": round(total_s, 3),
+            "events_per_s": round(len(events) / total_s, 1) if total_s else 0.0,
+            "statuses": {str(k): v for k, v in sorted(statuses.items())},
+            "buffer": engagement_buffer.stats(),
+            "counters_match": applied == expected,
+            "applied": applied,
+        }
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        self.stdout.write(output)
@@ -0,0 +1,185 @@
+import json
+import random
+import resource
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from hot_topics.models import Category, Post, Topic
+from hot_topics.search import search_cache
+from hot_topics.seeding import VOCABULARY, ensure_taxonomy, seed_posts
+from hot_topics.services import rebuild_hot_posts, refresh_hot_posts, scoring_mode
+from knowella.db import sqlite_profile
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(int(round(pct / 100.0 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[idx]
+
+
+def _latency_report(latencies_ms):
+    values = sorted(latencies_ms)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(_percentile(values, 50), 3),
+        "p95_ms": round(_percentile(values, 95), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+    }
+
+
+def _run(fn):
+    """(result, elapsed ms, query count) of one call."""
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        result = fn()
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+    return result, elapsed_ms, len(queries)
+
+
+def _peak_memory_kb(fn):
+    # A separate traced call: tracing slows Python-heavy code down.
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / 1024.0, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def _max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Command(BaseCommand):
+    help = "Time ranking passes and the hot topics views at growing post counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="10000",
+            help="Comma-separated post counts, e.g. 10000,1000000,5000000",
+        )
+        parser.add_argument("--repeat", type=int, default=20, help="Warm requests per view")
+        parser.add_argument("--categories", type=int, default=10, help="Categories when topping up")
+        parser.add_argument(
+            "--topics-per-category",
+            type=int,
+            default=10,
+            help="Topics per category when topping up",
+        )
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for added posts")
+        parser.add_argument("--output", default="", help="Write the JSON report to this path")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options["sizes"].split(",") if size.strip())
+        except ValueError:
+            raise CommandError("sizes must be comma-separated integers") from None
+        if not sizes or min(sizes) < 1 or options["repeat"] < 1:
+            raise CommandError("sizes and repeat must be >= 1")
+
+        rng = random.Random(options["seed"])
+        topics = ensure_taxonomy(options["categories"], options["topics_per_category"])
+        results = []
+        for size in sizes:
+            existing = Post.objects.count()
+            seed_s = 0.0
+            if existing < size:
+                started = time.perf_counter()
+                seed_posts(topics, size - existing, rng)
+                seed_s = time.perf_counter() - started
+            self.stderr.write(f"Measuring at {max(existing, size)} posts")
+            results.append(
+                {
+                    "posts": Post.objects.count(),
+                    "seed_s": round(seed_s, 3),
+                    "ranking": self._ranking(),
+                    "views": self._views(options["repeat"], rng),
+                    "max_rss_kb": _max_rss_kb(),
+                }
+            )
+
+        report = {
+            "generated_at": timezone.now().isoformat(),
+            "config": {
+                "sizes": sizes,
+                "repeat": options["repeat"],
+                "categories": Category.objects.count(),
+                "topics": Topic.objects.count(),
+                "seed": options["seed"],
+                "scoring": scoring_mode(),
+            },
+            "database": sqlite_profile(),
+            "results": results,
+        }
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        self.stdout.write(output)
+
+    def _ranking(self):
+        report = {}
+        for name, fn in (("full", rebuild_hot_posts), ("incremental", refresh_hot_posts)):
+            summary, elapsed_ms, query_count = _run(fn)
+            report[name] = {
+                "ms": round(elapsed_ms, 1),
+                "queries": query_count,
+                "posts_scored": summary["posts_scored"],
+                "snapshots": summary["snapshots"],
+                "peak_memory_kb": _peak_memory_kb(fn),
+            }
+        return report
+
+    def _views(self, repeat, rng):
+        category = Category.objects.order_by("id").first()
+        topic = Topic.objects.filter(category=category).order_by("id").first()
+        words = rng.sample(VOCABULARY, min(repeat, len(VOCABULARY)))
+        paths = {
+            "home": lambda i: "/",
+            "category": lambda i: f"/category/{category.slug}/",
+            "category_search_partial": (
+                lambda i: f"/category/{category.slug}/search/?q={words[i % len(words)]}"
+            ),
+            "api_hot_landing": lambda i: "/api/hot-topics/",
+            "api_category_hot": lambda i: f"/api/category/{category.slug}/hot/",
+            "api_topic_hot": lambda i: f"/api/topic/{topic.slug}/hot/",
+            "api_category_search": (
+                lambda i: f"/api/category/{category.slug}/search/?q={words[i % len(words)]}"
+            ),
+            "api_category_latest": lambda i: f"/api/category/{category.slug}/search/",
+        }
+        client = Client(HTTP_HOST="localhost")
+        report = {}
+        for name, path in paths.items():
+            cache.clear()
+            search_cache.clear()
+            response, cold_ms, cold_queries = _run(lambda: client.get(path(0)))
+            if response.status_code != 200:
+                raise CommandError(f"{path(0)} returned {response.status_code}")
+            latencies, query_counts = [], []
+            for i in range(repeat):
+                _, elapsed_ms, query_count = _run(lambda: client.get(path(i)))
+                latencies.append(elapsed_ms)
+                query_counts.append(query_count)
+            report[name] = {
+                "path": path(0),
+                "cold_ms": round(cold_ms, 3),
+                "cold_queries": cold_queries,
+                "warm": _latency_report(latencies),
+                "warm_queries_max": max(query_counts),
+                "bytes": len(response.content),
+                "peak_memory_kb": _peak_memory_kb(lambda: client.get(path(0))),
+            }
+        return report
@@ -1,16 +1,35 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from hot_topics.services import rebuild_hot_posts
+from hot_topics.scheduler import lease_holder, run_ranking_pass
 
 
 class Command(BaseCommand):
     help = "Recompute global/category hot topic rankings"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help=(
+                "Rescore only changed and boundary posts "
+                "(falls back to a full rebuild on first run)"
+            ),
+        )
+
     def handle(self, *args, **options):
-        summary = rebuild_hot_posts()
+        summary = run_ranking_pass(
+            lease_holder(), full=not options["incremental"], skip_idle=False
+        )
+        if summary["status"] == "locked":
+            raise CommandError("Another ranking pass is running (lease held); try again later")
+        if summary["status"] == "lease_lost":
+            raise CommandError(
+                "The ranking lease was taken over during the pass; nothing was published"
+            )
         self.stdout.write(
             self.style.SUCCESS(
-                "Rebuilt hot topics. "
-                f"Global={summary['global_count']} CategoryEntries={summary['category_count']}"
+                f"Rebuilt hot topics ({summary['mode']}). "
+                f"Global={summary['global_count']} CategoryEntries={summary['category_count']} "
+                f"Scored={summary['posts_scored']} Duration={summary['duration_ms']:.0f}ms"
             )
         )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from hot_topics.search import fts_available, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of active posts"
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write("Full-text index is SQLite-only; search uses icontains here.")
+            return
+        indexed = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Reindexed search. Posts={indexed}"))
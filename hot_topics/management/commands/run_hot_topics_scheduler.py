@@ -0,0 +1,93 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from hot_topics.scheduler import (
+    RANKING_INTERVAL_SECONDS,
+    RANKING_JITTER,
+    RANKING_MAX_BACKOFF_SECONDS,
+    lease_holder,
+    run_ranking_pass,
+)
+
+
+class Command(BaseCommand):
+    help = "Recompute hot topic rankings on an interval (one pass at a time across hosts)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=RANKING_INTERVAL_SECONDS,
+            help="Seconds between passes",
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=RANKING_JITTER,
+            help="Random +/- fraction applied to each sleep, so hosts drift apart",
+        )
+        parser.add_argument(
+            "--full-every",
+            type=int,
+            default=30,
+            help="Run a full rebuild every N passes (0 = only incremental)",
+        )
+        parser.add_argument("--once", action="store_true", help="Run one pass and exit")
+
+    def handle(self, *args, **options):
+        if options["interval"] <= 0:
+            raise CommandError("interval must be > 0")
+        if not 0.0 <= options["jitter"] < 1.0:
+            raise CommandError("jitter must be between 0 and 1")
+        holder = lease_holder()
+        full_every = options["full_every"]
+        passes = 0
+        failures = 0
+        while True:
+            close_old_connections()
+            full = full_every > 0 and passes % full_every == 0
+            try:
+                result = run_ranking_pass(holder, full=full)
+            except Exception as exc:
+                # Transient errors (a locked database, a dropped connection)
+                # must not end the scheduler: drop the connection, back off
+                # and try again.
+                connection.close()
+                if options["once"]:
+                    raise CommandError(f"Ranking pass failed: {exc}") from exc
+                failures += 1
+                delay = min(options["interval"] * 2**failures, RANKING_MAX_BACKOFF_SECONDS)
+                self.stderr.write(
+                    self.style.ERROR(
+                        f"Ranking pass failed ({type(exc).__name__}: {exc}); "
+                        f"retrying in {delay:.0f}s"
+                    )
+                )
+                time.sleep(delay)
+                continue
+            failures = 0
+            if result["status"] == "ran":
+                passes += 1
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Ranked ({result['mode']}) generation={result['generation']} "
+                        f"Scored={result['posts_scored']} Duration={result['duration_ms']:.0f}ms"
+                    )
+                )
+            elif result["status"] == "lease_lost":
+                self.stderr.write(
+                    self.style.WARNING(
+                        "The ranking lease was taken over during this pass; nothing was published"
+                    )
+                )
+            elif result["status"] == "skipped":
+                self.stdout.write(f"Skipped: no changes since generation {result['generation']}")
+            else:
+                self.stdout.write("Skipped: another process holds the ranking lease")
+            if options["once"]:
+                return
+            jitter = options["jitter"]
+            time.sleep(options["interval"] * random.uniform(1.0 - jitter, 1.0 + jitter))
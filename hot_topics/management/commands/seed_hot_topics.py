@@ -1,9 +1,6 @@
-import random
+from django.core.management.base import BaseCommand, CommandError
 
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-
-from hot_topics.models import Category, Post, Topic
+from hot_topics.seeding import reset, seed
 
 
 class Command(BaseCommand):
@@ -15,53 +12,33 @@ class Command(BaseCommand):
             action="store_true",
             help="Delete existing hot topics data before seeding",
         )
+        parser.add_argument("--categories", type=int, default=3, help="Number of categories")
+        parser.add_argument(
+            "--topics-per-category", type=int, default=3, help="Topics in each category"
+        )
+        parser.add_argument("--posts", type=int, default=180, help="Posts to add in total")
+        parser.add_argument(
+            "--hours", type=float, default=72, help="Spread created_at over the last N hours"
+        )
+        parser.add_argument(
+            "--seed", type=int, default=None, help="Random seed (reproducible data)"
+        )
 
     def handle(self, *args, **options):
+        if options["categories"] < 1 or options["topics_per_category"] < 1:
+            raise CommandError("categories and topics-per-category must be >= 1")
+        if options["posts"] < 0 or options["hours"] <= 0:
+            raise CommandError("posts must be >= 0 and hours > 0")
         if options["reset"]:
-            Post.objects.all().delete()
-            Topic.objects.all().delete()
-            Category.objects.all().delete()
-
-        sample = {
-            "Technology": [
-                "AI Tools",
-                "Web Development",
-                "Cloud Infrastructure",
-            ],
-            "Sports": [
-                "Football Analysis",
-                "Cricket Trends",
-                "Basketball Strategy",
-            ],
-            "Finance": [
-                "Personal Finance",
-                "Stock Market",
-                "Startup Funding",
-            ],
-        }
-
-        post_count = 0
-        now = timezone.now()
-        for cat_name, topics in sample.items():
-            category, _ = Category.objects.get_or_create(name=cat_name)
-            for topic_name in topics:
-                topic, _ = Topic.objects.get_or_create(category=category, name=topic_name)
-                for i in range(1, 21):
-                    # Keep spread over recent hours so recency impacts score.
-                    created_at = now - timezone.timedelta(hours=random.randint(0, 72))
-                    post = Post.objects.create(
-                        topic=topic,
-                        title=f"{topic_name} post {i}",
-                        body=f"Discussion thread {i} about {topic_name}.",
-                        likes=random.randint(10, 1500),
-                        comments=random.randint(5, 500),
-                        shares=random.randint(1, 300),
-                        views=random.randint(100, 50000),
-                    )
-                    # Adjust created_at after create because auto_now_add sets it.
-                    Post.objects.filter(id=post.id).update(created_at=created_at)
-                    post_count += 1
-
+            reset()
+
+        post_count = seed(
+            categories=options["categories"],
+            topics_per_category=options["topics_per_category"],
+            posts=options["posts"],
+            seed_value=options["seed"],
+            hours=options["hours"],
+        )
         self.stdout.write(
             self.style.SUCCESS(f"Seeded categories/topics with {post_count} posts")
         )
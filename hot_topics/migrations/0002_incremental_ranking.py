@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hot_topics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('full', 'Full'), ('incremental', 'Incremental')], max_length=16)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('posts_scored', models.PositiveIntegerField(default=0)),
+                ('hot_rows_changed', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='hot_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['updated_at'], name='hot_topics__updated_9862f4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['hot_score'], name='hot_topics__hot_sco_24310a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rankingrun',
+            index=models.Index(fields=['started_at'], name='hot_topics__started_b95dac_idx'),
+        ),
+    ]
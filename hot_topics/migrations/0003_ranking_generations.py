@@ -0,0 +1,69 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def adopt_existing_hot_posts(apps, schema_editor):
+    # Rows from before generations become the first live generation. Its
+    # started_at is when they were computed, so the next incremental pass
+    # rescores every post changed since.
+    HotPost = apps.get_model("hot_topics", "HotPost")
+    RankingRun = apps.get_model("hot_topics", "RankingRun")
+    rows = HotPost.objects.filter(generation__isnull=True)
+    computed_at = rows.aggregate(oldest=models.Min("computed_at"))["oldest"]
+    if computed_at is None:
+        return
+    now = timezone.now()
+    run = RankingRun.objects.create(
+        mode="full",
+        started_at=computed_at,
+        finished_at=now,
+        published_at=now,
+        hot_rows_written=rows.count(),
+    )
+    rows.update(generation=run)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hot_topics', '0002_incremental_ranking'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='hotpost',
+            name='hot_topics__categor_1051bf_idx',
+        ),
+        migrations.RenameField(
+            model_name='rankingrun',
+            old_name='hot_rows_changed',
+            new_name='hot_rows_written',
+        ),
+        migrations.AddField(
+            model_name='hotpost',
+            name='generation',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='hot_posts', to='hot_topics.rankingrun'),
+        ),
+        migrations.AddField(
+            model_name='rankingrun',
+            name='published_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(adopt_existing_hot_posts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='hotpost',
+            name='generation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hot_posts', to='hot_topics.rankingrun'),
+        ),
+        migrations.AddIndex(
+            model_name='hotpost',
+            index=models.Index(fields=['generation', 'category', 'rank'], name='hot_topics__generat_dba628_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rankingrun',
+            index=models.Index(fields=['published_at'], name='hot_topics__publish_1be83e_idx'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:10
+
+from django.db import migrations
+
+# Active posts only; category_tag ("c<category id>") lets MATCH do the
+# category filter inside the index instead of after it.
+CREATE_FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS hot_topics_post_fts USING fts5(
+        title, body, topic_name, category_tag,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hot_topics_post_fts_ai AFTER INSERT ON hot_topics_post
+    WHEN new.is_active
+    BEGIN
+        INSERT INTO hot_topics_post_fts (rowid, title, body, topic_name, category_tag)
+        SELECT new.id, new.title, new.body, t.name, 'c' || t.category_id
+        FROM hot_topics_topic t WHERE t.id = new.topic_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hot_topics_post_fts_ad AFTER DELETE ON hot_topics_post
+    BEGIN
+        DELETE FROM hot_topics_post_fts WHERE rowid = old.id;
+    END
+    """,
+    # Only fires when an indexed column is written, so engagement-only
+    # updates (likes, views, ...) never touch the index.
+    """
+    CREATE TRIGGER IF NOT EXISTS hot_topics_post_fts_au
+    AFTER UPDATE OF title, body, topic_id, is_active ON hot_topics_post
+    BEGIN
+        DELETE FROM hot_topics_post_fts WHERE rowid = old.id;
+        INSERT INTO hot_topics_post_fts (rowid, title, body, topic_name, category_tag)
+        SELECT new.id, new.title, new.body, t.name, 'c' || t.category_id
+        FROM hot_topics_topic t WHERE t.id = new.topic_id AND new.is_active;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hot_topics_post_fts_topic_au
+    AFTER UPDATE OF name, category_id ON hot_topics_topic
+    BEGIN
+        UPDATE hot_topics_post_fts SET topic_name = new.name, category_tag = 'c' || new.category_id
+        WHERE rowid IN (SELECT id FROM hot_topics_post WHERE topic_id = new.id);
+    END
+    """,
+]
+
+BACKFILL_FTS_SQL = """
+    INSERT INTO hot_topics_post_fts (rowid, title, body, topic_name, category_tag)
+    SELECT p.id, p.title, p.body, t.name, 'c' || t.category_id
+    FROM hot_topics_post p JOIN hot_topics_topic t ON t.id = p.topic_id
+    WHERE p.is_active
+"""
+
+DROP_FTS_SQL = [
+    "DROP TRIGGER IF EXISTS hot_topics_post_fts_topic_au",
+    "DROP TRIGGER IF EXISTS hot_topics_post_fts_au",
+    "DROP TRIGGER IF EXISTS hot_topics_post_fts_ad",
+    "DROP TRIGGER IF EXISTS hot_topics_post_fts_ai",
+    "DROP TABLE IF EXISTS hot_topics_post_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite-only; other backends keep the icontains search.
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in CREATE_FTS_SQL:
+        schema_editor.execute(statement)
+    schema_editor.execute(BACKFILL_FTS_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in DROP_FTS_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hot_topics', '0003_ranking_generations'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:02
+
+from django.db import migrations
+
+# One-row counter bumped whenever the search index content changes; search
+# result caches key on it.
+CREATE_VERSION_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS hot_topics_post_fts_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO hot_topics_post_fts_version (id, version) VALUES (1, 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS hot_topics_post_fts_version_ai AFTER INSERT ON hot_topics_post
+    WHEN new.is_active
+    BEGIN
+        UPDATE hot_topics_post_fts_version SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hot_topics_post_fts_version_ad AFTER DELETE ON hot_topics_post
+    WHEN old.is_active
+    BEGIN
+        UPDATE hot_topics_post_fts_version SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hot_topics_post_fts_version_au
+    AFTER UPDATE OF title, body, topic_id, is_active ON hot_topics_post
+    WHEN old.is_active OR new.is_active
+    BEGIN
+        UPDATE hot_topics_post_fts_version SET version = version + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS hot_topics_post_fts_version_topic_au
+    AFTER UPDATE OF name, category_id ON hot_topics_topic
+    BEGIN
+        UPDATE hot_topics_post_fts_version SET version = version + 1;
+    END
+    """,
+]
+
+DROP_VERSION_SQL = [
+    "DROP TRIGGER IF EXISTS hot_topics_post_fts_version_topic_au",
+    "DROP TRIGGER IF EXISTS hot_topics_post_fts_version_au",
+    "DROP TRIGGER IF EXISTS hot_topics_post_fts_version_ad",
+    "DROP TRIGGER IF EXISTS hot_topics_post_fts_version_ai",
+    "DROP TABLE IF EXISTS hot_topics_post_fts_version",
+]
+
+
+def create_search_version(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in CREATE_VERSION_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_search_version(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in DROP_VERSION_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hot_topics', '0004_post_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_version, drop_search_version),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hot_topics', '0005_search_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('holder', models.CharField(max_length=128)),
+                ('acquired_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='rankingrun',
+            name='duration_ms',
+            field=models.FloatField(default=0.0),
+        ),
+    ]
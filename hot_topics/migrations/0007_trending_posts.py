@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hot_topics', '0006_ranking_scheduler'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('horizon', models.CharField(choices=[('hour', 'Last hour'), ('day', 'Today'), ('week', 'This week')], max_length=8)),
+                ('scope', models.CharField(choices=[('global', 'Global'), ('category', 'Category'), ('topic', 'Topic')], max_length=8)),
+                ('scope_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveIntegerField()),
+                ('generation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_posts', to='hot_topics.rankingrun')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_entries', to='hot_topics.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['generation', 'horizon', 'scope', 'scope_id', 'rank'], name='hot_topics__generat_b7724c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hot_topics', '0007_trending_posts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotPayload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=96)),
+                ('body', models.BinaryField()),
+                ('etag', models.CharField(max_length=40)),
+                ('generation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payloads', to='hot_topics.rankingrun')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('generation', 'key'), name='hot_payload_unique_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-19 19:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hot_topics', '0008_hot_payloads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rankingrun',
+            name='scoring',
+            field=models.CharField(choices=[('decay', 'Decay'), ('velocity', 'Velocity')], default='decay', max_length=16),
+        ),
+        migrations.CreateModel(
+            name='EngagementHistory',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='engagement_history', serialize=False, to='hot_topics.post')),
+                ('last_slot', models.PositiveIntegerField()),
+                ('baseline', models.FloatField()),
+                ('deltas', models.BinaryField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_slot'], name='hot_topics__last_sl_ab094b_idx')],
+            },
+        ),
+    ]
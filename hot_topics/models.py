@@ -46,19 +46,96 @@ class Post(models.Model):
     views = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped whenever engagement or is_active changes; incremental ranking
+    # rescores only posts updated since the previous pass.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Score as of the last pass that scored this post. Scores only decay with
+    # age, so this is an upper bound on the post's current score.
+    hot_score = models.FloatField(null=True, blank=True)
 
     class Meta:
         indexes = [
             models.Index(fields=["created_at"]),
             models.Index(fields=["topic", "created_at"]),
             models.Index(fields=["is_active", "created_at"]),
+            models.Index(fields=["updated_at"]),
+            models.Index(fields=["hot_score"]),
         ]
 
     def __str__(self):
         return self.title
 
 
+class EngagementHistory(models.Model):
+    """Recent engagement of one post as a packed ring of per-slot gains.
+
+    ``deltas`` holds hot_topics.velocity.SNAPSHOT_SLOTS little-endian float32
+    values, one per snapshot slot, indexed by slot number modulo the ring
+    size; ``last_slot`` is the newest slot written and ``baseline`` the
+    weighted engagement at that point. Each post has at most one row.
+    """
+
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True, related_name="engagement_history"
+    )
+    last_slot = models.PositiveIntegerField()
+    baseline = models.FloatField()
+    deltas = models.BinaryField()
+
+    class Meta:
+        indexes = [models.Index(fields=["last_slot"])]
+
+    def __str__(self):
+        return f"history of {self.post_id} @ slot {self.last_slot}"
+
+
+class RankingRun(models.Model):
+    MODE_CHOICES = [("full", "Full"), ("incremental", "Incremental")]
+    SCORING_CHOICES = [("decay", "Decay"), ("velocity", "Velocity")]
+
+    mode = models.CharField(max_length=16, choices=MODE_CHOICES)
+    # HOT_TOPICS_SCORING when the pass ran; stored hot_scores are only
+    # comparable within one scoring mode.
+    scoring = models.CharField(max_length=16, choices=SCORING_CHOICES, default="decay")
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Set by the single UPDATE that makes this run's HotPost rows live; the
+    # newest published run is the live generation.
+    published_at = models.DateTimeField(null=True, blank=True)
+    posts_scored = models.PositiveIntegerField(default=0)
+    hot_rows_written = models.PositiveIntegerField(default=0)
+    # Wall time from the start of scoring to the flip.
+    duration_ms = models.FloatField(default=0.0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["started_at"]),
+            models.Index(fields=["published_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.mode} ranking at {self.started_at:%Y-%m-%d %H:%M:%S}"
+
+
+class RankingLease(models.Model):
+    """Single-flight lock for ranking passes, shared by every process and host.
+
+    A holder owns the lease until it releases it or expires_at passes, so a
+    crashed holder only blocks others for the lease duration.
+    """
+
+    name = models.CharField(max_length=64, unique=True)
+    holder = models.CharField(max_length=128)
+    acquired_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.holder} until {self.expires_at:%Y-%m-%d %H:%M:%S}"
+
+
 class HotPost(models.Model):
+    # Rows of one ranking pass; only the live generation is read.
+    generation = models.ForeignKey(RankingRun, on_delete=models.CASCADE, related_name="hot_posts")
     # category=None means global hot list for landing page.
     category = models.ForeignKey(
         Category,
@@ -74,10 +151,63 @@ class HotPost(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=["category", "rank"]),
+            models.Index(fields=["generation", "category", "rank"]),
             models.Index(fields=["computed_at"]),
         ]
 
     def __str__(self):
         scope = "global" if self.category_id is None else self.category.name
         return f"{scope}#{self.rank}: {self.post_id}"
+
+
+class TrendingPost(models.Model):
+    """Top posts per (horizon, scope) of one ranking pass.
+
+    Horizons only rank posts created within their window and decay faster or
+    slower than the main lists; scope_id is the category or topic id (None
+    for the global scope).
+    """
+
+    HORIZON_CHOICES = [("hour", "Last hour"), ("day", "Today"), ("week", "This week")]
+    SCOPE_CHOICES = [("global", "Global"), ("category", "Category"), ("topic", "Topic")]
+
+    generation = models.ForeignKey(
+        RankingRun, on_delete=models.CASCADE, related_name="trending_posts"
+    )
+    horizon = models.CharField(max_length=8, choices=HORIZON_CHOICES)
+    scope = models.CharField(max_length=8, choices=SCOPE_CHOICES)
+    scope_id = models.PositiveIntegerField(null=True, blank=True)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="trending_entries")
+    score = models.FloatField()
+    rank = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["generation", "horizon", "scope", "scope_id", "rank"]),
+        ]
+
+    def __str__(self):
+        scope = self.scope if self.scope_id is None else f"{self.scope} {self.scope_id}"
+        return f"{self.horizon} {scope}#{self.rank}: {self.post_id}"
+
+
+class HotPayload(models.Model):
+    """Serialized first page of a hot-list API response, written with its generation.
+
+    The APIs send ``body`` as is; ``etag`` is derived from it and
+    Last-Modified from the generation's started_at.
+    """
+
+    generation = models.ForeignKey(RankingRun, on_delete=models.CASCADE, related_name="payloads")
+    # "landing" or "category:<slug>".
+    key = models.CharField(max_length=96)
+    body = models.BinaryField()
+    etag = models.CharField(max_length=40)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["generation", "key"], name="hot_payload_unique_key")
+        ]
+
+    def __str__(self):
+        return f"{self.key} @ generation {self.generation_id}"
@@ -0,0 +1,36 @@
+import base64
+import binascii
+import json
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(kind, position):
+    """Opaque, URL-safe cursor for a keyset position."""
+    raw = json.dumps({"k": kind, "p": position}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor, kind):
+    """Position stored in ``cursor``; ValueError if it is malformed or of another kind."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid cursor") from None
+    if not isinstance(data, dict) or data.get("k") != kind or "p" not in data:
+        raise ValueError("Invalid cursor")
+    return data["p"]
+
+
+def page_size(raw, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    if raw in (None, ""):
+        return default
+    try:
+        size = int(raw)
+    except ValueError:
+        raise ValueError("limit must be an integer") from None
+    if not 1 <= size <= maximum:
+        raise ValueError(f"limit must be between 1 and {maximum}")
+    return size
@@ -0,0 +1,140 @@
+import os
+import socket
+import secrets
+import threading
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from knowella.db import write_lane
+
+from .models import Post, RankingLease, RankingRun
+from .services import LeaseLost, live_generation, rebuild_hot_posts, refresh_hot_posts
+
+RANKING_LEASE_NAME = "hot_topics.ranking"
+# A running pass renews its lease every RANKING_LEASE_RENEW_SECONDS, so a
+# holder that dies blocks others for at most RANKING_LEASE_SECONDS however
+# long passes take.
+RANKING_LEASE_SECONDS = 180
+RANKING_LEASE_RENEW_SECONDS = 60
+RANKING_INTERVAL_SECONDS = 60
+# Ceiling for the scheduler's back-off after failed passes.
+RANKING_MAX_BACKOFF_SECONDS = 600
+RANKING_JITTER = 0.1
+# Scores keep decaying while nothing changes, which can reorder posts, so an
+# idle scheduler still runs a pass this often.
+RANKING_MAX_IDLE_SECONDS = 900
+
+
+def lease_holder():
+    return f"{socket.gethostname()[:64]}:{os.getpid()}:{secrets.token_hex(4)}"
+
+
+def acquire_lease(holder, name=RANKING_LEASE_NAME, seconds=RANKING_LEASE_SECONDS):
+    """Take (or extend) the lease; False while someone else holds it."""
+
+    def take():
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=seconds)
+        taken = (
+            RankingLease.objects.filter(name=name)
+            .filter(Q(expires_at__lte=now) | Q(holder=holder))
+            .update(holder=holder, acquired_at=now, expires_at=expires_at)
+        )
+        if taken:
+            return True
+        _, created = RankingLease.objects.get_or_create(
+            name=name,
+            defaults={"holder": holder, "acquired_at": now, "expires_at": expires_at},
+        )
+        return created
+
+    return write_lane.run(take)
+
+
+def holds_lease(holder, name=RANKING_LEASE_NAME):
+    """True while ``holder`` owns an unexpired lease; the publish fence."""
+    return RankingLease.objects.filter(
+        name=name, holder=holder, expires_at__gt=timezone.now()
+    ).exists()
+
+
+def release_lease(holder, name=RANKING_LEASE_NAME):
+    write_lane.run(
+        RankingLease.objects.filter(name=name, holder=holder).update, expires_at=timezone.now()
+    )
+
+
+class _LeaseRenewer:
+    """Extend the lease every RANKING_LEASE_RENEW_SECONDS while a pass runs.
+
+    Renewal stops once another holder has taken the lease (this holder
+    stalled for longer than the lease); the pass is then fenced off at its
+    flip. A failed renewal is retried on the next tick; the lease outlasts
+    two misses.
+    """
+
+    def __init__(self, holder, name=RANKING_LEASE_NAME):
+        self.holder = holder
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ranking-lease-renewer", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stop.wait(RANKING_LEASE_RENEW_SECONDS):
+                try:
+                    if not acquire_lease(self.holder, self.name):
+                        return
+                except Exception:
+                    continue
+        finally:
+            connection.close()
+
+
+def _idle_since(last):
+    """True if no post changed since ``last`` started and it is recent enough."""
+    if timezone.now() - last.started_at >= timedelta(seconds=RANKING_MAX_IDLE_SECONDS):
+        return False
+    return not Post.objects.filter(updated_at__gte=last.started_at).exists()
+
+
+def run_ranking_pass(holder, full=False, skip_idle=True):
+    """One lease-guarded ranking pass.
+
+    Returns the pass summary with ``status`` "ran", or ``{"status":
+    "locked"}`` when another process holds the lease, ``{"status":
+    "skipped"}`` when no post changed since the live generation was
+    computed, or ``{"status": "lease_lost"}`` when the lease was taken over
+    mid-pass and the generation was not published. The flip re-checks the
+    lease in its own transaction, so two holders never both publish. Errors
+    propagate after the lease is released.
+    """
+    if not acquire_lease(holder):
+        return {"status": "locked"}
+    try:
+        last = RankingRun.objects.filter(id=live_generation()).first()
+        if skip_idle and not full and last is not None and _idle_since(last):
+            return {"status": "skipped", "generation": last.id}
+
+        def fence():
+            return holds_lease(holder)
+
+        with _LeaseRenewer(holder):
+            try:
+                summary = rebuild_hot_posts(fence=fence) if full else refresh_hot_posts(fence=fence)
+            except LeaseLost:
+                return {"status": "lease_lost"}
+        return {"status": "ran", **summary}
+    finally:
+        release_lease(holder)
@@ -0,0 +1,373 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from knowella.db import write_lane
+
+from .models import Post
+
+FTS_TABLE = "hot_topics_post_fts"
+FTS_VERSION_TABLE = "hot_topics_post_fts_version"
+MAX_QUERY_TERMS = 8
+# bm25() column weights: title, body, topic_name, category_tag.
+BM25_WEIGHTS = (10.0, 1.0, 5.0, 0.0)
+
+SEARCH_CACHE_SIZE = 2048
+SEARCH_CACHE_TTL_SECONDS = 60
+# Posts fetched per cached query; a query with fewer hits is cached complete.
+SEARCH_CACHE_FETCH = 100
+INDEX_VERSION_TTL_SECONDS = 1.0
+
+# Same word split as FTS5's unicode61 tokenizer: letters and digits only.
+_TERM_RE = re.compile(r"[^\W_]+")
+
+# The table and its sync triggers are created by migration 0004_post_search,
+# the version counter and its triggers by 0005_search_version.
+_REINDEX_SQL = [
+    f"DELETE FROM {FTS_TABLE}",
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, title, body, topic_name, category_tag)
+    SELECT p.id, p.title, p.body, t.name, 'c' || t.category_id
+    FROM hot_topics_post p JOIN hot_topics_topic t ON t.id = p.topic_id
+    WHERE p.is_active
+    """,
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')",
+    f"UPDATE {FTS_VERSION_TABLE} SET version = version + 1",
+]
+
+
+def fts_available():
+    return connection.vendor == "sqlite"
+
+
+def _fold(text):
+    # Lowercase and strip diacritics, as remove_diacritics does.
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def query_terms(q):
+    return _TERM_RE.findall(_fold(q))[:MAX_QUERY_TERMS]
+
+
+def match_expression(q, category_id=None):
+    """Turn user input into an FTS5 MATCH string: every term as a quoted prefix.
+
+    Returns None when the input has no searchable terms.
+    """
+    terms = query_terms(q)
+    if not terms:
+        return None
+    # Terms only match the text columns, never the internal category_tag.
+    expression = "{title body topic_name} : (" + " AND ".join(f'"{term}"*' for term in terms) + ")"
+    if category_id is not None:
+        expression = f'category_tag : "c{category_id}" AND {expression}'
+    return expression
+
+
+def _time_page_rows(qs, limit, after):
+    """Newest first by (created_at, id); ``after`` is the previous page's last position."""
+    if after is not None:
+        created_at, post_id = _time_position(after)
+        qs = qs.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id)
+        )
+    return qs.select_related("topic").order_by("-created_at", "-id")[: limit + 1]
+
+
+def _time_page_result(posts, limit):
+    if len(posts) <= limit:
+        return posts, None
+    last = posts[limit - 1]
+    return posts[:limit], [last.created_at.isoformat(), last.id]
+
+
+def _time_page(qs, limit, after):
+    return _time_page_result(list(_time_page_rows(qs, limit, after)), limit)
+
+
+def _time_position(after):
+    try:
+        created_at, post_id = after
+        created_at = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor") from None
+    if not isinstance(post_id, int) or created_at.tzinfo is None:
+        raise ValueError("Invalid cursor")
+    return created_at, post_id
+
+
+def latest_page(category, limit, after=None):
+    """Active posts of ``category``, newest first, one keyset page at a time."""
+    return _time_page(Post.objects.filter(topic__category=category, is_active=True), limit, after)
+
+
+async def alatest_page(category, limit, after=None):
+    rows = _time_page_rows(
+        Post.objects.filter(topic__category=category, is_active=True), limit, after
+    )
+    return _time_page_result([post async for post in rows], limit)
+
+
+def search_page(category, q, limit=25, after=None):
+    """One page of active ``category`` posts matching ``q``, best BM25 match first.
+
+    ``after`` is the position returned with the previous page; returns the
+    posts and the position to continue from (None on the last page). Ties on
+    score are broken by post id, so pages never overlap or skip.
+    """
+    if not fts_available():
+        qs = Post.objects.filter(topic__category=category, is_active=True).filter(
+            Q(title__icontains=q) | Q(body__icontains=q) | Q(topic__name__icontains=q)
+        )
+        return _time_page(qs, limit, after)
+    rows, more = _search_rows(category, q, limit, after)
+    page = _hydrate([post_id for post_id, _ in rows])
+    return page, ([rows[-1][1], rows[-1][0]] if more else None)
+
+
+def _search_rows(category, q, limit, after=None):
+    # (post id, bm25 score) pairs of one FTS page, and whether more follow.
+    expression = match_expression(q, category.id)
+    if expression is None:
+        return [], False
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    score = f"bm25({FTS_TABLE}, {weights})"
+    sql = f"SELECT rowid, {score} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+    params = [expression]
+    if after is not None:
+        try:
+            after_score, after_id = float(after[0]), int(after[1])
+        except (TypeError, ValueError, IndexError, KeyError):
+            raise ValueError("Invalid cursor") from None
+        sql += f" AND ({score} > %s OR ({score} = %s AND rowid > %s))"
+        params += [after_score, after_score, after_id]
+    sql += f" ORDER BY {score}, rowid LIMIT %s"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit + 1])
+        rows = cursor.fetchall()
+    return rows[:limit], len(rows) > limit
+
+
+def _active_posts(post_ids):
+    return Post.objects.filter(id__in=post_ids, is_active=True).select_related("topic").in_bulk()
+
+
+def _hydrate(post_ids):
+    """Active posts for ``post_ids``, in that order."""
+    posts = _active_posts(post_ids)
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+def search_posts(category, q, limit=25):
+    """Active posts of ``category`` matching ``q``, best BM25 match first."""
+    return search_page(category, q, limit)[0]
+
+
+def _reindex():
+    with transaction.atomic(), connection.cursor() as cursor:
+        for statement in _REINDEX_SQL:
+            cursor.execute(statement)
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def rebuild_search_index():
+    """Refill the index from the post table in one transaction.
+
+    Readers keep searching the previous contents until it commits.
+    """
+    if not fts_available():
+        return 0
+    return write_lane.run(_reindex)
+
+
+_version = {"value": None, "read_at": 0.0}
+
+
+def index_version():
+    """Search index version, re-read at most every INDEX_VERSION_TTL_SECONDS.
+
+    None on backends without the index; cached entries then only expire.
+    """
+    if not fts_available():
+        return None
+    now = time.monotonic()
+    if _version["value"] is None or now - _version["read_at"] > INDEX_VERSION_TTL_SECONDS:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT version FROM {FTS_VERSION_TABLE}")
+            row = cursor.fetchone()
+        _version["value"] = row[0] if row else 0
+        _version["read_at"] = now
+    return _version["value"]
+
+
+def _post_tokens(post):
+    # The columns match_expression searches; category_tag is never a term.
+    return set(_TERM_RE.findall(_fold(f"{post.title} {post.body} {post.topic.name}")))
+
+
+class SearchHit:
+    """What a cached search result keeps of a post: enough to render and refine."""
+
+    def __init__(self, post, score=None, tokens=None):
+        self.id = post.id
+        self.title = post.title
+        self.topic_name = post.topic.name
+        self.score = score
+        self.tokens = tokens
+
+
+class _Entry:
+    def __init__(self, hits, complete, expires_at):
+        self.hits = hits
+        self.complete = complete
+        self.expires_at = expires_at
+
+    def refine(self, terms):
+        """Hits of this (complete) entry that also match every term, in memory."""
+        return [
+            hit
+            for hit in self.hits
+            if all(any(token.startswith(term) for token in hit.tokens) for term in terms)
+        ]
+
+
+class SearchCache:
+    """LRU/TTL cache of category search results for live search.
+
+    Entries are keyed on (category, normalized terms, index version), so any
+    change to indexed posts (is_active included) makes old entries
+    unreachable. An entry holds SearchHits, not posts: id, title, topic name,
+    BM25 score and the post's search tokens. Each miss fetches up to
+    SEARCH_CACHE_FETCH matches and loads them, active ones only, in one
+    query. When that is every match, the entry is complete, and a longer
+    query typed on top of it (a string extension of its normalized terms,
+    which can only match a subset) is answered by filtering the entry's
+    tokens in memory. Hits and refinements run no query. Refined results
+    keep the shorter query's BM25 order. Without the FTS index only exact
+    repeats are served from the cache.
+    """
+
+    def __init__(self, max_entries=SEARCH_CACHE_SIZE, ttl_seconds=SEARCH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            kind: {"count": 0, "time_ms": 0.0} for kind in ("hit", "refined", "miss")
+        }
+        self._evictions = 0
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _lookup(self, category_id, normalized, version, now):
+        with self._lock:
+            entry = self._get((category_id, normalized, version), now)
+            if entry is not None:
+                return "hit", entry
+            if version is None:
+                return "miss", None
+            for end in range(len(normalized) - 1, 0, -1):
+                if normalized[end - 1] == " ":
+                    continue
+                entry = self._get((category_id, normalized[:end], version), now)
+                if entry is not None and entry.complete:
+                    return "refined", entry
+        return "miss", None
+
+    def search(self, category, q, limit=25):
+        terms = query_terms(q) if fts_available() else [q.lower()]
+        if not terms or limit > SEARCH_CACHE_FETCH:
+            return [SearchHit(post) for post in search_posts(category, q, limit)]
+        start = time.perf_counter()
+        normalized = " ".join(terms)
+        version = index_version()
+        now = time.monotonic()
+        kind, entry = self._lookup(category.id, normalized, version, now)
+        if kind == "hit":
+            hits = entry.hits
+        elif kind == "refined":
+            hits = entry.refine(terms)
+            with self._lock:
+                self._put(
+                    (category.id, normalized, version),
+                    _Entry(hits, True, now + self.ttl_seconds),
+                )
+        else:
+            if version is None:
+                hits = [
+                    SearchHit(post) for post in search_posts(category, q, SEARCH_CACHE_FETCH + 1)
+                ]
+                matched = len(hits)
+            else:
+                rows, _ = _search_rows(category, q, SEARCH_CACHE_FETCH + 1)
+                matched = len(rows)
+                posts = _active_posts([post_id for post_id, _ in rows])
+                hits = [
+                    SearchHit(posts[post_id], score, frozenset(_post_tokens(posts[post_id])))
+                    for post_id, score in rows
+                    if post_id in posts
+                ]
+            complete = matched <= SEARCH_CACHE_FETCH
+            hits = hits[:SEARCH_CACHE_FETCH]
+            with self._lock:
+                self._put(
+                    (category.id, normalized, version),
+                    _Entry(hits, complete, now + self.ttl_seconds),
+                )
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        with self._lock:
+            self._stats[kind]["count"] += 1
+            self._stats[kind]["time_ms"] += elapsed_ms
+        return hits[:limit]
+
+    def stats(self):
+        with self._lock:
+            lookups = sum(kind["count"] for kind in self._stats.values())
+            served = self._stats["hit"]["count"] + self._stats["refined"]["count"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self._evictions,
+                "lookups": lookups,
+                "hit_ratio": round(served / lookups, 4) if lookups else None,
+                **{
+                    kind: {
+                        "count": values["count"],
+                        "avg_ms": round(values["time_ms"] / values["count"], 3)
+                        if values["count"]
+                        else None,
+                    }
+                    for kind, values in self._stats.items()
+                },
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+search_cache = SearchCache()
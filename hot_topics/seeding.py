@@ -0,0 +1,134 @@
+import random
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from knowella.db import write_lane
+
+from .models import Category, Post, Topic
+
+SAMPLE_TAXONOMY = {
+    "Technology": ["AI Tools", "Web Development", "Cloud Infrastructure"],
+    "Sports": ["Football Analysis", "Cricket Trends", "Basketball Strategy"],
+    "Finance": ["Personal Finance", "Stock Market", "Startup Funding"],
+}
+VOCABULARY = (
+    "launch update review guide analysis trend market model data energy policy climate "
+    "chip robot league transfer election budget startup funding football cricket stock "
+    "cloud security release benchmark tutorial debate rumor interview forecast record "
+    "season strategy pricing regulation open source hiring layoffs merger growth"
+).split()
+SEED_BATCH_SIZE = 5000
+# Engagement and topic popularity follow a power law: a few posts and topics
+# get most of the attention.
+ENGAGEMENT_ALPHA = 1.2
+TOPIC_ZIPF_EXPONENT = 1.1
+MAX_COUNTER = 2_000_000_000
+
+
+def taxonomy(categories, topics_per_category):
+    """{category name: [topic names]}: the sample names first, then numbered ones."""
+    names = list(SAMPLE_TAXONOMY)[:categories]
+    names += [f"Category {i}" for i in range(len(names) + 1, categories + 1)]
+    result = {}
+    for name in names:
+        topics = SAMPLE_TAXONOMY.get(name, [])[:topics_per_category]
+        topics += [f"{name} Topic {i}" for i in range(len(topics) + 1, topics_per_category + 1)]
+        result[name] = topics
+    return result
+
+
+def ensure_taxonomy(categories, topics_per_category):
+    topics = []
+    for category_name, topic_names in taxonomy(categories, topics_per_category).items():
+        category, _ = Category.objects.get_or_create(name=category_name)
+        for topic_name in topic_names:
+            topic, _ = Topic.objects.get_or_create(category=category, name=topic_name)
+            topics.append(topic)
+    return topics
+
+
+def engagement(rng):
+    """(likes, comments, shares, views) with a heavy-tailed popularity."""
+    popularity = rng.paretovariate(ENGAGEMENT_ALPHA)
+    views = min(int(popularity * 200), MAX_COUNTER)
+    likes = min(int(views * rng.uniform(0.005, 0.05)), MAX_COUNTER)
+    comments = int(likes * rng.uniform(0.05, 0.3))
+    shares = int(likes * rng.uniform(0.01, 0.1))
+    return likes, comments, shares, views
+
+
+def _insert_backdated(posts):
+    # Multi-row INSERTs with created_at in the statement itself: bulk_create
+    # would stamp auto_now_add over the backdated values. Not executemany:
+    # inside the write lane's savepoint every statement flushes the FTS5
+    # index, so few large statements are far faster than one per row.
+    fields = [field for field in Post._meta.concrete_fields if not field.primary_key]
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(field.column) for field in fields)
+    row_sql = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    batch_size = connection.ops.bulk_batch_size(fields, posts)
+    now = timezone.now()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(posts), batch_size):
+            batch = posts[start : start + batch_size]
+            params = []
+            for post in batch:
+                if post.updated_at is None:
+                    post.updated_at = now
+                params.extend(
+                    field.get_db_prep_save(getattr(post, field.attname), connection)
+                    for field in fields
+                )
+            cursor.execute(
+                f"INSERT INTO {quote(Post._meta.db_table)} ({columns}) "
+                f"VALUES {', '.join([row_sql] * len(batch))}",
+                params,
+            )
+
+
+def seed_posts(topics, count, rng, hours=72, batch_size=SEED_BATCH_SIZE):
+    """Bulk-insert ``count`` posts over ``topics`` with backdated created_at.
+
+    Topics are picked with Zipf-like weights, creation times are spread
+    uniformly over the last ``hours``. Each batch is one transaction.
+    """
+    order = list(topics)
+    rng.shuffle(order)
+    weights = [1.0 / (rank**TOPIC_ZIPF_EXPONENT) for rank in range(1, len(order) + 1)]
+    now = timezone.now()
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        batch = []
+        for topic in rng.choices(order, weights, k=size):
+            likes, comments, shares, views = engagement(rng)
+            created_at = now - timedelta(seconds=rng.uniform(0, hours * 3600))
+            batch.append(
+                Post(
+                    topic=topic,
+                    title=f"{topic.name}: {' '.join(rng.sample(VOCABULARY, 3))}",
+                    body=" ".join(rng.choices(VOCABULARY, k=rng.randint(8, 30))),
+                    likes=likes,
+                    comments=comments,
+                    shares=shares,
+                    views=views,
+                    created_at=created_at,
+                )
+            )
+        write_lane.run(_insert_backdated, batch)
+        created += size
+    return created
+
+
+def reset():
+    Post.objects.all().delete()
+    Topic.objects.all().delete()
+    Category.objects.all().delete()
+
+
+def seed(categories=3, topics_per_category=3, posts=180, seed_value=None, hours=72):
+    rng = random.Random(seed_value)
+    topics = ensure_taxonomy(categories, topics_per_category)
+    return seed_posts(topics, posts, rng, hours=hours)
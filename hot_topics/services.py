@@ -1,57 +1,902 @@
+import hashlib
+import heapq
+import json
 import math
+import threading
+from array import array
+from collections import OrderedDict, defaultdict
+from datetime import timedelta
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import CharField
+from django.db.models.functions import Cast
 from django.utils import timezone
 
-from .models import Category, HotPost, Post
+try:
+    import numpy as np
+except ImportError:  # numpy ships with pandas; scoring falls back to heaps
+    np = None
 
+from knowella.db import write_lane
 
-GLOBAL_CATEGORY_LIMIT = 20
-CATEGORY_HOT_LIMIT = 20
+from .models import (
+    Category,
+    EngagementHistory,
+    HotPayload,
+    HotPost,
+    Post,
+    RankingRun,
+    TrendingPost,
+)
+from .pagination import DEFAULT_PAGE_SIZE, encode_cursor
+from .velocity import (
+    HISTORY_IDS_PER_QUERY,
+    VELOCITY_BASE_WEIGHT,
+    advance,
+    history_span_seconds,
+    pack,
+    recent_velocities,
+    recent_velocity_columns,
+    snapshot_slot,
+    unpack,
+    velocities_for,
+)
+
+
+# Ranks kept per list. Pages show the top 20; the APIs page deeper.
+GLOBAL_CATEGORY_LIMIT = 200
+CATEGORY_HOT_LIMIT = 200
+LANDING_GLOBAL_LIMIT = 20
+SCORE_READ_CHUNK_SIZE = 5000
+SCORE_WRITE_BATCH_SIZE = 1000
+HOT_GENERATIONS_KEPT = 3
+# RankingRun rows (per-pass duration and counts) outlive their generations'
+# hot rows and are only pruned after this long.
+RANKING_RUN_RETENTION_DAYS = 30
+LANDING_CATEGORY_LIMIT = 5
+# The flip refreshes this key in the publishing process; other processes pick
+# up a new generation once it expires.
+LIVE_GENERATION_CACHE_KEY = "hot_topics:live-generation"
+LIVE_GENERATION_CACHE_SECONDS = 5
+HOT_FRAGMENT_CACHE_SECONDS = 300
+# Trending horizons: (window of post creation times, decay hours).
+TRENDING_HORIZONS = {
+    "hour": (timedelta(hours=1), 1.0),
+    "day": (timedelta(days=1), 6.0),
+    "week": (timedelta(days=7), 24.0),
+}
+TRENDING_LIMIT = 20
+# Precomputed first pages of the hot-list APIs: client/CDN freshness, and
+# entries kept in each process's memory.
+HOT_PAYLOAD_MAX_AGE_SECONDS = 30
+HOT_PAYLOAD_MEMO_SIZE = 256
+# Hot-list scoring modes (HOT_TOPICS_SCORING): "decay" divides lifetime
+# engagement by age, "velocity" ranks by recent engagement gains.
+SCORING_MODES = ("decay", "velocity")
+
+_SCORE_FIELDS = (
+    "id",
+    "topic__category_id",
+    "is_active",
+    "likes",
+    "comments",
+    "shares",
+    "views",
+    "created_at",
+)
+
+
+def _engagement(likes, comments, shares, views):
+    return likes + (2.0 * comments) + (3.0 * shares) + (0.05 * math.log1p(views))
+
+
+def _score(likes, comments, shares, views, created_at, now, decay_hours=6.0):
+    age_hours = max((now - created_at).total_seconds() / 3600.0, 0.0)
+    return (_engagement(likes, comments, shares, views) + 1.0) / (1.0 + (age_hours / decay_hours))
 
 
 def trending_score(post, now=None):
     if now is None:
         now = timezone.now()
-    age_hours = max((now - post.created_at).total_seconds() / 3600.0, 0.0)
-    engagement = (
-        post.likes
-        + (2.0 * post.comments)
-        + (3.0 * post.shares)
-        + (0.05 * math.log1p(post.views))
+    return _score(post.likes, post.comments, post.shares, post.views, post.created_at, now)
+
+
+def scoring_mode():
+    mode = getattr(settings, "HOT_TOPICS_SCORING", "decay")
+    if mode not in SCORING_MODES:
+        raise ValueError(f"HOT_TOPICS_SCORING must be one of: {', '.join(SCORING_MODES)}")
+    return mode
+
+
+def _hot_score(decay_score, velocity):
+    # velocity is None in decay mode.
+    if velocity is None:
+        return decay_score
+    return velocity + (VELOCITY_BASE_WEIGHT * decay_score)
+
+
+class _TopK:
+    """Bounded min-heap of the ``limit`` best (score, post_id) pairs."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.heap = []
+
+    def push(self, score, post_id):
+        if len(self.heap) < self.limit:
+            heapq.heappush(self.heap, (score, post_id))
+        elif (score, post_id) > self.heap[0]:
+            heapq.heapreplace(self.heap, (score, post_id))
+
+    def floor(self):
+        """Lowest score still ranked, or None while the list is not full."""
+        return self.heap[0][0] if len(self.heap) == self.limit else None
+
+    def ranked(self):
+        return sorted(self.heap, reverse=True)
+
+
+def _scopes():
+    # Scope None is the global list.
+    return [None, *Category.objects.values_list("id", flat=True)]
+
+
+def _empty_tops():
+    return {
+        scope: _TopK(GLOBAL_CATEGORY_LIMIT if scope is None else CATEGORY_HOT_LIMIT)
+        for scope in _scopes()
+    }
+
+
+def _rank(scored):
+    """Top-K per scope from {post_id: (score, category_id)}."""
+    tops = _empty_tops()
+    for post_id, (score, category_id) in scored.items():
+        tops[None].push(score, post_id)
+        if category_id in tops:
+            tops[category_id].push(score, post_id)
+    return tops
+
+
+def _rankings(tops):
+    return {scope: top.ranked() for scope, top in tops.items()}
+
+
+class LeaseLost(Exception):
+    """The pass's fence failed at the flip; its generation was not published."""
+
+
+def _published_generations():
+    return (
+        RankingRun.objects.filter(published_at__isnull=False)
+        .order_by("-published_at")
+        .values_list("id", flat=True)
     )
-    return (engagement + 1.0) / (1.0 + (age_hours / 6.0))
 
 
-def _top_ranked(posts, limit, now):
-    scored = [(trending_score(post, now=now), post) for post in posts]
-    scored.sort(key=lambda item: item[0], reverse=True)
-    return scored[:limit]
+def live_generation():
+    """Id of the RankingRun whose HotPost rows are live, or None before the first pass."""
+    return _published_generations().first()
 
 
-def rebuild_hot_posts():
-    now = timezone.now()
-    all_active_posts = list(
-        Post.objects.filter(is_active=True).select_related("topic", "topic__category")
+async def alive_generation():
+    return await _published_generations().afirst()
+
+
+def cached_live_generation():
+    """Live generation from the cache, or None if it is not cached."""
+    return cache.get(LIVE_GENERATION_CACHE_KEY)
+
+
+async def acached_live_generation():
+    return await cache.aget(LIVE_GENERATION_CACHE_KEY)
+
+
+def remember_live_generation(generation):
+    if generation is not None:
+        cache.set(LIVE_GENERATION_CACHE_KEY, generation, LIVE_GENERATION_CACHE_SECONDS)
+
+
+async def aremember_live_generation(generation):
+    if generation is not None:
+        await cache.aset(LIVE_GENERATION_CACHE_KEY, generation, LIVE_GENERATION_CACHE_SECONDS)
+
+
+def live_hot_posts(generation=None):
+    """HotPost rows of one generation (the live one by default)."""
+    if generation is None:
+        generation = live_generation()
+    if generation is None:
+        return HotPost.objects.none()
+    return HotPost.objects.filter(generation_id=generation)
+
+
+def generation_available(generation):
+    """False once a generation's rows have been collected."""
+    return HotPost.objects.filter(generation_id=generation).exists()
+
+
+async def ageneration_available(generation):
+    return await HotPost.objects.filter(generation_id=generation).aexists()
+
+
+def _hot_page_rows(category_id, limit, after_rank, generation):
+    return (
+        HotPost.objects.filter(
+            generation_id=generation, category_id=category_id, rank__gt=after_rank
+        )
+        .select_related("post", "post__topic", "post__topic__category")
+        .order_by("rank")[: limit + 1]
+    )
+
+
+def _trending_page_rows(horizon, scope, scope_id, limit, after_rank, generation):
+    return (
+        TrendingPost.objects.filter(
+            generation_id=generation,
+            horizon=horizon,
+            scope=scope,
+            scope_id=scope_id,
+            rank__gt=after_rank,
+        )
+        .select_related("post", "post__topic", "post__topic__category")
+        .order_by("rank")[: limit + 1]
+    )
+
+
+def hot_page(category_id, limit, after_rank=0, generation=None):
+    """One page of a hot list (category_id None is the global list), by rank.
+
+    Served by the (generation, category, rank) index, so a deep page costs
+    the same as the first. Returns the rows and whether more follow.
+    """
+    if generation is None:
+        generation = live_generation()
+    rows = list(_hot_page_rows(category_id, limit, after_rank, generation))
+    return rows[:limit], len(rows) > limit
+
+
+async def ahot_page(category_id, limit, after_rank=0, generation=None):
+    if generation is None:
+        generation = await alive_generation()
+    rows = [row async for row in _hot_page_rows(category_id, limit, after_rank, generation)]
+    return rows[:limit], len(rows) > limit
+
+
+def trending_page(horizon, scope, scope_id, limit, after_rank=0, generation=None):
+    """One page of a trending list, by rank; same contract as hot_page()."""
+    if generation is None:
+        generation = live_generation()
+    rows = list(_trending_page_rows(horizon, scope, scope_id, limit, after_rank, generation))
+    return rows[:limit], len(rows) > limit
+
+
+async def atrending_page(horizon, scope, scope_id, limit, after_rank=0, generation=None):
+    if generation is None:
+        generation = await alive_generation()
+    qs = _trending_page_rows(horizon, scope, scope_id, limit, after_rank, generation)
+    rows = [row async for row in qs]
+    return rows[:limit], len(rows) > limit
+
+
+def hot_item(rank, score, post):
+    """One hot-list API item; ``post`` comes with its topic and category."""
+    return {
+        "rank": rank,
+        "score": round(score, 4),
+        "post_id": post.id,
+        "title": post.title,
+        "topic": post.topic.name,
+        "category": post.topic.category.name,
+        "likes": post.likes,
+        "comments": post.comments,
+        "shares": post.shares,
+        "views": post.views,
+        "created_at": post.created_at.isoformat(),
+    }
+
+
+def hot_list_payload(generation, horizon, items, next_cursor, scope=None, scope_name=None):
+    payload = {
+        "generation": generation,
+        "horizon": horizon or None,
+        "count": len(items),
+        "items": items,
+        "next_cursor": next_cursor,
+    }
+    if scope is not None:
+        payload = {scope: scope_name, **payload}
+    return payload
+
+
+def collect_generations(keep=HOT_GENERATIONS_KEPT):
+    """Delete the rows of generations older than the newest ``keep`` published ones.
+
+    Only their HotPost, TrendingPost and HotPayload rows go; the RankingRun
+    rows stay as pass history for RANKING_RUN_RETENTION_DAYS.
+    A reader that looked up the live generation just before a flip keeps
+    reading a complete list, since the previous generations stay around.
+    Generations created later (a pass still being written) are never touched.
+    """
+    kept = list(
+        RankingRun.objects.filter(published_at__isnull=False)
+        .order_by("-published_at")
+        .values_list("id", flat=True)[:keep]
     )
+    if not kept:
+        return 0
+    deleted, _ = HotPost.objects.filter(generation_id__lt=min(kept)).delete()
+    trending_deleted, _ = TrendingPost.objects.filter(generation_id__lt=min(kept)).delete()
+    HotPayload.objects.filter(generation_id__lt=min(kept)).delete()
+    RankingRun.objects.filter(
+        id__lt=min(kept),
+        started_at__lt=timezone.now() - timedelta(days=RANKING_RUN_RETENTION_DAYS),
+    ).delete()
+    return deleted + trending_deleted
+
 
-    HotPost.objects.all().delete()
-    to_create = []
+_LIVE_GENERATION_SQL = """
+    (SELECT id FROM hot_topics_rankingrun
+     WHERE published_at IS NOT NULL ORDER BY published_at DESC LIMIT 1)
+"""
 
-    global_top = _top_ranked(all_active_posts, GLOBAL_CATEGORY_LIMIT, now)
-    for idx, (score, post) in enumerate(global_top, start=1):
-        to_create.append(HotPost(category=None, post=post, score=score, rank=idx))
+# Global rows first (no category), then every category with its top rows;
+# LEFT JOIN keeps categories that have no hot posts.
+_LANDING_SQL = """
+    SELECT NULL, NULL, NULL, h.generation_id, h.rank, h.score, h.post_id, p.title, t.name, tc.name
+    FROM hot_topics_hotpost h
+    JOIN hot_topics_post p ON p.id = h.post_id
+    JOIN hot_topics_topic t ON t.id = p.topic_id
+    JOIN hot_topics_category tc ON tc.id = t.category_id
+    WHERE h.generation_id = {generation} AND h.category_id IS NULL AND h.rank <= %s
+    UNION ALL
+    SELECT c.id, c.name, c.slug, h.generation_id, h.rank, h.score, h.post_id, p.title, NULL, NULL
+    FROM hot_topics_category c
+    LEFT JOIN hot_topics_hotpost h
+        ON h.category_id = c.id AND h.generation_id = {generation} AND h.rank <= %s
+    LEFT JOIN hot_topics_post p ON p.id = h.post_id
+    ORDER BY 2, 5
+"""
 
-    for category in Category.objects.all():
-        cat_posts = [p for p in all_active_posts if p.topic.category_id == category.id]
-        cat_top = _top_ranked(cat_posts, CATEGORY_HOT_LIMIT, now)
-        for idx, (score, post) in enumerate(cat_top, start=1):
-            to_create.append(
-                HotPost(category=category, post=post, score=score, rank=idx)
+
+def landing_sections(generation=None):
+    """Global top list and every category's top LANDING_CATEGORY_LIMIT, in one query.
+
+    With ``generation`` None the live generation is resolved inside the same
+    query. Returns plain dicts plus the generation the rows came from.
+    """
+    if generation is None:
+        sql, params = _LANDING_SQL.format(generation=_LIVE_GENERATION_SQL), []
+    else:
+        sql, params = _LANDING_SQL.format(generation="%s"), [generation]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, LANDING_GLOBAL_LIMIT, *params, LANDING_CATEGORY_LIMIT])
+        rows = cursor.fetchall()
+
+    global_hot, sections = [], {}
+    for row in rows:
+        category_id, name, slug, row_generation, rank, score = row[:6]
+        post_id, title, topic, topic_category = row[6:]
+        if row_generation is not None:
+            generation = row_generation
+        item = {"rank": rank, "score": score, "post_id": post_id, "title": title}
+        if category_id is None:
+            global_hot.append({**item, "topic": topic, "category": topic_category})
+            continue
+        section = sections.get(category_id)
+        if section is None:
+            section = sections[category_id] = {
+                "category": {"id": category_id, "name": name, "slug": slug},
+                "top_posts": [],
+            }
+        if post_id is not None:
+            section["top_posts"].append(item)
+    return {
+        "generation": generation,
+        "global_hot": global_hot,
+        "category_sections": list(sections.values()),
+    }
+
+
+def _write_payloads(run, rankings):
+    """Serialize the first page of the landing and category hot-list APIs.
+
+    The bytes match what the API builds for a request without parameters.
+    """
+    limit = DEFAULT_PAGE_SIZE
+    post_ids = {post_id for ranked in rankings.values() for _, post_id in ranked[:limit]}
+    posts = Post.objects.select_related("topic__category").in_bulk(post_ids)
+    categories = Category.objects.in_bulk([scope for scope in rankings if scope is not None])
+    rows = []
+    for scope, ranked in rankings.items():
+        if scope is not None and scope not in categories:
+            continue
+        items = [
+            hot_item(rank, score, posts[post_id])
+            for rank, (score, post_id) in enumerate(ranked[:limit], start=1)
+        ]
+        more = len(ranked) > limit
+        next_cursor = encode_cursor("hot", [run.id, items[-1]["rank"]]) if more else None
+        if scope is None:
+            key, payload = "landing", hot_list_payload(run.id, "", items, next_cursor)
+        else:
+            category = categories[scope]
+            key = f"category:{category.slug}"
+            payload = hot_list_payload(
+                run.id, "", items, next_cursor, "category", category.name
             )
+        body = json.dumps(payload, cls=DjangoJSONEncoder).encode("utf-8")
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        rows.append(HotPayload(generation=run, key=key, body=body, etag=etag))
+    HotPayload.objects.bulk_create(rows)
+
+
+_payloads = OrderedDict()
+_payloads_lock = threading.Lock()
+
+
+def hot_payload(generation, key):
+    """Precomputed API response ``key`` of ``generation``, or None.
+
+    Returns {"body", "etag", "last_modified"}. Payloads never change once
+    their generation is published, so each process keeps them in memory
+    (misses included) and only the first request per key reads the database.
+    """
+    found, entry = _memo_payload(generation, key)
+    if found:
+        return entry
+    return _remember_payload(generation, key, _payload_row(generation, key).first())
+
+
+async def ahot_payload(generation, key):
+    found, entry = _memo_payload(generation, key)
+    if found:
+        return entry
+    return _remember_payload(generation, key, await _payload_row(generation, key).afirst())
+
+
+def _payload_row(generation, key):
+    return HotPayload.objects.filter(generation_id=generation, key=key).values_list(
+        "body", "etag", "generation__started_at"
+    )
+
+
+def _memo_payload(generation, key):
+    with _payloads_lock:
+        if (generation, key) in _payloads:
+            _payloads.move_to_end((generation, key))
+            return True, _payloads[(generation, key)]
+    return False, None
+
+
+def _remember_payload(generation, key, row):
+    entry = None
+    if row is not None:
+        body, etag, computed_at = row
+        entry = {
+            "body": bytes(body),
+            "etag": etag,
+            "last_modified": int(computed_at.timestamp()),
+        }
+    with _payloads_lock:
+        _payloads[(generation, key)] = entry
+        while len(_payloads) > HOT_PAYLOAD_MEMO_SIZE:
+            _payloads.popitem(last=False)
+    return entry
+
 
-    HotPost.objects.bulk_create(to_create, batch_size=500)
+def _write_scores(post_ids, scores):
+    # Inactive posts get NULL so they never come back as boundary candidates.
+    # A plain executemany: bulk_update's CASE WHEN per row is far slower here.
+    table = connection.ops.quote_name(Post._meta.db_table)
+    column = connection.ops.quote_name(Post._meta.get_field("hot_score").column)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {table} SET {column} = %s WHERE id = %s", list(zip(scores, post_ids))
+        )
+
+
+def _write_history(created, changed):
+    EngagementHistory.objects.bulk_create(created, batch_size=SCORE_WRITE_BATCH_SIZE)
+    quote = connection.ops.quote_name
+    table = quote(EngagementHistory._meta.db_table)
+    columns = ", ".join(f"{quote(name)} = %s" for name in ("last_slot", "baseline", "deltas"))
+    with connection.cursor() as cursor:
+        cursor.executemany(f"UPDATE {table} SET {columns} WHERE {quote('post_id')} = %s", changed)
+
+
+def record_snapshots(now, since=None):
+    """Add what each post changed since ``since`` gained to its snapshot ring.
+
+    The gain is the post's weighted engagement minus the ring's baseline, so
+    reading a post twice never counts it twice. A post without a ring starts
+    one: when it is newer than the ring's span all its engagement counts as
+    recent, otherwise only the baseline is set. ``since`` None (no earlier
+    velocity pass, so rings may have missed engagement) visits every post
+    and rebases existing rings without a gain. Posts are read in id order,
+    one closed query per chunk, so no cursor is open while the write lane
+    commits. Returns the number of rings written.
+    """
+    slot = snapshot_slot(now)
+    recent_from = now - timedelta(seconds=history_span_seconds())
+    qs = Post.objects.all()
+    if since is not None:
+        qs = qs.filter(updated_at__gte=since)
+    qs = qs.order_by("id").values_list("id", "created_at", "likes", "comments", "shares", "views")
+    written, after = 0, 0
+    while rows := list(qs.filter(id__gt=after)[:HISTORY_IDS_PER_QUERY]):
+        after = rows[-1][0]
+        rings = {
+            post_id: ring
+            for post_id, *ring in EngagementHistory.objects.filter(
+                post_id__in=[row[0] for row in rows]
+            ).values_list("post_id", "last_slot", "baseline", "deltas")
+        }
+        created, changed = [], []
+        for post_id, created_at, likes, comments, shares, views in rows:
+            value = _engagement(likes, comments, shares, views)
+            ring = rings.get(post_id)
+            if ring is None:
+                deltas, last_slot = advance(
+                    None, None, slot, value if created_at >= recent_from else 0.0
+                )
+                created.append(
+                    EngagementHistory(
+                        post_id=post_id, last_slot=last_slot, baseline=value, deltas=pack(deltas)
+                    )
+                )
+                continue
+            last_slot, baseline, packed = ring
+            if value == baseline:
+                continue
+            # A lowered counter only moves the baseline: gains are never negative.
+            gain = max(value - baseline, 0.0) if since is not None else 0.0
+            deltas, last_slot = advance(unpack(packed), last_slot, slot, gain)
+            changed.append((last_slot, value, pack(deltas), post_id))
+        if created or changed:
+            write_lane.run(_write_history, created, changed)
+            written += len(created) + len(changed)
+    return written
+
+
+def _snapshot_since(last):
+    # Only velocity passes keep the rings current.
+    if last is not None and last.scoring == "velocity":
+        return last.started_at
+    return None
+
+
+def rank_trending(now):
+    """Top TRENDING_LIMIT for every (horizon, scope) from one scan of recent posts.
+
+    Each active post created within the longest horizon is scored once per
+    horizon it falls in and pushed into the global, category and topic heaps
+    of that horizon. Returns {(horizon, scope, scope_id): [(score, post_id)]}.
+    """
+    horizons = [
+        (name, now - window, decay_hours)
+        for name, (window, decay_hours) in TRENDING_HORIZONS.items()
+    ]
+    oldest = min(start for _, start, _ in horizons)
+    tops = defaultdict(lambda: _TopK(TRENDING_LIMIT))
+    qs = (
+        Post.objects.filter(is_active=True, created_at__gte=oldest)
+        .values_list(
+            "id",
+            "topic_id",
+            "topic__category_id",
+            "likes",
+            "comments",
+            "shares",
+            "views",
+            "created_at",
+        )
+        .order_by()
+    )
+    for post_id, topic_id, category_id, likes, comments, shares, views, created_at in qs.iterator(
+        chunk_size=SCORE_READ_CHUNK_SIZE
+    ):
+        boosted = _engagement(likes, comments, shares, views) + 1.0
+        age_hours = max((now - created_at).total_seconds() / 3600.0, 0.0)
+        for name, start, decay_hours in horizons:
+            if created_at < start:
+                continue
+            score = boosted / (1.0 + (age_hours / decay_hours))
+            tops[(name, "global", None)].push(score, post_id)
+            tops[(name, "category", category_id)].push(score, post_id)
+            tops[(name, "topic", topic_id)].push(score, post_id)
+    return {key: top.ranked() for key, top in tops.items()}
+
+
+def _publish(mode, scoring, now, rankings, scored_count, fence=None):
+    """Write a new generation (hot and trending lists, API payloads), flip it live.
+
+    Old generations are collected afterwards.
+
+    ``fence`` is checked in the flip's transaction; when it returns False the
+    generation is deleted unpublished and LeaseLost is raised.
+    """
+    trending = rank_trending(now)
+
+    def write_generation():
+        run = RankingRun.objects.create(mode=mode, scoring=scoring, started_at=now)
+        rows = [
+            HotPost(generation=run, category_id=scope, post_id=post_id, score=score, rank=rank)
+            for scope, ranked in rankings.items()
+            for rank, (score, post_id) in enumerate(ranked, start=1)
+        ]
+        HotPost.objects.bulk_create(rows, batch_size=500)
+        TrendingPost.objects.bulk_create(
+            [
+                TrendingPost(
+                    generation=run,
+                    horizon=horizon,
+                    scope=scope,
+                    scope_id=scope_id,
+                    post_id=post_id,
+                    score=score,
+                    rank=rank,
+                )
+                for (horizon, scope, scope_id), ranked in trending.items()
+                for rank, (score, post_id) in enumerate(ranked, start=1)
+            ],
+            batch_size=500,
+        )
+        _write_payloads(run, rankings)
+        return run, len(rows)
+
+    run, row_count = write_lane.run(write_generation)
+    # The flip: one UPDATE; readers see either the old or the new complete list.
+    published_at = timezone.now()
+    duration_ms = round((published_at - now).total_seconds() * 1000.0, 3)
+
+    def flip():
+        with transaction.atomic():
+            if fence is not None and not fence():
+                run.delete()
+                return False
+            RankingRun.objects.filter(id=run.id).update(
+                finished_at=published_at,
+                published_at=published_at,
+                posts_scored=scored_count,
+                hot_rows_written=row_count,
+                duration_ms=duration_ms,
+            )
+            return True
+
+    if not write_lane.run(flip):
+        raise LeaseLost(f"generation {run.id} was not published")
+    remember_live_generation(run.id)
+    write_lane.run(collect_generations)
+
+    global_count = len(rankings[None])
     return {
-        "global_count": len(global_top),
-        "category_count": len(to_create) - len(global_top),
+        "mode": mode,
+        "scoring": scoring,
+        "generation": run.id,
+        "global_count": global_count,
+        "category_count": row_count - global_count,
+        "posts_scored": scored_count,
+        "trending_lists": len(trending),
+        "duration_ms": duration_ms,
         "computed_at": now,
     }
+
+
+def _score_all_heap(now, scoring="decay"):
+    tops = _empty_tops()
+    velocities = recent_velocities(snapshot_slot(now)) if scoring == "velocity" else None
+    post_ids, scores = array("q"), array("d")
+    qs = Post.objects.values_list(*_SCORE_FIELDS).order_by()
+    for post_id, category_id, is_active, likes, comments, shares, views, created_at in qs.iterator(
+        chunk_size=SCORE_READ_CHUNK_SIZE
+    ):
+        post_ids.append(post_id)
+        if not is_active:
+            scores.append(math.nan)
+            continue
+        score = _hot_score(
+            _score(likes, comments, shares, views, created_at, now),
+            velocities.get(post_id, 0.0) if velocities is not None else None,
+        )
+        scores.append(score)
+        tops[None].push(score, post_id)
+        if category_id in tops:
+            tops[category_id].push(score, post_id)
+    return _rankings(tops), post_ids, scores
+
+
+def _top_indices(scores, ids, candidates, limit):
+    """Indices of the best ``limit`` candidates, best first (ties: higher id)."""
+    if len(candidates) > limit:
+        values = scores[candidates]
+        kth = values[np.argpartition(values, -limit)[-limit]]
+        # Keep every tie with the cut-off so the tie-break below is exact.
+        candidates = candidates[values >= kth]
+    order = np.lexsort((ids[candidates], scores[candidates]))[::-1][:limit]
+    return candidates[order]
+
+
+def _post_columns():
+    """Every post as numpy columns, read off the cursor in chunks (no row objects)."""
+    # created_at comes back as text (UTC) and numpy parses it, which skips the
+    # per-row datetime conversion that dominates a plain values_list() scan.
+    qs = (
+        Post.objects.order_by()
+        .annotate(created_text=Cast("created_at", CharField()))
+        .values_list(*_SCORE_FIELDS[:-1], "created_text")
+    )
+    sql, params = qs.query.sql_with_params()
+    chunks = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(SCORE_READ_CHUNK_SIZE):
+            ids, categories, active, likes, comments, shares, views, created = zip(*rows)
+            chunks.append(
+                (
+                    np.array(ids, dtype=np.int64),
+                    np.array(categories, dtype=np.int64),
+                    np.array(active, dtype=bool),
+                    *(
+                        np.array(column, dtype=np.float64)
+                        for column in (likes, comments, shares, views)
+                    ),
+                    np.array(created, dtype="datetime64[us]").astype(np.int64) / 1e6,
+                )
+            )
+    if not chunks:
+        dtypes = (np.int64, np.int64, bool) + (np.float64,) * 5
+        return [np.empty(0, dtype=dtype) for dtype in dtypes]
+    return [np.concatenate(column) for column in zip(*chunks)]
+
+
+def _velocity_column(ids, now):
+    """Velocity of each post in ``ids`` (0 without recent engagement)."""
+    history_ids, values = recent_velocity_columns(snapshot_slot(now))
+    column = np.zeros(len(ids))
+    if len(history_ids) and len(ids):
+        order = np.argsort(ids)
+        positions = np.minimum(np.searchsorted(ids, history_ids, sorter=order), len(ids) - 1)
+        indices = order[positions]
+        # Histories of posts deleted since the post scan have no match.
+        found = ids[indices] == history_ids
+        column[indices[found]] = values[found]
+    return column
+
+
+def _score_all_vectorized(now, scoring="decay"):
+    """One vectorized scoring pass, then argpartition per scope."""
+    ids, categories, live_mask, likes, comments, shares, views, created = _post_columns()
+    age_hours = np.maximum((now.timestamp() - created) / 3600.0, 0.0)
+    engagement = likes + (2.0 * comments) + (3.0 * shares) + (0.05 * np.log1p(views))
+    scores = (engagement + 1.0) / (1.0 + (age_hours / 6.0))
+    if scoring == "velocity":
+        scores = _velocity_column(ids, now) + (VELOCITY_BASE_WEIGHT * scores)
+    scores = np.where(live_mask, scores, np.nan)
+
+    def ranked(indices):
+        return [(float(scores[i]), int(ids[i])) for i in indices]
+
+    live = np.flatnonzero(live_mask)
+    rankings = {scope: [] for scope in _scopes()}
+    rankings[None] = ranked(_top_indices(scores, ids, live, GLOBAL_CATEGORY_LIMIT))
+    by_category = live[np.argsort(categories[live], kind="stable")]
+    bounds = np.flatnonzero(np.diff(categories[by_category])) + 1
+    groups = np.split(by_category, bounds) if len(by_category) else []
+    for group in groups:
+        category_id = int(categories[group[0]])
+        if category_id in rankings:
+            rankings[category_id] = ranked(_top_indices(scores, ids, group, CATEGORY_HOT_LIMIT))
+    return rankings, ids.tolist(), scores.tolist()
+
+
+def rebuild_hot_posts(vectorized=None, fence=None):
+    """Score every post, then rewrite all rankings (the full fallback).
+
+    Posts are streamed in chunks and never become model instances. With
+    numpy available (``vectorized`` defaults to that) the columns go into
+    flat arrays and are scored in one pass, with argpartition selecting each
+    top list; otherwise each post is scored in Python into bounded heaps.
+    Every post's hot_score is refreshed, which re-arms the bound incremental
+    passes rely on. In velocity scoring the snapshot rings are brought up to
+    date first. ``fence`` guards the flip (see _publish).
+    """
+    if vectorized is None:
+        vectorized = np is not None
+    scoring = scoring_mode()
+    now = timezone.now()
+    snapshots = 0
+    if scoring == "velocity":
+        last = RankingRun.objects.filter(id=live_generation()).first()
+        snapshots = record_snapshots(now, _snapshot_since(last))
+    if vectorized:
+        rankings, post_ids, scores = _score_all_vectorized(now, scoring)
+    else:
+        rankings, post_ids, scores = _score_all_heap(now, scoring)
+
+    for start in range(0, len(post_ids), SCORE_WRITE_BATCH_SIZE):
+        end = start + SCORE_WRITE_BATCH_SIZE
+        write_lane.run(
+            _write_scores,
+            post_ids[start:end],
+            [None if math.isnan(score) else score for score in scores[start:end]],
+        )
+
+    return {
+        **_publish("full", scoring, now, rankings, len(post_ids), fence),
+        "snapshots": snapshots,
+    }
+
+
+def _score_rows(qs, scored, inactive, now, scoring="decay"):
+    rows = [
+        row
+        for row in qs.values_list(*_SCORE_FIELDS)
+        if row[0] not in scored and row[0] not in inactive
+    ]
+    velocities = None
+    if scoring == "velocity":
+        velocities = velocities_for([row[0] for row in rows if row[2]], snapshot_slot(now))
+    for post_id, category_id, is_active, likes, comments, shares, views, created_at in rows:
+        if is_active:
+            scored[post_id] = (
+                _hot_score(
+                    _score(likes, comments, shares, views, created_at, now),
+                    velocities.get(post_id, 0.0) if velocities is not None else None,
+                ),
+                category_id,
+            )
+        else:
+            inactive.add(post_id)
+
+
+def refresh_hot_posts(fence=None):
+    """Incremental pass: rescore only what can change the rankings.
+
+    That is posts updated since the last pass, the current HotPost members,
+    and posts whose stored hot_score reaches a scope's current top-K floor.
+    Any other post scored at most its stored hot_score (both scoring modes
+    only decay while engagement stands still), which is already below the
+    floor, so the result equals a full rebuild. Falls back to
+    rebuild_hot_posts() when no pass has run yet or the live one used
+    another scoring mode.
+    """
+    scoring = scoring_mode()
+    last = RankingRun.objects.filter(id=live_generation()).first()
+    if last is None or last.scoring != scoring:
+        return rebuild_hot_posts(fence=fence)
+
+    now = timezone.now()
+    snapshots = 0
+    if scoring == "velocity":
+        snapshots = record_snapshots(now, last.started_at)
+    scored, inactive = {}, set()
+    changed = Post.objects.filter(updated_at__gte=last.started_at)
+    _score_rows(changed, scored, inactive, now, scoring)
+    member_ids = set(live_hot_posts(last.id).values_list("post_id", flat=True))
+    _score_rows(Post.objects.filter(id__in=member_ids), scored, inactive, now, scoring)
+
+    tops = _rank(scored)
+    for scope, top in tops.items():
+        candidates = Post.objects.filter(is_active=True, hot_score__isnull=False)
+        if scope is not None:
+            candidates = candidates.filter(topic__category_id=scope)
+        floor = top.floor()
+        if floor is not None:
+            candidates = candidates.filter(hot_score__gte=floor)
+        _score_rows(candidates, scored, inactive, now, scoring)
+    # Adding candidates can only raise each floor, so one more ranking is final.
+    rankings = _rankings(_rank(scored))
+
+    write_lane.run(
+        _write_scores,
+        [*scored, *inactive],
+        [score for score, _ in scored.values()] + [None] * len(inactive),
+    )
+    return {
+        **_publish("incremental", scoring, now, rankings, len(scored) + len(inactive), fence),
+        "snapshots": snapshots,
+    }
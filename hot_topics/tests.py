@@ -1,3 +1,275 @@
-from django.test import TestCase
+import json
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from telemetry.models import AppClient
+from telemetry.services import clear_client_cache, sign_payload
+
+from . import services
+from .models import Category, HotPost, Post, Topic
+from .pagination import encode_cursor
+from .search import search_cache, search_posts
+from .services import rebuild_hot_posts, refresh_hot_posts
+
+
+def frozen(moment):
+    return mock.patch("django.utils.timezone.now", return_value=moment)
+
+
+def make_post(topic, title, body="", **counters):
+    return Post.objects.create(topic=topic, title=title, body=body or title, **counters)
+
+
+@override_settings(TELEMETRY_SELF_INSTRUMENT=False)
+class HotTopicsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        search_cache.clear()
+        self.tech = Category.objects.create(name="Technology")
+        self.sports = Category.objects.create(name="Sports")
+        self.tools = Topic.objects.create(category=self.tech, name="Dev Tools")
+        self.football = Topic.objects.create(category=self.sports, name="Football")
+
+
+class SearchTests(HotTopicsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.python_posts = [
+            make_post(self.tools, "Python packaging guide"),
+            make_post(self.tools, "Python web frameworks compared"),
+            make_post(self.tools, "Pythonic idioms", "Writing idiomatic code for the web"),
+        ]
+        make_post(self.tools, "Rust ownership explained")
+        make_post(self.football, "Monty Python and the offside rule")
+
+    def test_results_stay_in_their_category(self):
+        ids = {post.id for post in search_posts(self.tech, "python")}
+        self.assertEqual(ids, {post.id for post in self.python_posts})
+
+    def test_category_tag_is_not_searchable(self):
+        self.assertEqual(search_posts(self.tech, f"c{self.tech.id}"), [])
+        self.assertEqual(search_posts(self.sports, f"c{self.sports.id}"), [])
+
+    def test_inactive_posts_are_not_returned(self):
+        hidden = self.python_posts[0]
+        hidden.is_active = False
+        hidden.save()
+        self.assertNotIn(hidden.id, [post.id for post in search_posts(self.tech, "python")])
+
+    def test_refined_results_match_a_fresh_search(self):
+        search_cache.search(self.tech, "py")
+        for q in ("pyth", "python", "python web", "pythonic"):
+            with self.subTest(q=q):
+                refined_before = search_cache.stats()["refined"]["count"]
+                cached = {hit.id for hit in search_cache.search(self.tech, q)}
+                self.assertEqual(search_cache.stats()["refined"]["count"], refined_before + 1)
+                self.assertEqual(cached, {post.id for post in search_posts(self.tech, q)})
+
+    def test_repeated_search_is_a_hit(self):
+        first = [hit.id for hit in search_cache.search(self.tech, "python")]
+        second = [hit.id for hit in search_cache.search(self.tech, "python")]
+        self.assertEqual(first, second)
+        self.assertEqual(search_cache.stats()["hit"]["count"], 1)
+
+
+class KeysetPagingTests(HotTopicsTestCase):
+    def setUp(self):
+        super().setUp()
+        base = timezone.now() - timedelta(hours=2)
+        self.posts = []
+        for i in range(7):
+            # Pairs share a created_at, so paging relies on the id tiebreak.
+            with frozen(base + timedelta(minutes=i // 2)):
+                self.posts.append(
+                    make_post(self.tools, f"Release notes part {i}", likes=i * 3 + 1)
+                )
+        make_post(self.football, "Release of the season fixtures")
+
+    def collect(self, url, **params):
+        ids, cursor = [], None
+        for _ in range(20):
+            query = dict(params, limit=2)
+            if cursor:
+                query["cursor"] = cursor
+            response = self.client.get(url, query)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertLessEqual(body["count"], 2)
+            ids.extend(item["post_id"] for item in body["items"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return ids
+        self.fail("paging did not terminate")
+
+    def test_latest_pages_cover_every_post_once(self):
+        ids = self.collect("/api/category/technology/search/")
+        expected = sorted(self.posts, key=lambda post: (post.created_at, post.id), reverse=True)
+        self.assertEqual(ids, [post.id for post in expected])
+
+    def test_search_pages_match_the_unpaged_order(self):
+        ids = self.collect("/api/category/technology/search/", q="release")
+        self.assertEqual(ids, [post.id for post in search_posts(self.tech, "release", 50)])
+        self.assertEqual(len(set(ids)), len(self.posts))
+
+    def test_hot_pages_follow_rank_order(self):
+        rebuild_hot_posts()
+        ids = self.collect("/api/category/technology/hot/")
+        expected = sorted(self.posts, key=lambda post: post.likes, reverse=True)
+        self.assertEqual(ids, [post.id for post in expected])
+
+    def test_bad_search_cursors_are_rejected(self):
+        url = "/api/category/technology/search/"
+        cases = [
+            {"cursor": "not-a-cursor!"},
+            # A cursor from the other listing.
+            {"q": "release", "cursor": encode_cursor("latest", [timezone.now().isoformat(), 1])},
+            {"q": "release", "cursor": encode_cursor("search", ["x"])},
+            {"cursor": encode_cursor("latest", ["yesterday", 1])},
+            {"cursor": encode_cursor("latest", ["2026-01-01T00:00:00", 1])},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["error"], "Invalid cursor")
+
+    def test_bad_hot_cursors_are_rejected(self):
+        rebuild_hot_posts()
+        url = "/api/category/technology/hot/"
+        for cursor in ("%%%", encode_cursor("hot", [1]), encode_cursor("hot-day", [1, 2])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(url, {"cursor": cursor}).status_code, 400)
+        expired = encode_cursor("hot", [10**9, 2])
+        self.assertEqual(self.client.get(url, {"cursor": expired}).status_code, 410)
+
+
+class EngagementReplayTests(HotTopicsTestCase):
+    def setUp(self):
+        super().setUp()
+        clear_client_cache()
+        suffix = uuid.uuid4().hex
+        self.app = AppClient.objects.create(
+            name=f"engagement-{suffix}", api_key=f"key-{suffix}", secret=f"secret-{suffix}"
+        )
+        self.post = make_post(self.tools, "Replay target")
+        # Keep the flusher thread out of the test transaction.
+        patcher = mock.patch("hot_topics.views.engagement_buffer")
+        self.buffer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, raw, timestamp):
+        return self.client.post(
+            "/api/engagement/",
+            data=raw,
+            content_type="application/json",
+            HTTP_X_API_KEY=self.app.api_key,
+            HTTP_X_TIMESTAMP=str(timestamp),
+            HTTP_X_SIGNATURE=sign_payload(self.app.secret, timestamp, raw),
+        )
+
+    def test_replayed_request_is_refused(self):
+        raw = json.dumps({"post_id": self.post.id, "type": "like"}).encode("utf-8")
+        timestamp = int(time.time())
+        self.assertEqual(self.send(raw, timestamp).status_code, 202)
+
+        response = self.send(raw, timestamp)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.buffer.add.call_count, 1)
+
+    def test_nonce_makes_a_repeat_distinct(self):
+        timestamp = int(time.time())
+        for nonce in ("a", "b"):
+            raw = json.dumps({"post_id": self.post.id, "type": "like", "nonce": nonce})
+            self.assertEqual(self.send(raw.encode("utf-8"), timestamp).status_code, 202)
+        self.assertEqual(self.buffer.add.call_count, 2)
+
+    def test_rejected_request_can_be_retried(self):
+        raw = json.dumps({"post_id": self.post.id, "type": "nope"}).encode("utf-8")
+        timestamp = int(time.time())
+        self.assertEqual(self.send(raw, timestamp).status_code, 400)
+        # Only accepted signatures are remembered.
+        self.assertEqual(self.send(raw, timestamp).status_code, 400)
+        self.buffer.add.assert_not_called()
+
+
+@mock.patch.object(services, "GLOBAL_CATEGORY_LIMIT", 3)
+@mock.patch.object(services, "CATEGORY_HOT_LIMIT", 3)
+class RankingParityTests(HotTopicsTestCase):
+    """An incremental pass publishes the same lists a full rebuild would.
+
+    The limits are lowered so every list is full, and one category's whole
+    list is hidden: its replacements are neither changed nor members, so
+    the incremental pass can only find them through its hot_score floors.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        self.posts = []
+        for i in range(24):
+            topic = self.tools if i % 3 else self.football
+            with frozen(self.start - timedelta(minutes=17 * i)):
+                self.posts.append(
+                    make_post(
+                        topic,
+                        f"Post {i}",
+                        likes=(i * 37) % 101,
+                        comments=(i * 11) % 13,
+                        shares=i % 5,
+                        views=1000 + i,
+                    )
+                )
+
+    def hot_rows(self, generation):
+        return list(
+            HotPost.objects.filter(generation_id=generation)
+            .order_by("category_id", "rank")
+            .values_list("category_id", "rank", "post_id", "score")
+        )
+
+    def change_engagement(self, moment):
+        with frozen(moment):
+            # An old, low-ranked post takes off.
+            Post.objects.filter(id=self.posts[20].id).update(likes=400, updated_at=moment)
+            for leader in Post.objects.filter(topic=self.football).order_by("-hot_score")[:3]:
+                leader.is_active = False
+                leader.save()
+            make_post(self.football, "Breaking", likes=60, comments=4)
+            post = self.posts[7]
+            post.comments += 25
+            post.save()
+
+    def assertSameRankings(self, incremental, full):
+        self.assertEqual([row[:3] for row in incremental], [row[:3] for row in full])
+        for left, right in zip(incremental, full):
+            self.assertAlmostEqual(left[3], right[3], places=9)
+
+    def check_parity(self):
+        with frozen(self.start):
+            self.assertEqual(rebuild_hot_posts()["mode"], "full")
+        self.change_engagement(self.start + timedelta(minutes=25))
+
+        later = self.start + timedelta(minutes=40)
+        with frozen(later):
+            result = refresh_hot_posts()
+            self.assertEqual(result["mode"], "incremental")
+            incremental = self.hot_rows(result["generation"])
+            for vectorized in (False, True):
+                with self.subTest(vectorized=vectorized):
+                    full = self.hot_rows(rebuild_hot_posts(vectorized=vectorized)["generation"])
+                    self.assertSameRankings(incremental, full)
+        self.assertTrue(incremental)
+
+    @override_settings(HOT_TOPICS_SCORING="decay")
+    def test_decay_scoring(self):
+        self.check_parity()
+
+    @override_settings(HOT_TOPICS_SCORING="velocity")
+    def test_velocity_scoring(self):
+        self.check_parity()
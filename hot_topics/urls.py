@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+# Read-only JSON endpoints: async views under ASGI (see ASYNC_API_VIEWS).
+api = async_views if getattr(settings, "ASYNC_API_VIEWS", False) else views
 
 urlpatterns = [
     path("", views.home, name="hot_topics_home"),
@@ -10,10 +14,27 @@ urlpatterns = [
         views.category_search_partial,
         name="hot_topics_category_search_partial",
     ),
-    path("api/hot-topics/", views.api_hot_landing, name="api_hot_topics_landing"),
+    path("api/hot-topics/", api.api_hot_landing, name="api_hot_topics_landing"),
+    path(
+        "api/hot-topics/search-cache/",
+        api.api_search_cache_stats,
+        name="api_hot_topics_search_cache",
+    ),
+    path(
+        "api/category/<slug:slug>/hot/",
+        api.api_category_hot,
+        name="api_hot_topics_category_hot",
+    ),
+    path("api/topic/<slug:slug>/hot/", api.api_topic_hot, name="api_hot_topics_topic_hot"),
     path(
         "api/category/<slug:slug>/search/",
-        views.api_category_search,
+        api.api_category_search,
         name="api_hot_topics_category_search",
     ),
+    path("api/engagement/", views.api_engagement, name="api_hot_topics_engagement"),
+    path(
+        "api/engagement/stats/",
+        api.api_engagement_stats,
+        name="api_hot_topics_engagement_stats",
+    ),
 ]
@@ -0,0 +1,133 @@
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # numpy ships with pandas; velocities are then summed in Python
+    np = None
+
+from .models import EngagementHistory
+
+# One ring slot per SNAPSHOT_SLOT_SECONDS, SNAPSHOT_SLOTS per post (two hours
+# of history, 96 bytes). Changing either makes stored rings unreadable.
+SNAPSHOT_SLOT_SECONDS = 300
+SNAPSHOT_SLOTS = 24
+# (slots, weight): each window adds weight x engagement gained per hour over
+# its last ``slots`` slots. Weights only shrink with age, so a post's
+# velocity never grows while its engagement stands still.
+VELOCITY_WINDOWS = ((3, 0.5), (12, 0.3), (24, 0.2))
+# Share of the decay score kept in velocity mode; orders posts with no
+# recent engagement.
+VELOCITY_BASE_WEIGHT = 0.1
+# Ids per history lookup; stays under SQLite's bound-parameter limit.
+HISTORY_IDS_PER_QUERY = 500
+HISTORY_READ_CHUNK_SIZE = 5000
+
+_PACKED = struct.Struct(f"<{SNAPSHOT_SLOTS}f")
+_SLOT_HOURS = SNAPSHOT_SLOT_SECONDS / 3600.0
+# Weight of a gain by its age in slots; ages past the ring weigh 0.
+_AGE_WEIGHTS = [
+    sum(weight / (slots * _SLOT_HOURS) for slots, weight in VELOCITY_WINDOWS if age < slots)
+    for age in range(SNAPSHOT_SLOTS)
+] + [0.0]
+
+
+def snapshot_slot(now):
+    return int(now.timestamp() // SNAPSHOT_SLOT_SECONDS)
+
+
+def history_span_seconds():
+    return SNAPSHOT_SLOT_SECONDS * SNAPSHOT_SLOTS
+
+
+def pack(deltas):
+    return _PACKED.pack(*deltas)
+
+
+def unpack(packed):
+    return list(_PACKED.unpack(bytes(packed)))
+
+
+def advance(deltas, last_slot, slot, gain):
+    """``deltas`` moved forward to ``slot`` with ``gain`` added there.
+
+    Slots skipped since ``last_slot`` are cleared: nothing was gained in
+    them. ``deltas`` None starts an empty ring. A slot behind ``last_slot``
+    (clock skew between hosts) counts as ``last_slot``. Without a gain the
+    ring stays where it is, so rings of quiet posts age out of the recent
+    reads.
+    """
+    if not gain:
+        if deltas is None:
+            return [0.0] * SNAPSHOT_SLOTS, max(slot - SNAPSHOT_SLOTS, 0)
+        return deltas, last_slot
+    slot = max(slot, last_slot) if last_slot is not None else slot
+    if deltas is None or slot - last_slot >= SNAPSHOT_SLOTS:
+        deltas = [0.0] * SNAPSHOT_SLOTS
+    else:
+        for skipped in range(last_slot + 1, slot + 1):
+            deltas[skipped % SNAPSHOT_SLOTS] = 0.0
+    deltas[slot % SNAPSHOT_SLOTS] += gain
+    return deltas, slot
+
+
+def velocity(last_slot, packed, slot):
+    """Weighted engagement gained per hour over the VELOCITY_WINDOWS, as of ``slot``."""
+    lag = max(slot - last_slot, 0)
+    if lag >= SNAPSHOT_SLOTS:
+        return 0.0
+    total = 0.0
+    for index, delta in enumerate(unpack(packed)):
+        age = lag + (last_slot - index) % SNAPSHOT_SLOTS
+        if delta and age < SNAPSHOT_SLOTS:
+            total += delta * _AGE_WEIGHTS[age]
+    return total
+
+
+def _recent(slot):
+    # Rings whose newest slot has aged out of every window score 0.
+    return (
+        EngagementHistory.objects.filter(last_slot__gt=slot - SNAPSHOT_SLOTS)
+        .values_list("post_id", "last_slot", "deltas")
+        .order_by()
+    )
+
+
+def recent_velocities(slot):
+    """{post_id: velocity} for every post with engagement inside the ring."""
+    return {
+        post_id: velocity(last_slot, packed, slot)
+        for post_id, last_slot, packed in _recent(slot).iterator(
+            chunk_size=HISTORY_READ_CHUNK_SIZE
+        )
+    }
+
+
+def velocities_for(post_ids, slot):
+    """{post_id: velocity} for those of ``post_ids`` with recent engagement."""
+    post_ids = list(post_ids)
+    velocities = {}
+    for start in range(0, len(post_ids), HISTORY_IDS_PER_QUERY):
+        for post_id, last_slot, packed in _recent(slot).filter(
+            post_id__in=post_ids[start : start + HISTORY_IDS_PER_QUERY]
+        ):
+            velocities[post_id] = velocity(last_slot, packed, slot)
+    return velocities
+
+
+def recent_velocity_columns(slot):
+    """(post ids, velocities) as numpy arrays, scored in one pass over the packed rings."""
+    ids, last_slots, rings = [], [], []
+    for post_id, last_slot, packed in _recent(slot).iterator(chunk_size=HISTORY_READ_CHUNK_SIZE):
+        ids.append(post_id)
+        last_slots.append(last_slot)
+        rings.append(packed)
+    if not ids:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    deltas = np.frombuffer(b"".join(rings), dtype="<f4").reshape(-1, SNAPSHOT_SLOTS)
+    last_slots = np.array(last_slots, dtype=np.int64)
+    # Ring index i holds slot last_slot - ((last_slot - i) mod SNAPSHOT_SLOTS).
+    ages = np.maximum(slot - last_slots, 0)[:, None] + (
+        (last_slots[:, None] - np.arange(SNAPSHOT_SLOTS)) % SNAPSHOT_SLOTS
+    )
+    weights = np.array(_AGE_WEIGHTS)[np.minimum(ages, SNAPSHOT_SLOTS)]
+    return np.array(ids, dtype=np.int64), (deltas * weights).sum(axis=1)
@@ -1,58 +1,120 @@
-from django.db.models import Q
-from django.http import JsonResponse
+import json
+import math
+
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+
+from telemetry.dedupe import RecentEventFilter
+from telemetry.services import ALLOWED_CLOCK_SKEW_SECONDS, authenticate_signed
+
+from .engagement import ENGAGEMENT_FIELDS, engagement_buffer, engagement_limiter
+from .models import Category, Topic, TrendingPost
+from .pagination import decode_cursor, encode_cursor, page_size
+from .search import latest_page, search_cache, search_page
+from .services import (
+    HOT_FRAGMENT_CACHE_SECONDS,
+    HOT_PAYLOAD_MAX_AGE_SECONDS,
+    TRENDING_HORIZONS,
+    cached_live_generation,
+    generation_available,
+    hot_item,
+    hot_list_payload,
+    hot_page,
+    hot_payload,
+    landing_sections,
+    live_generation,
+    live_hot_posts,
+    remember_live_generation,
+    trending_page,
+)
+
 
-from .models import Category, HotPost, Post
+MAX_ENGAGEMENT_EVENTS = 1000
+MAX_ENGAGEMENT_COUNT = 10000
+
+# Signatures accepted within the timestamp window; a replayed request is refused.
+_recent_signatures = RecentEventFilter(window_seconds=2 * ALLOWED_CLOCK_SKEW_SECONDS)
+
+
+def _parse_engagement(payload):
+    """(post_id, type, count) tuples from ``{"events": [...]}`` or a single event."""
+    if isinstance(payload, dict) and "events" in payload:
+        raw_events = payload["events"]
+    else:
+        raw_events = [payload]
+    if not isinstance(raw_events, list) or not raw_events:
+        raise ValueError("events must be a non-empty list")
+    if len(raw_events) > MAX_ENGAGEMENT_EVENTS:
+        raise ValueError(f"at most {MAX_ENGAGEMENT_EVENTS} events per request")
+    events = []
+    for raw in raw_events:
+        if not isinstance(raw, dict):
+            raise ValueError("each event must be an object")
+        post_id, event_type, count = raw.get("post_id"), raw.get("type"), raw.get("count", 1)
+        if not isinstance(post_id, int) or isinstance(post_id, bool) or post_id < 1:
+            raise ValueError("post_id must be a positive integer")
+        if event_type not in ENGAGEMENT_FIELDS:
+            raise ValueError(f"type must be one of: {', '.join(ENGAGEMENT_FIELDS)}")
+        if (
+            not isinstance(count, int)
+            or isinstance(count, bool)
+            or not 1 <= count <= MAX_ENGAGEMENT_COUNT
+        ):
+            raise ValueError(f"count must be an integer between 1 and {MAX_ENGAGEMENT_COUNT}")
+        events.append((post_id, event_type, count))
+    return events
 
 
 def _category_search_results(category, q, limit=25):
     if not q:
         return []
-    return list(
-        Post.objects.filter(topic__category=category, is_active=True)
-        .filter(
-            Q(title__icontains=q)
-            | Q(body__icontains=q)
-            | Q(topic__name__icontains=q)
-        )
-        .select_related("topic")
-        .order_by("-created_at")[:limit]
-    )
+    return search_cache.search(category, q, limit)
 
 
 def home(request):
-    global_hot = list(
-        HotPost.objects.filter(category__isnull=True)
-        .select_related("post", "post__topic", "post__topic__category")
-        .order_by("rank")[:20]
-    )
-
-    category_sections = []
-    for category in Category.objects.order_by("name"):
-        top_posts = list(
-            HotPost.objects.filter(category=category)
-            .select_related("post")
-            .order_by("rank")[:5]
-        )
-        category_sections.append({"category": category, "top_posts": top_posts})
+    # Sections are cached per generation. With the generation cached too, a
+    # warm page runs no queries; otherwise one query loads the page and, when
+    # needed, resolves the generation along the way.
+    generation = cached_live_generation()
+    if generation is None:
+        landing = landing_sections()
+        generation = landing["generation"]
+        remember_live_generation(generation)
+    else:
+        landing = SimpleLazyObject(lambda: landing_sections(generation))
 
     return render(
         request,
         "hot_topics/home.html",
         {
-            "global_hot": global_hot,
-            "category_sections": category_sections,
+            "generation": generation,
+            "landing": landing,
+            "fragment_ttl": HOT_FRAGMENT_CACHE_SECONDS,
         },
     )
 
 
 def category_page(request, slug):
     category = get_object_or_404(Category, slug=slug)
-    hot_posts = list(
-        HotPost.objects.filter(category=category)
-        .select_related("post", "post__topic")
-        .order_by("rank")[:20]
-    )
+    generation = cached_live_generation()
+    if generation is None:
+        generation = live_generation()
+        remember_live_generation(generation)
+    horizon = request.GET.get("horizon", "")
+    horizons = dict(TrendingPost.HORIZON_CHOICES)
+    # Lazy: only evaluated when the cached fragment is missing.
+    if horizon in horizons:
+        hot_posts = TrendingPost.objects.filter(
+            generation_id=generation, horizon=horizon, scope="category", scope_id=category.id
+        )
+    else:
+        horizon = ""
+        hot_posts = live_hot_posts(generation).filter(category=category)
+    hot_posts = hot_posts.select_related("post", "post__topic").order_by("rank")[:20]
 
     q = request.GET.get("q", "").strip()
     search_results = _category_search_results(category, q, limit=25)
@@ -62,7 +124,12 @@ def category_page(request, slug):
         "hot_topics/category.html",
         {
             "category": category,
+            "generation": generation,
+            "horizon": horizon,
+            "horizon_label": horizons.get(horizon, ""),
+            "horizons": TrendingPost.HORIZON_CHOICES,
             "hot_posts": hot_posts,
+            "fragment_ttl": HOT_FRAGMENT_CACHE_SECONDS,
             "q": q,
             "search_results": search_results,
         },
@@ -84,44 +151,145 @@ def category_search_partial(request, slug):
     )
 
 
-def api_hot_landing(request):
-    global_hot = (
-        HotPost.objects.filter(category__isnull=True)
-        .select_related("post", "post__topic", "post__topic__category")
-        .order_by("rank")[:20]
+def _hot_list_params(request, scope):
+    """(horizon, cursor kind, limit, generation, after_rank); ValueError on bad input.
+
+    generation is None for a first page.
+    """
+    horizon = request.GET.get("horizon", "")
+    if scope == "topic":
+        # Topics only have trending lists.
+        horizon = horizon or "day"
+    if horizon and horizon not in TRENDING_HORIZONS:
+        raise ValueError(f"horizon must be one of: {', '.join(TRENDING_HORIZONS)}")
+    kind = f"hot-{horizon}" if horizon else "hot"
+    limit = page_size(request.GET.get("limit"))
+    cursor = request.GET.get("cursor", "")
+    generation, after_rank = None, 0
+    if cursor:
+        position = decode_cursor(cursor, kind)
+        if not (
+            isinstance(position, list)
+            and len(position) == 2
+            and all(isinstance(value, int) for value in position)
+        ):
+            raise ValueError("Invalid cursor")
+        generation, after_rank = position
+    return horizon, kind, limit, generation, after_rank
+
+
+def _cursor_expired():
+    # Later pages stay on the cursor's generation until it is collected.
+    return JsonResponse({"error": "Cursor expired; start from the first page"}, status=410)
+
+
+def _hot_list_json(generation, horizon, kind, rows, more, scope, scope_object):
+    payload = hot_list_payload(
+        generation,
+        horizon,
+        [hot_item(item.rank, item.score, item.post) for item in rows],
+        encode_cursor(kind, [generation, rows[-1].rank]) if more else None,
+        scope if scope_object is not None else None,
+        scope_object.name if scope_object is not None else None,
     )
-    return JsonResponse(
-        {
-            "count": len(global_hot),
-            "items": [
-                {
-                    "rank": item.rank,
-                    "score": round(item.score, 4),
-                    "post_id": item.post_id,
-                    "title": item.post.title,
-                    "topic": item.post.topic.name,
-                    "category": item.post.topic.category.name,
-                    "likes": item.post.likes,
-                    "comments": item.post.comments,
-                    "shares": item.post.shares,
-                    "views": item.post.views,
-                    "created_at": item.post.created_at.isoformat(),
-                }
-                for item in global_hot
-            ],
-        }
+    return JsonResponse(payload)
+
+
+def _hot_list_response(request, scope="global", scope_object=None):
+    try:
+        horizon, kind, limit, generation, after_rank = _hot_list_params(request, scope)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if generation is None:
+        generation = live_generation()
+    elif not generation_available(generation):
+        return _cursor_expired()
+
+    scope_id = scope_object.id if scope_object is not None else None
+    if horizon:
+        rows, more = trending_page(horizon, scope, scope_id, limit, after_rank, generation)
+    else:
+        rows, more = hot_page(scope_id, limit, after_rank, generation)
+    return _hot_list_json(generation, horizon, kind, rows, more, scope, scope_object)
+
+
+def _plain_first_page(request):
+    return not any(request.GET.get(name) for name in ("horizon", "cursor", "limit"))
+
+
+def _precomputed_response(request, key):
+    """The ranking pass's stored bytes for a plain first-page request, else None.
+
+    A warm request runs no queries: the live generation comes from the cache
+    and the payload from process memory.
+    """
+    if not _plain_first_page(request):
+        return None
+    generation = cached_live_generation()
+    if generation is None:
+        generation = live_generation()
+        remember_live_generation(generation)
+    if generation is None:
+        return None
+    entry = hot_payload(generation, key)
+    if entry is None:
+        return None
+    return _payload_response(request, entry)
+
+
+def _payload_response(request, entry):
+    response = get_conditional_response(
+        request, etag=entry["etag"], last_modified=entry["last_modified"]
     )
+    if response is None:
+        response = HttpResponse(entry["body"], content_type="application/json")
+    response.headers["ETag"] = entry["etag"]
+    response.headers["Last-Modified"] = http_date(entry["last_modified"])
+    patch_cache_control(response, public=True, max_age=HOT_PAYLOAD_MAX_AGE_SECONDS)
+    return response
 
 
-def api_category_search(request, slug):
+def api_hot_landing(request):
+    return _precomputed_response(request, "landing") or _hot_list_response(request)
+
+
+def api_category_hot(request, slug):
+    response = _precomputed_response(request, f"category:{slug}")
+    if response is not None:
+        return response
     category = get_object_or_404(Category, slug=slug)
+    return _hot_list_response(request, "category", category)
+
+
+def api_topic_hot(request, slug):
+    topic = get_object_or_404(Topic, slug=slug)
+    return _hot_list_response(request, "topic", topic)
+
+
+def _search_params(request):
+    """(q, cursor kind, limit, after); ValueError on a bad limit or cursor."""
     q = request.GET.get("q", "").strip()
-    qs = Post.objects.filter(topic__category=category, is_active=True)
-    if q:
-        qs = qs.filter(
-            Q(title__icontains=q) | Q(body__icontains=q) | Q(topic__name__icontains=q)
-        )
-    results = qs.select_related("topic").order_by("-created_at")[:50]
+    kind = "search" if q else "latest"
+    limit = page_size(request.GET.get("limit"), default=50)
+    cursor = request.GET.get("cursor", "")
+    after = decode_cursor(cursor, kind) if cursor else None
+    return q, kind, limit, after
+
+
+def api_category_search(request, slug):
+    category = get_object_or_404(Category, slug=slug)
+    try:
+        q, kind, limit, after = _search_params(request)
+        if q:
+            results, position = search_page(category, q, limit, after)
+        else:
+            results, position = latest_page(category, limit, after)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return _search_json(category, q, kind, results, position)
+
+
+def _search_json(category, q, kind, results, position):
     return JsonResponse(
         {
             "category": category.name,
@@ -140,5 +308,46 @@ def api_category_search(request, slug):
                 }
                 for p in results
             ],
+            "next_cursor": encode_cursor(kind, position) if position else None,
         }
     )
+
+
+def api_search_cache_stats(request):
+    return JsonResponse(search_cache.stats())
+
+
+@csrf_exempt
+def api_engagement(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only"}, status=405)
+    client, reason = authenticate_signed(request)
+    if client is None:
+        return JsonResponse({"error": reason}, status=401)
+    signature = request.headers["X-Signature"].strip()
+    if _recent_signatures.seen(client.id, signature):
+        return JsonResponse({"error": "Request already accepted"}, status=409)
+    try:
+        events = _parse_engagement(json.loads(request.body))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({"error": "Body must be JSON"}, status=400)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    cost = sum(count for _, _, count in events)
+    wait = engagement_limiter.take(client.id, cost)
+    if wait == math.inf:
+        return JsonResponse(
+            {"error": f"at most {engagement_limiter.burst} engagement units per request"},
+            status=400,
+        )
+    if wait:
+        response = JsonResponse({"error": "Rate limit exceeded"}, status=429)
+        response.headers["Retry-After"] = str(math.ceil(wait))
+        return response
+    _recent_signatures.add(client.id, signature)
+    engagement_buffer.add(events)
+    return JsonResponse({"status": "accepted", "events": len(events)}, status=202)
+
+
+def api_engagement_stats(request):
+    return JsonResponse({**engagement_buffer.stats(), "rate_limit": engagement_limiter.stats()})
@@ -9,8 +9,19 @@ https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
+from knowella.asgi_buffer import (
+    ASGI_MAX_ACTIVE_REQUESTS,
+    ASGI_RESPONSE_BUFFER_BYTES,
+    ResponseBuffer,
+)
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'knowella.settings')
 
-application = get_asgi_application()
+application = ResponseBuffer(
+    get_asgi_application(),
+    getattr(settings, "ASGI_RESPONSE_BUFFER_BYTES", ASGI_RESPONSE_BUFFER_BYTES),
+    getattr(settings, "ASGI_MAX_ACTIVE_REQUESTS", ASGI_MAX_ACTIVE_REQUESTS),
+)
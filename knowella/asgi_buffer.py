@@ -0,0 +1,59 @@
+import asyncio
+
+ASGI_RESPONSE_BUFFER_BYTES = 1024 * 1024
+ASGI_MAX_ACTIVE_REQUESTS = 32
+
+
+class ResponseBuffer:
+    """Bound the requests inside Django and hold responses until each is done.
+
+    Django's ASGI handler gives every request its own thread-sensitive
+    context. The context's thread is started by the first sync call
+    (middleware, signal receivers, ORM) and only exits when the handler
+    returns, which is after the client has read the whole response. So each
+    open connection costs a thread, and thousands of them thrash the GIL.
+
+    Here at most ``max_active`` requests run in the handler at once; the
+    rest wait on the event loop, which costs a coroutine, not a thread. The
+    handler's messages go to a list, so it returns (and frees its thread and
+    slot) as soon as the response is built, and the event loop then drains
+    the list to the client at whatever pace it reads. A response that grows
+    past ``max_bytes`` (large or streamed) is passed through as it is
+    produced and keeps its slot until it is done. Request bodies are read by
+    the handler, so a slow upload also keeps its slot.
+    """
+
+    def __init__(
+        self, app, max_bytes=ASGI_RESPONSE_BUFFER_BYTES, max_active=ASGI_MAX_ACTIVE_REQUESTS
+    ):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.max_active = max_active
+        self._slots = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_active)
+        held = []
+        size = 0
+        passing = False
+
+        async def buffered_send(message):
+            nonlocal size, passing
+            if passing:
+                return await send(message)
+            held.append(message)
+            if message["type"] == "http.response.body" and message.get("more_body", False):
+                size += len(message.get("body", b""))
+                if size > self.max_bytes:
+                    passing = True
+                    for queued in held:
+                        await send(queued)
+                    held.clear()
+
+        async with self._slots:
+            await self.app(scope, receive, buffered_send)
+        for message in held:
+            await send(message)
@@ -0,0 +1,133 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connection, transaction
+
+WRITE_LANE_MAX_BATCH = 100
+
+
+class WriteLane:
+    """Run database writes one batch at a time on a dedicated thread.
+
+    SQLite allows one writer per file. Instead of letting request threads
+    race for the write lock (and wait on busy_timeout), write jobs are queued
+    and a single writer thread runs them. Whatever has queued up while the
+    previous batch committed goes into the next transaction, each job in its
+    own savepoint, so one failing job does not undo the others. Callers get
+    the job's return value or exception once the batch has committed.
+
+    Jobs run inline when the lane is disabled (DB_WRITE_LANE), when the caller
+    is already inside a transaction (its own write lock would deadlock the
+    writer), and on the writer thread itself. The lane serializes writes
+    within one process; between processes SQLite's locking still applies.
+    """
+
+    def __init__(self, max_batch=WRITE_LANE_MAX_BATCH):
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"jobs": 0, "batches": 0, "largest_batch": 0, "failed_jobs": 0}
+
+    def enabled(self):
+        return getattr(settings, "DB_WRITE_LANE", False)
+
+    def _ensure_writer(self):
+        # After a fork the thread object is copied but the thread is gone.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()
+                self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="db-write-lane", daemon=True)
+            self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)``; returns a Future."""
+        future = Future()
+        if (
+            not self.enabled()
+            or threading.current_thread() is self._thread
+            or connection.in_atomic_block
+        ):
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+        self._ensure_writer()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` and wait for its committed result."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            done = []
+            failed = 0
+            try:
+                with transaction.atomic():
+                    for fn, args, kwargs, future in batch:
+                        try:
+                            with transaction.atomic():
+                                result = fn(*args, **kwargs)
+                        except Exception as exc:
+                            failed += 1
+                            future.set_exception(exc)
+                        else:
+                            done.append((future, result))
+            except Exception as exc:
+                # BEGIN or COMMIT failed; nothing in this batch was written.
+                for future, _ in done:
+                    future.set_exception(exc)
+                failed += len(done)
+                done = []
+                connection.close()
+            for future, result in done:
+                future.set_result(result)
+            with self._stats_lock:
+                self._stats["jobs"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+                self._stats["failed_jobs"] += failed
+
+
+write_lane = WriteLane(getattr(settings, "DB_WRITE_LANE_MAX_BATCH", WRITE_LANE_MAX_BATCH))
+
+
+def sqlite_profile():
+    """Journal/sync/busy settings of the current connection, for reports."""
+    if connection.vendor != "sqlite":
+        return {"vendor": connection.vendor}
+    profile = {"vendor": "sqlite"}
+    with connection.cursor() as cursor:
+        for pragma in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size"):
+            cursor.execute(f"PRAGMA {pragma}")
+            profile[pragma] = cursor.fetchone()[0]
+    profile["transaction_mode"] = connection.transaction_mode
+    profile["write_lane"] = write_lane.enabled()
+    return profile
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'telemetry.middleware.SelfInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,13 +83,116 @@ WSGI_APPLICATION = 'knowella.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# KNOWELLA_DB_PROFILE selects the SQLite connection settings. "production"
+# (default) uses WAL so readers never wait for the writer, relaxes fsync to
+# WAL checkpoints, waits up to 5s for the write lock and starts transactions
+# as IMMEDIATE so they queue on busy_timeout instead of failing with
+# "database is locked" when a read upgrades to a write. "basic" is the
+# stock rollback-journal setup, kept for before/after benchmarks.
+SQLITE_PROFILES = {
+    "basic": {
+        "init_command": "PRAGMA journal_mode=DELETE; PRAGMA synchronous=FULL",
+    },
+    "production": {
+        "init_command": "; ".join(
+            [
+                "PRAGMA journal_mode=WAL",
+                "PRAGMA synchronous=NORMAL",
+                "PRAGMA busy_timeout=5000",
+                "PRAGMA cache_size=-65536",  # 64 MiB page cache per connection
+                "PRAGMA mmap_size=268435456",  # 256 MiB memory-mapped reads
+                "PRAGMA temp_store=MEMORY",
+            ]
+        ),
+        "transaction_mode": "IMMEDIATE",
+    },
+}
+DB_PROFILE = os.environ.get("KNOWELLA_DB_PROFILE", "production")
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': Path(os.environ.get("KNOWELLA_DB_PATH", BASE_DIR / 'db.sqlite3')),
+        'OPTIONS': SQLITE_PROFILES[DB_PROFILE],
     }
 }
 
+# Ingest, hot-post rebuilds and data-job loads hand their writes to one
+# writer thread per process (see knowella.db.WriteLane), which commits
+# whatever has queued up in a single transaction.
+DB_WRITE_LANE = os.environ.get("KNOWELLA_WRITE_LANE", "1") != "0"
+DB_WRITE_LANE_MAX_BATCH = 100
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'knowella-default',
+    },
+    # API key -> AppClient lookups (see telemetry.services). Keep this one in
+    # local memory even when 'default' is shared: cached clients hold secrets.
+    'telemetry-clients': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'knowella-telemetry-clients',
+    },
+}
+
+
+# ASGI
+# Under an ASGI server the read-only JSON endpoints can run as async views
+# (hot_topics.async_views, telemetry.async_views). Off by default: under WSGI
+# each async view call starts an event loop of its own.
+ASYNC_API_VIEWS = os.environ.get("KNOWELLA_ASYNC_VIEWS", "0") == "1"
+# knowella.asgi lets this many requests into Django at once (each may hold a
+# thread) and holds responses up to ASGI_RESPONSE_BUFFER_BYTES until the
+# handler is done, so waiting and slow clients cost no threads.
+ASGI_MAX_ACTIVE_REQUESTS = int(os.environ.get("KNOWELLA_ASGI_MAX_ACTIVE", "32"))
+ASGI_RESPONSE_BUFFER_BYTES = 1024 * 1024
+
+
+# Telemetry
+# Bearer token required by /telemetry/metrics/. When empty the endpoint is
+# only served with DEBUG on and answers 403 otherwise.
+TELEMETRY_METRICS_TOKEN = os.environ.get("KNOWELLA_METRICS_TOKEN", "")
+
+# Self-instrumentation: this server reports its own request metrics as the
+# TELEMETRY_SELF_APP_NAME client (see telemetry.middleware).
+TELEMETRY_SELF_INSTRUMENT = os.environ.get("KNOWELLA_SELF_TELEMETRY", "1") != "0"
+TELEMETRY_SELF_APP_NAME = "knowella-server"
+TELEMETRY_SELF_SAMPLE_RATE = float(os.environ.get("KNOWELLA_SELF_TELEMETRY_SAMPLE_RATE", "1.0"))
+TELEMETRY_SELF_FLUSH_SECONDS = 60
+TELEMETRY_SELF_OVERHEAD_BUDGET_MS = 0.5
+
+# Sample storage: "single" keeps every sample in one table, "partitioned"
+# writes one table per TELEMETRY_PARTITION_PERIOD ("day" or "week") so
+# retention can drop whole tables (see telemetry.storage).
+TELEMETRY_STORAGE_BACKEND = os.environ.get("KNOWELLA_TELEMETRY_STORAGE", "single")
+TELEMETRY_PARTITION_PERIOD = os.environ.get("KNOWELLA_TELEMETRY_PARTITION_PERIOD", "day")
+
+
+# Hot topics
+# Engagement events are summed in memory per process and written every
+# HOT_TOPICS_ENGAGEMENT_FLUSH_SECONDS, or sooner once this many posts have
+# pending deltas (see hot_topics.engagement). A crash loses at most that window.
+HOT_TOPICS_ENGAGEMENT_FLUSH_SECONDS = float(
+    os.environ.get("KNOWELLA_ENGAGEMENT_FLUSH_SECONDS", "2.0")
+)
+HOT_TOPICS_ENGAGEMENT_MAX_PENDING_POSTS = 10000
+# POST /api/engagement/ is signed like telemetry ingest (AppClient API key and
+# HMAC). Each client may add this many engagement units (the summed event
+# counts) per second, and up to HOT_TOPICS_ENGAGEMENT_BURST at once.
+HOT_TOPICS_ENGAGEMENT_RATE_PER_SECOND = float(
+    os.environ.get("KNOWELLA_ENGAGEMENT_RATE", "1000")
+)
+HOT_TOPICS_ENGAGEMENT_BURST = 20000
+# Hot-list scoring: "decay" ranks by lifetime engagement over age, "velocity"
+# by engagement gained over the last two hours, read from per-post snapshot
+# rings that each ranking pass updates (see hot_topics.velocity).
+HOT_TOPICS_SCORING = os.environ.get("KNOWELLA_HOT_SCORING", "decay")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -1,6 +1,13 @@
 from django.contrib import admin
 
-from .models import AppClient, HealthSample
+from .models import (
+    AppClient,
+    AppHealthState,
+    HealthRollup,
+    HealthSample,
+    HealthTransition,
+    RetentionRun,
+)
 
 
 @admin.register(AppClient)
@@ -23,4 +30,35 @@ class HealthSampleAdmin(admin.ModelAdmin):
     list_filter = ("app", "captured_at")
     search_fields = ("event_id",)
 
+
+@admin.register(HealthRollup)
+class HealthRollupAdmin(admin.ModelAdmin):
+    list_display = ("app", "bucket_start", "bucket_minutes", "sample_count", "request_count")
+    list_filter = ("app", "bucket_minutes")
+
+
+@admin.register(RetentionRun)
+class RetentionRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "started_at",
+        "dry_run",
+        "samples_deleted",
+        "rollups_written",
+        "rollups_deleted",
+        "db_bytes_after",
+        "free_bytes_after",
+    )
+
+
+@admin.register(AppHealthState)
+class AppHealthStateAdmin(admin.ModelAdmin):
+    list_display = ("app", "status", "changed_at")
+    list_filter = ("status",)
+
+
+@admin.register(HealthTransition)
+class HealthTransitionAdmin(admin.ModelAdmin):
+    list_display = ("app", "from_status", "to_status", "occurred_at")
+    list_filter = ("app", "to_status")
+
 # Register your models here.
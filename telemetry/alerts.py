@@ -0,0 +1,262 @@
+import threading
+from bisect import bisect_right
+from collections import deque
+
+from django.db import transaction
+from django.utils import timezone
+
+from knowella.db import write_lane
+
+from .models import AppHealthState, HealthTransition
+from .services import effective_rules, health_status
+from .storage import get_storage
+
+ALERT_WINDOW_MINUTES = 15
+ALERT_MIN_DURATION_SECONDS = 60
+# A breached rule only clears once the metric is this far back inside its
+# threshold, so a value hovering at the limit does not flap.
+ALERT_HYSTERESIS_PERCENT = 10.0
+
+SEVERITY = {"unknown": -1, "healthy": 0, "warning": 1, "critical": 2}
+
+_WINDOW_FIELDS = (
+    "request_count",
+    "error_count",
+    "avg_latency_ms",
+    "p95_latency_ms",
+    "cpu_percent",
+    "memory_percent",
+    "uptime_percent",
+)
+
+
+def _sample_ts(sample):
+    return sample[0]
+
+
+def recovery_rules(rules, hysteresis_percent=ALERT_HYSTERESIS_PERCENT):
+    factor = hysteresis_percent / 100.0
+    relaxed = dict(rules)
+    for key, value in rules.items():
+        if key.startswith("max_"):
+            relaxed[key] = value * (1.0 - factor)
+        elif key == "min_uptime_percent":
+            relaxed[key] = value + (100.0 - value) * factor
+    return relaxed
+
+
+class SlidingWindow:
+    """Running sums over the samples captured in the last ``seconds``.
+
+    Samples are kept in captured_at order: in-order samples are appended,
+    late ones are inserted at their place, so eviction from the left always
+    removes the oldest. Appends and evictions are O(1) amortized; a late
+    sample costs an O(n) insert. Samples older than the current window are
+    ignored.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.samples = deque()
+        self.sums = dict.fromkeys(_WINDOW_FIELDS, 0.0)
+        self.latest_ts = None
+
+    def add(self, captured_ts, values):
+        if self.latest_ts is not None and captured_ts < self.latest_ts - self.seconds:
+            return
+        if self.samples and captured_ts < self.samples[-1][0]:
+            index = bisect_right(self.samples, captured_ts, key=_sample_ts)
+            self.samples.insert(index, (captured_ts, values))
+        else:
+            self.samples.append((captured_ts, values))
+        for key in _WINDOW_FIELDS:
+            self.sums[key] += values[key]
+        if self.latest_ts is None or captured_ts > self.latest_ts:
+            self.latest_ts = captured_ts
+        self._evict()
+
+    def rebuild(self, samples):
+        """Replace the window with ``samples`` ((captured_ts, values) pairs)."""
+        self.samples = deque(sorted(samples, key=_sample_ts))
+        self.latest_ts = self.samples[-1][0] if self.samples else None
+        if self.samples:
+            self._evict()
+        self._resum()
+
+    def _resum(self):
+        # Recomputed from the samples so add/evict float drift does not build up.
+        self.sums = {
+            key: float(sum(values[key] for _, values in self.samples)) for key in _WINDOW_FIELDS
+        }
+
+    def _evict(self):
+        cutoff = self.latest_ts - self.seconds
+        while self.samples and self.samples[0][0] < cutoff:
+            _, values = self.samples.popleft()
+            for key in _WINDOW_FIELDS:
+                self.sums[key] -= values[key]
+        if not self.samples:
+            self.sums = dict.fromkeys(_WINDOW_FIELDS, 0.0)
+
+    def summary(self):
+        count = len(self.samples)
+        if not count:
+            return None
+        total_requests = int(round(self.sums["request_count"]))
+        total_errors = int(round(self.sums["error_count"]))
+        error_rate = (total_errors / total_requests * 100.0) if total_requests else 0.0
+        return {
+            "sample_count": count,
+            "total_requests": total_requests,
+            "total_errors": total_errors,
+            "error_rate": round(error_rate, 2),
+            "avg_latency_ms": round(self.sums["avg_latency_ms"] / count, 2),
+            "avg_p95_latency_ms": round(self.sums["p95_latency_ms"] / count, 2),
+            "avg_cpu_percent": round(self.sums["cpu_percent"] / count, 2),
+            "avg_memory_percent": round(self.sums["memory_percent"] / count, 2),
+            "avg_uptime_percent": round(self.sums["uptime_percent"] / count, 2),
+        }
+
+
+class _AppState:
+    def __init__(self, window_seconds, status, breached, changed_at):
+        self.window = SlidingWindow(window_seconds)
+        self.status = status
+        self.breached = breached
+        self.changed_at = changed_at
+        self.pending_status = None
+        self.pending_since = None
+
+
+class AlertEvaluator:
+    """Incremental health evaluation on the ingest path.
+
+    Keeps a sliding window per app in process memory and persists only status
+    transitions (plus the current status in AppHealthState). A candidate status
+    must hold for ``min_duration_seconds`` of sample time before it becomes a
+    transition (the first status after "unknown" is taken at once);
+    de-escalation is checked against hysteresis-relaxed rules. The
+    window is per worker process, so every sample for an app should reach the
+    same process (a single ingest worker or sticky routing by API key).
+    """
+
+    def __init__(
+        self,
+        window_minutes=ALERT_WINDOW_MINUTES,
+        min_duration_seconds=ALERT_MIN_DURATION_SECONDS,
+        hysteresis_percent=ALERT_HYSTERESIS_PERCENT,
+    ):
+        self.window_seconds = window_minutes * 60
+        self.min_duration_seconds = min_duration_seconds
+        self.hysteresis_percent = hysteresis_percent
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _load_state(self, client):
+        # Cold start for this app in this process: one read to refill the
+        # window, after which it is maintained purely from ingested samples.
+        persisted = AppHealthState.objects.filter(app=client).first()
+        if persisted is None:
+            state = _AppState(self.window_seconds, "unknown", [], None)
+        else:
+            state = _AppState(
+                self.window_seconds,
+                persisted.status,
+                persisted.breached_rules,
+                persisted.changed_at,
+            )
+        window_start = timezone.now() - timezone.timedelta(seconds=self.window_seconds)
+        rows = get_storage().window_values(client, window_start, "captured_at", *_WINDOW_FIELDS)
+        state.window.rebuild([(row.pop("captured_at").timestamp(), row) for row in rows])
+        return state
+
+    def current(self, app_id):
+        with self._lock:
+            state = self._states.get(app_id)
+            if state is None:
+                return None
+            return {
+                "status": state.status,
+                "breached_rules": list(state.breached),
+                "changed_at": state.changed_at.isoformat() if state.changed_at else None,
+                "pending_status": state.pending_status,
+            }
+
+    def _candidate(self, state, summary, rules):
+        status, breached = health_status(summary, rules)
+        if SEVERITY[status] < SEVERITY.get(state.status, -1):
+            status, breached = health_status(
+                summary, recovery_rules(rules, self.hysteresis_percent)
+            )
+        return status, breached
+
+    def observe(self, client, metric):
+        """Fold one accepted sample in; returns the HealthTransition if the status changed."""
+        with self._lock:
+            state = self._states.get(client.id)
+        if state is None:
+            loaded = self._load_state(client)
+            with self._lock:
+                state = self._states.setdefault(client.id, loaded)
+            if state is loaded:
+                # The freshly loaded window already contains this sample.
+                return self._evaluate(client, state, metric["captured_at"].timestamp())
+
+        with self._lock:
+            state.window.add(
+                metric["captured_at"].timestamp(), {key: metric[key] for key in _WINDOW_FIELDS}
+            )
+        return self._evaluate(client, state, metric["captured_at"].timestamp())
+
+    def _evaluate(self, client, state, sample_ts):
+        rules = effective_rules(client)
+        with self._lock:
+            summary = state.window.summary()
+            if summary is None:
+                return None
+            candidate, breached = self._candidate(state, summary, rules)
+            if candidate == state.status:
+                state.pending_status = None
+                state.pending_since = None
+                state.breached = breached
+                return None
+            if candidate != state.pending_status:
+                state.pending_status = candidate
+                state.pending_since = sample_ts
+            held = sample_ts - state.pending_since
+            if state.status != "unknown" and held < self.min_duration_seconds:
+                return None
+            previous = state.status
+            state.status = candidate
+            state.breached = breached
+            state.changed_at = timezone.now()
+            state.pending_status = None
+            state.pending_since = None
+            changed_at = state.changed_at
+
+        # Written after the lock is released, so other apps' samples never
+        # wait on the database. Concurrent transitions of one app may reach
+        # the write lane in either order; AppHealthState only moves forward
+        # in changed_at, so it always ends on the latest one.
+        return write_lane.run(
+            _persist_transition, client, previous, candidate, breached, summary, changed_at
+        )
+
+
+def _persist_transition(client, previous, candidate, breached, summary, changed_at):
+    with transaction.atomic():
+        transition = HealthTransition.objects.create(
+            app=client,
+            from_status=previous,
+            to_status=candidate,
+            breached_rules=breached,
+            summary=summary,
+            occurred_at=changed_at,
+        )
+        fields = {"status": candidate, "breached_rules": breached, "changed_at": changed_at}
+        updated = AppHealthState.objects.filter(app=client, changed_at__lte=changed_at).update(
+            **fields
+        )
+        if not updated:
+            AppHealthState.objects.get_or_create(app=client, defaults=fields)
+    return transition
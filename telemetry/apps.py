@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class TelemetryConfig(AppConfig):
     name = 'telemetry'
+
+    def ready(self):
+        from .models import AppClient
+        from .services import clear_client_cache
+
+        post_save.connect(
+            clear_client_cache, sender=AppClient, dispatch_uid="telemetry-client-save"
+        )
+        post_delete.connect(
+            clear_client_cache, sender=AppClient, dispatch_uid="telemetry-client-delete"
+        )
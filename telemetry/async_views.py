@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import AppHealthState, HealthTransition
+from .services import aclient_for_api_key
+from .storage import get_storage
+from .views import (
+    HEALTH_CACHE_TTL_SECONDS,
+    _alert_params,
+    _alerts,
+    _alerts_json,
+    _error,
+    _health_cache_key,
+    _health_conditional,
+    _health_entry,
+    _health_json,
+    _health_params,
+    _health_version_key,
+    _stored_state,
+)
+
+# Async health and alerts for ASGI servers (routed when ASYNC_API_VIEWS is
+# on); same parameters, caching and bodies as the sync views.
+
+
+async def _get_client(request):
+    return await aclient_for_api_key(request.headers.get("X-API-Key", "").strip())
+
+
+async def _health_response(client, lookback_minutes, filters, group_by):
+    window_start = timezone.now() - timezone.timedelta(minutes=lookback_minutes)
+    storage = get_storage()
+    latest = await storage.alatest(client, window_start, filters)
+    if latest is None:
+        return _health_json(client, lookback_minutes, filters)
+    totals = (await storage.asummarize(client, window_start, filters))[0]
+    groups = await storage.asummarize(client, window_start, filters, group_by) if group_by else []
+    return _health_json(client, lookback_minutes, filters, group_by, latest, totals, groups)
+
+
+async def health(request):
+    client = await _get_client(request)
+    if client is None:
+        return _error("Invalid API key", status=401)
+    try:
+        lookback_minutes, filters, group_by = _health_params(request)
+    except ValueError as exc:
+        return _error(str(exc))
+
+    version = await cache.aget(_health_version_key(client.id), 0)
+    cache_key = _health_cache_key(client, lookback_minutes, filters, group_by, version)
+    entry = await cache.aget(cache_key)
+    if entry is None:
+        response = await _health_response(client, lookback_minutes, filters, group_by)
+        entry = _health_entry(response.content)
+        await cache.aset(cache_key, entry, HEALTH_CACHE_TTL_SECONDS)
+    return _health_conditional(request, entry)
+
+
+async def alerts(request):
+    client = await _get_client(request)
+    if client is None:
+        return _error("Invalid API key", status=401)
+    try:
+        after, limit = _alert_params(request)
+    except ValueError as exc:
+        return _error(str(exc))
+
+    current = _alerts.current(client.id)
+    if current is None:
+        current = _stored_state(await AppHealthState.objects.filter(app=client).afirst())
+
+    events = [
+        event
+        async for event in HealthTransition.objects.filter(app=client, id__gt=after).order_by(
+            "id"
+        )[:limit]
+    ]
+    return _alerts_json(client, current, after, events)
@@ -0,0 +1,140 @@
+import json
+import struct
+import zlib
+from datetime import datetime, timezone as dt_timezone
+
+BINARY_CONTENT_TYPE = "application/x-knowella-sample"
+BINARY_VERSION = 1
+MAX_DECODED_BODY_BYTES = 1024 * 1024
+
+# Binary sample layout (little-endian), version 1:
+#   header  B version, B reserved, H event_id length
+#   event_id bytes (UTF-8)
+#   body    d captured_at epoch seconds (0 = server time),
+#           I request_count, I error_count,
+#           f avg_latency_ms, f p95_latency_ms,
+#           f cpu_percent, f memory_percent, f uptime_percent,
+#           H meta length
+#   meta    JSON object bytes (UTF-8), may be empty
+_HEADER = struct.Struct("<BBH")
+_BODY = struct.Struct("<dIIfffffH")
+
+
+class UnsupportedEncoding(ValueError):
+    pass
+
+
+def _gunzip(raw):
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(raw, MAX_DECODED_BODY_BYTES)
+    except zlib.error as exc:
+        raise ValueError("Body is not valid gzip") from exc
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Decoded body exceeds {MAX_DECODED_BODY_BYTES} bytes")
+    if not decompressor.eof:
+        raise ValueError("Body is not valid gzip")
+    return data
+
+
+def encode_binary(payload):
+    event_id = str(payload["event_id"]).encode("utf-8")
+    meta = payload.get("meta") or {}
+    meta_raw = json.dumps(meta, separators=(",", ":")).encode("utf-8") if meta else b""
+    captured_at = payload.get("captured_at")
+    if isinstance(captured_at, str):
+        captured_at = datetime.fromisoformat(captured_at)
+    epoch = captured_at.timestamp() if captured_at else 0.0
+    return b"".join(
+        [
+            _HEADER.pack(BINARY_VERSION, 0, len(event_id)),
+            event_id,
+            _BODY.pack(
+                epoch,
+                int(payload["request_count"]),
+                int(payload["error_count"]),
+                float(payload["avg_latency_ms"]),
+                float(payload["p95_latency_ms"]),
+                float(payload["cpu_percent"]),
+                float(payload["memory_percent"]),
+                float(payload["uptime_percent"]),
+                len(meta_raw),
+            ),
+            meta_raw,
+        ]
+    )
+
+
+def decode_binary(data):
+    view = memoryview(data)
+    try:
+        version, _, event_id_len = _HEADER.unpack_from(view, 0)
+        if version != BINARY_VERSION:
+            raise ValueError(f"Unsupported binary sample version {version}")
+        offset = _HEADER.size
+        event_id = bytes(view[offset : offset + event_id_len]).decode("utf-8")
+        offset += event_id_len
+        (
+            epoch,
+            request_count,
+            error_count,
+            avg_latency_ms,
+            p95_latency_ms,
+            cpu_percent,
+            memory_percent,
+            uptime_percent,
+            meta_len,
+        ) = _BODY.unpack_from(view, offset)
+    except (struct.error, UnicodeDecodeError) as exc:
+        raise ValueError("Malformed binary sample") from exc
+    offset += _BODY.size
+    if len(view) != offset + meta_len:
+        raise ValueError("Malformed binary sample")
+
+    payload = {
+        "event_id": event_id,
+        "request_count": request_count,
+        "error_count": error_count,
+        # float32 on the wire; trim the representation noise.
+        "avg_latency_ms": round(avg_latency_ms, 3),
+        "p95_latency_ms": round(p95_latency_ms, 3),
+        "cpu_percent": round(cpu_percent, 3),
+        "memory_percent": round(memory_percent, 3),
+        "uptime_percent": round(uptime_percent, 3),
+    }
+    if epoch:
+        try:
+            captured_at = datetime.fromtimestamp(epoch, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError) as exc:
+            # inf, NaN or beyond the platform's time range.
+            raise ValueError("captured_at is out of range") from exc
+        payload["captured_at"] = captured_at.isoformat()
+    if meta_len:
+        try:
+            payload["meta"] = json.loads(view[offset:].tobytes())
+        except ValueError as exc:
+            raise ValueError("Malformed binary sample meta") from exc
+    return payload
+
+
+def decode_body(raw, content_type, content_encoding=""):
+    """Turn a verified request body into a payload dict.
+
+    Raises UnsupportedEncoding for an unknown Content-Encoding and ValueError
+    for bodies that cannot be decoded.
+    """
+    encoding = (content_encoding or "").strip().lower()
+    if encoding == "gzip":
+        raw = _gunzip(raw)
+    elif encoding not in ("", "identity"):
+        raise UnsupportedEncoding(f"Unsupported Content-Encoding: {encoding}")
+
+    if content_type == BINARY_CONTENT_TYPE:
+        return decode_binary(raw)
+    try:
+        payload = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise ValueError("Body must be valid JSON") from exc
+    if not isinstance(payload, dict):
+        raise ValueError("Body must be a JSON object")
+    return payload
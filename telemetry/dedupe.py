@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_EVENTS_PER_APP = 10000
+
+
+class RecentEventFilter:
+    """Per-app memory of recently accepted event_ids.
+
+    Lets ingest answer a retried event with 409 before opening a write
+    transaction. Entries expire after ``window_seconds`` and each app keeps at
+    most ``max_events_per_app`` ids (least recently seen evicted first), so
+    memory stays bounded. The filter is per process; the unique constraint on
+    HealthSample remains the authority for anything it has not seen.
+    """
+
+    def __init__(self, window_seconds, max_events_per_app=DEFAULT_MAX_EVENTS_PER_APP):
+        self.window_seconds = window_seconds
+        self.max_events_per_app = max_events_per_app
+        self._events = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _app_stats(self, app_id):
+        return self._stats.setdefault(app_id, {"hits": 0, "misses": 0, "backstop": 0})
+
+    def _expire(self, events, now):
+        cutoff = now - self.window_seconds
+        while events:
+            if next(iter(events.values())) >= cutoff:
+                break
+            events.popitem(last=False)
+
+    def seen(self, app_id, event_id, now=None):
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            events = self._events.get(app_id)
+            stats = self._app_stats(app_id)
+            if events is not None:
+                self._expire(events, now)
+                if event_id in events:
+                    stats["hits"] += 1
+                    return True
+            stats["misses"] += 1
+            return False
+
+    def add(self, app_id, event_id, now=None):
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            events = self._events.setdefault(app_id, OrderedDict())
+            events[event_id] = now
+            events.move_to_end(event_id)
+            while len(events) > self.max_events_per_app:
+                events.popitem(last=False)
+
+    def record_backstop(self, app_id, event_id):
+        """Count a duplicate that only the database caught, and remember it."""
+        with self._lock:
+            self._app_stats(app_id)["backstop"] += 1
+        self.add(app_id, event_id)
+
+    def stats(self, app_id):
+        with self._lock:
+            stats = dict(self._app_stats(app_id))
+            stats["tracked"] = len(self._events.get(app_id, ()))
+        return stats
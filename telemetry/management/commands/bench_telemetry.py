@@ -0,0 +1,363 @@
+import gzip
+import json
+import random
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.utils import timezone
+
+from knowella.db import sqlite_profile, write_lane
+from telemetry.codecs import BINARY_CONTENT_TYPE, encode_binary
+from telemetry.models import AppClient
+from telemetry.storage import get_storage
+from telemetry.services import database_size, sign_payload
+
+BENCH_CLIENT_PREFIX = "bench-"
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(int(round(pct / 100.0 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[idx]
+
+
+def _latency_report(latencies_ms):
+    values = sorted(latencies_ms)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(_percentile(values, 50), 3),
+        "p90_ms": round(_percentile(values, 90), 3),
+        "p95_ms": round(_percentile(values, 95), 3),
+        "p99_ms": round(_percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+    }
+
+
+def _random_payload(event_id, rng):
+    request_count = rng.randint(100, 5000)
+    return {
+        "event_id": event_id,
+        "request_count": request_count,
+        "error_count": rng.randint(0, request_count // 50),
+        "avg_latency_ms": round(rng.uniform(20, 300), 2),
+        "p95_latency_ms": round(rng.uniform(100, 900), 2),
+        "cpu_percent": round(rng.uniform(5, 95), 2),
+        "memory_percent": round(rng.uniform(10, 90), 2),
+        "uptime_percent": round(rng.uniform(98, 100), 3),
+        "meta": {"env": "bench"},
+    }
+
+
+class _HttpTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, body=None, headers=None):
+        req = urllib.request.Request(
+            self.base_url + path, data=body, method=method, headers=headers or {}
+        )
+        try:
+            with urllib.request.urlopen(req) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+
+
+class _InProcessTransport:
+    def __init__(self):
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = Client(HTTP_HOST="localhost")
+        return client
+
+    def request(self, method, path, body=None, headers=None):
+        extra = {
+            "HTTP_" + key.upper().replace("-", "_"): value
+            for key, value in (headers or {}).items()
+            if key.lower() != "content-type"
+        }
+        if method == "POST":
+            content_type = (headers or {}).get("Content-Type", "application/json")
+            response = self._client().post(path, data=body, content_type=content_type, **extra)
+        else:
+            response = self._client().get(path, **extra)
+        return response.status_code
+
+
+class Command(BaseCommand):
+    help = "Drive signed ingest and health traffic at a target rate and report JSON stats"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--apps", type=int, default=5, help="Number of bench AppClients")
+        parser.add_argument("--requests", type=int, default=1000, help="Total requests to send")
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=0.0,
+            help="Target requests/second (0 = as fast as possible)",
+        )
+        parser.add_argument("--concurrency", type=int, default=4, help="Worker threads")
+        parser.add_argument(
+            "--health-ratio", type=float, default=0.1, help="Fraction of requests that call health"
+        )
+        parser.add_argument(
+            "--duplicate-ratio",
+            type=float,
+            default=0.05,
+            help="Fraction of ingest requests that resend an earlier event_id",
+        )
+        parser.add_argument(
+            "--base-url",
+            default="",
+            help=(
+                "Target a running server (e.g. http://127.0.0.1:8000); default is in-process. "
+                "DB growth is only meaningful when the server uses the same database."
+            ),
+        )
+        parser.add_argument(
+            "--encoding",
+            choices=["json", "json-gzip", "binary", "binary-gzip"],
+            default="json",
+            help="Wire format for ingest bodies",
+        )
+        parser.add_argument(
+            "--readers",
+            type=int,
+            default=0,
+            help=(
+                "Extra threads calling health back-to-back for the whole run "
+                "(read latency under load)"
+            ),
+        )
+        parser.add_argument("--seed", type=int, default=None, help="Random seed")
+        parser.add_argument("--output", default="", help="Write the JSON report to this path")
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep bench clients and their samples afterwards"
+        )
+
+    def handle(self, *args, **options):
+        if options["apps"] < 1 or options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("apps, requests and concurrency must be >= 1")
+        if options["readers"] < 0:
+            raise CommandError("readers must be >= 0")
+        for name in ("health_ratio", "duplicate_ratio"):
+            if not 0.0 <= options[name] <= 1.0:
+                raise CommandError(f"{name.replace('_', '-')} must be between 0 and 1")
+
+        rng = random.Random(options["seed"])
+        clients = self._bench_clients(options["apps"])
+        transport = (
+            _HttpTransport(options["base_url"]) if options["base_url"] else _InProcessTransport()
+        )
+
+        samples_before = get_storage().count()
+        db_bytes_before, _ = database_size()
+
+        # Build the whole request plan up front so JSON encoding and the random
+        # choices stay out of the timed section. Signing needs a fresh timestamp,
+        # so it happens per request, just before the clock starts.
+        wire_format = options["encoding"]
+        content_type = (
+            BINARY_CONTENT_TYPE if wire_format.startswith("binary") else "application/json"
+        )
+
+        def encode(payload):
+            if wire_format.startswith("binary"):
+                raw = encode_binary(payload)
+            else:
+                raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            return gzip.compress(raw) if wire_format.endswith("gzip") else raw
+
+        plan = []
+        sent_events = []
+        run_tag = secrets.token_hex(4)
+        for i in range(options["requests"]):
+            client = rng.choice(clients)
+            if rng.random() < options["health_ratio"]:
+                plan.append(("health", client, None))
+                continue
+            if sent_events and rng.random() < options["duplicate_ratio"]:
+                client, payload = rng.choice(sent_events)
+            else:
+                payload = _random_payload(f"bench-{run_tag}-{i}", rng)
+                sent_events.append((client, payload))
+            plan.append(("ingest", client, encode(payload)))
+
+        lock = threading.Lock()
+        results = {"ingest": [], "health": []}
+        statuses = {"ingest": {}, "health": {}}
+        rate = options["rate"]
+        started = time.perf_counter()
+
+        def run_one(index):
+            kind, client, raw = plan[index]
+            if rate > 0:
+                delay = started + index / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            if kind == "ingest":
+                ts = str(int(time.time()))
+                headers = {
+                    "Content-Type": content_type,
+                    "X-API-Key": client.api_key,
+                    "X-Timestamp": ts,
+                    "X-Signature": sign_payload(client.secret, ts, raw),
+                }
+                if wire_format.endswith("gzip"):
+                    headers["Content-Encoding"] = "gzip"
+                path, method = "/telemetry/ingest/", "POST"
+            else:
+                headers = {"X-API-Key": client.api_key}
+                path, method = "/telemetry/health/?minutes=15", "GET"
+            t0 = time.perf_counter()
+            try:
+                status = transport.request(method, path, body=raw, headers=headers)
+            except Exception:
+                status = 0
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+            with lock:
+                results[kind].append(elapsed_ms)
+                statuses[kind][status] = statuses[kind].get(status, 0) + 1
+
+        def run_all(indexes):
+            try:
+                for index in indexes:
+                    run_one(index)
+            finally:
+                connections.close_all()
+
+        reads = {"latency": [], "statuses": {}}
+        load_done = threading.Event()
+
+        def read_loop(reader):
+            reader_rng = random.Random(reader)
+            try:
+                while not load_done.is_set():
+                    client = reader_rng.choice(clients)
+                    t0 = time.perf_counter()
+                    try:
+                        status = transport.request(
+                            "GET",
+                            "/telemetry/health/?minutes=15",
+                            headers={"X-API-Key": client.api_key},
+                        )
+                    except Exception:
+                        status = 0
+                    elapsed_ms = (time.perf_counter() - t0) * 1000.0
+                    with lock:
+                        reads["latency"].append(elapsed_ms)
+                        reads["statuses"][status] = reads["statuses"].get(status, 0) + 1
+            finally:
+                connections.close_all()
+
+        workers = options["concurrency"]
+        readers = [
+            threading.Thread(target=read_loop, args=(r,), daemon=True)
+            for r in range(options["readers"])
+        ]
+        for thread in readers:
+            thread.start()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run_all, [range(w, len(plan), workers) for w in range(workers)]))
+        duration = time.perf_counter() - started
+        load_done.set()
+        for thread in readers:
+            thread.join()
+
+        samples_after = get_storage().count()
+        db_bytes_after, _ = database_size()
+
+        ingest_total = len(results["ingest"])
+        ingest_statuses = statuses["ingest"]
+        duplicates = ingest_statuses.get(409, 0)
+        accepted = ingest_statuses.get(202, 0)
+        errors = sum(
+            count
+            for kind in statuses
+            for status, count in statuses[kind].items()
+            if status not in (200, 202, 409)
+        )
+        report = {
+            "generated_at": timezone.now().isoformat(),
+            "target": options["base_url"] or "in-process",
+            "config": {
+                "apps": options["apps"],
+                "requests": options["requests"],
+                "rate": rate,
+                "concurrency": workers,
+                "health_ratio": options["health_ratio"],
+                "duplicate_ratio": options["duplicate_ratio"],
+                "encoding": wire_format,
+                "readers": options["readers"],
+                "seed": options["seed"],
+            },
+            "database": {**sqlite_profile(), "write_lane_stats": write_lane.stats()},
+            "duration_s": round(duration, 3),
+            "throughput_rps": round(len(plan) / duration, 2) if duration else 0.0,
+            "ingest": {
+                "latency": _latency_report(results["ingest"]),
+                "statuses": {str(k): v for k, v in sorted(ingest_statuses.items())},
+                "accepted": accepted,
+                "avg_body_bytes": round(
+                    sum(len(raw) for kind, _, raw in plan if kind == "ingest") / ingest_total, 1
+                )
+                if ingest_total
+                else 0.0,
+                "duplicate_rate": round(duplicates / ingest_total, 4) if ingest_total else 0.0,
+            },
+            "health": {
+                "latency": _latency_report(results["health"]),
+                "statuses": {str(k): v for k, v in sorted(statuses["health"].items())},
+            },
+            "reads_under_load": {
+                "latency": _latency_report(reads["latency"]),
+                "statuses": {str(k): v for k, v in sorted(reads["statuses"].items())},
+            },
+            "error_rate": round(errors / len(plan), 4),
+            "db_growth": {
+                "samples_before": samples_before,
+                "samples_after": samples_after,
+                "samples_added": samples_after - samples_before,
+                "bytes_before": db_bytes_before,
+                "bytes_after": db_bytes_after,
+                "bytes_added": db_bytes_after - db_bytes_before,
+                "bytes_per_sample": (
+                    round((db_bytes_after - db_bytes_before) / (samples_after - samples_before), 1)
+                    if samples_after > samples_before
+                    else 0.0
+                ),
+            },
+        }
+
+        if not options["keep"]:
+            AppClient.objects.filter(name__startswith=BENCH_CLIENT_PREFIX).delete()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        self.stdout.write(output)
+
+    def _bench_clients(self, count):
+        clients = []
+        for i in range(count):
+            client, _ = AppClient.objects.get_or_create(
+                name=f"{BENCH_CLIENT_PREFIX}{i}",
+                defaults={"api_key": secrets.token_hex(16), "secret": secrets.token_hex(32)},
+            )
+            clients.append(client)
+        return clients
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from telemetry.services import RETENTION_CHUNK_SIZE, run_retention
+
+
+class Command(BaseCommand):
+    help = "Downsample old telemetry samples into rollups and prune expired data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=RETENTION_CHUNK_SIZE,
+            help="Rows per delete transaction",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be downsampled/deleted without writing",
+        )
+        parser.add_argument(
+            "--vacuum",
+            action="store_true",
+            help="Run VACUUM afterwards to return freed pages to the filesystem",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("chunk-size must be >= 1")
+
+        run = run_retention(
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+            vacuum=options["vacuum"],
+        )
+        reclaimed = max(run.db_bytes_before - run.db_bytes_after, 0)
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Retention done. "
+                f"Downsampled={run.samples_downsampled} Deleted={run.samples_deleted} "
+                f"RollupsWritten={run.rollups_written} RollupsDeleted={run.rollups_deleted} "
+                f"Chunks={run.chunks}"
+            )
+        )
+        self.stdout.write(
+            f"DB bytes before={run.db_bytes_before} after={run.db_bytes_after} "
+            f"reclaimed={reclaimed} reusable_free={run.free_bytes_after}"
+        )
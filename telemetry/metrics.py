@@ -0,0 +1,135 @@
+import threading
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HEALTH_STATES = ("unknown", "healthy", "warning", "critical")
+
+# (family, type, help, snapshot key)
+_FAMILIES = (
+    ("knowella_app_samples", "counter", "Accepted telemetry samples.", "samples"),
+    ("knowella_app_requests", "counter", "Requests reported by the app.", "requests"),
+    ("knowella_app_errors", "counter", "Errors reported by the app.", "errors"),
+    (
+        "knowella_app_duplicates",
+        "counter",
+        "Ingest requests rejected as duplicate event_ids.",
+        "duplicates",
+    ),
+    (
+        "knowella_app_partition_fallbacks",
+        "counter",
+        "Samples written to HealthSample because their partition did not exist yet.",
+        "partition_fallbacks",
+    ),
+    ("knowella_app_avg_latency_ms", "gauge", "Latest average latency (ms).", "avg_latency_ms"),
+    ("knowella_app_p95_latency_ms", "gauge", "Latest p95 latency (ms).", "p95_latency_ms"),
+    ("knowella_app_cpu_percent", "gauge", "Latest CPU usage (percent).", "cpu_percent"),
+    ("knowella_app_memory_percent", "gauge", "Latest memory usage (percent).", "memory_percent"),
+    ("knowella_app_uptime_percent", "gauge", "Latest uptime (percent).", "uptime_percent"),
+    (
+        "knowella_app_last_sample_timestamp_seconds",
+        "gauge",
+        "captured_at of the latest sample.",
+        "last_sample_ts",
+    ),
+)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class MetricsSnapshot:
+    """Latest per-app counters and gauges, updated by ingest.
+
+    A scrape copies the per-app dicts under the lock and renders without it,
+    so its cost is O(apps) and never touches the database. Counters start
+    from zero when the process starts, which Prometheus treats as a reset.
+    """
+
+    def __init__(self):
+        self._apps = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, client):
+        entry = self._apps.get(client.id)
+        if entry is None:
+            entry = self._apps[client.id] = {
+                "app": client.name,
+                "samples": 0,
+                "requests": 0,
+                "errors": 0,
+                "duplicates": 0,
+                "partition_fallbacks": 0,
+                "status": "unknown",
+            }
+        return entry
+
+    def record_sample(self, client, metric, status=None):
+        with self._lock:
+            entry = self._entry(client)
+            entry["samples"] += 1
+            entry["requests"] += metric["request_count"]
+            entry["errors"] += metric["error_count"]
+            for key in (
+                "avg_latency_ms",
+                "p95_latency_ms",
+                "cpu_percent",
+                "memory_percent",
+                "uptime_percent",
+            ):
+                entry[key] = metric[key]
+            entry["last_sample_ts"] = metric["captured_at"].timestamp()
+            if status:
+                entry["status"] = status
+
+    def record_duplicate(self, client):
+        with self._lock:
+            self._entry(client)["duplicates"] += 1
+
+    def record_partition_fallback(self, client):
+        with self._lock:
+            self._entry(client)["partition_fallbacks"] += 1
+
+    def app_count(self):
+        with self._lock:
+            return len(self._apps)
+
+    def snapshot(self):
+        with self._lock:
+            return sorted((dict(entry) for entry in self._apps.values()), key=lambda e: e["app"])
+
+    def render(self, openmetrics=True):
+        """Yield the exposition text family by family."""
+        apps = self.snapshot()
+        for family, metric_type, help_text, key in _FAMILIES:
+            name = family + "_total" if metric_type == "counter" else family
+            type_name = family if openmetrics else name
+            lines = [f"# HELP {type_name} {help_text}", f"# TYPE {type_name} {metric_type}"]
+            for entry in apps:
+                if key in entry:
+                    lines.append(
+                        f'{name}{{app="{_escape_label(entry["app"])}"}} {_format_value(entry[key])}'
+                    )
+            yield "\n".join(lines) + "\n"
+
+        lines = [
+            "# HELP knowella_app_health_state Current health status (1 for the active state).",
+            "# TYPE knowella_app_health_state gauge",
+        ]
+        for entry in apps:
+            app = _escape_label(entry["app"])
+            for state in HEALTH_STATES:
+                value = 1 if entry["status"] == state else 0
+                lines.append(f'knowella_app_health_state{{app="{app}",state="{state}"}} {value}')
+        yield "\n".join(lines) + "\n"
+
+        if openmetrics:
+            yield "# EOF\n"
@@ -0,0 +1,400 @@
+import contextvars
+import logging
+import os
+import random
+import secrets
+import socket
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from knowella.db import write_lane
+
+from .models import AppClient
+from .views import store_sample
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Samples kept for the next attempt while the database rejects writes.
+SELF_UNSENT_MAX = 10
+
+logger = logging.getLogger(__name__)
+
+
+class _Bucket:
+    def __init__(self):
+        self.requests = 0
+        self.server_errors = 0
+        self.sampled = 0
+        self.latency_ms = 0.0
+        self.overhead_ms = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.status_codes = {}
+        self.views = {}
+        self.db_queries = 0
+        self.db_time_ms = 0.0
+
+
+class _ThreadStats:
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.bucket = _Bucket()
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.time_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time_ms += (time.perf_counter() - start) * 1000.0
+
+
+# Async requests run their queries on other threads, each with its own
+# connection, so the timer travels in the context instead (sync_to_async
+# copies it) and a wrapper on every new connection picks it up.
+_async_timer = contextvars.ContextVar("telemetry_query_timer", default=None)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    timer = _async_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def _install_timed_execute(sender, connection, **kwargs):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+def _memory_percent():
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            resident_pages = int(f.read().split()[1])
+        total_pages = os.sysconf("SC_PHYS_PAGES")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+    return min(resident_pages / total_pages * 100.0, 100.0) if total_pages else 0.0
+
+
+def _p95_from_histogram(histogram, count):
+    if not count:
+        return 0.0
+    target = 0.95 * count
+    seen = 0
+    for idx, bucket_count in enumerate(histogram):
+        seen += bucket_count
+        if seen >= target:
+            # Upper bound of the bucket; the overflow bucket reports the last bound.
+            return float(LATENCY_BUCKETS_MS[min(idx, len(LATENCY_BUCKETS_MS) - 1)])
+    return float(LATENCY_BUCKETS_MS[-1])
+
+
+class SelfInstrumentationMiddleware:
+    """Report this server's own request latency, status codes and DB usage.
+
+    Each worker thread aggregates into its own bucket, so the request path
+    takes no locks. Every TELEMETRY_SELF_FLUSH_SECONDS a background thread
+    swaps the buckets out, merges them and stores a HealthSample for the
+    built-in TELEMETRY_SELF_APP_NAME client (per-view histograms, status codes
+    and DB stats go into meta). Requests never wait on that write. A failed
+    write is logged and counted, and its sample is retried on the next tick
+    (at most SELF_UNSENT_MAX are kept). Only TELEMETRY_SELF_SAMPLE_RATE of requests get
+    timing and query instrumentation; all requests are counted. If measured
+    bookkeeping cost per sampled request exceeds
+    TELEMETRY_SELF_OVERHEAD_BUDGET_MS, the sample rate is halved at the next
+    flush, and it recovers once the cost is back under half the budget.
+
+    Under ASGI with async views the middleware runs on the event loop (one
+    bucket for the loop thread).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "TELEMETRY_SELF_INSTRUMENT", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            connection_created.connect(
+                _install_timed_execute, dispatch_uid="telemetry-self-query-timer"
+            )
+        self.sample_rate = float(getattr(settings, "TELEMETRY_SELF_SAMPLE_RATE", 1.0))
+        self.effective_rate = self.sample_rate
+        self.flush_seconds = float(getattr(settings, "TELEMETRY_SELF_FLUSH_SECONDS", 60))
+        self.overhead_budget_ms = float(
+            getattr(settings, "TELEMETRY_SELF_OVERHEAD_BUDGET_MS", 0.5)
+        )
+        self.app_name = getattr(settings, "TELEMETRY_SELF_APP_NAME", "knowella-server")
+        self.host = socket.gethostname()[:64]
+
+        self._local = threading.local()
+        self._threads = []
+        self._register_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._client = None
+        self._flush_seq = 0
+        self._last_flush = time.monotonic()
+        self._last_cpu = time.process_time()
+        self._unsent = deque(maxlen=SELF_UNSENT_MAX)
+        self.failed_flushes = 0
+        self.last_error = ""
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _stats(self):
+        stats = getattr(self._local, "stats", None)
+        if stats is None:
+            # Taken once per thread; steady-state requests never lock.
+            stats = self._local.stats = _ThreadStats()
+            with self._register_lock:
+                self._threads.append(stats)
+        return stats
+
+    def _ensure_flusher(self):
+        # After a fork the thread object is copied but the thread is gone.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="telemetry-self-flusher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(max(self.flush_seconds - (time.monotonic() - self._last_flush), 0.05))
+            self._maybe_flush()
+            # Drop this thread's connection, which a failed write may have broken.
+            close_old_connections()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        self._ensure_flusher()
+        if random.random() >= self.effective_rate:
+            response = self.get_response(request)
+            self._count(response)
+        else:
+            timer = _QueryTimer()
+            start = time.perf_counter()
+            with connection.execute_wrapper(timer):
+                response = self.get_response(request)
+            self._record(request, response, (time.perf_counter() - start) * 1000.0, timer)
+        return response
+
+    async def __acall__(self, request):
+        self._ensure_flusher()
+        if random.random() >= self.effective_rate:
+            response = await self.get_response(request)
+            self._count(response)
+        else:
+            timer = _QueryTimer()
+            token = _async_timer.set(timer)
+            start = time.perf_counter()
+            try:
+                response = await self.get_response(request)
+            finally:
+                _async_timer.reset(token)
+            self._record(request, response, (time.perf_counter() - start) * 1000.0, timer)
+        return response
+
+    def _count(self, response):
+        bucket = self._stats().bucket
+        bucket.requests += 1
+        if response.status_code >= 500:
+            bucket.server_errors += 1
+
+    def _record(self, request, response, elapsed_ms, timer):
+        bookkeeping_start = time.perf_counter()
+        match = getattr(request, "resolver_match", None)
+        view_name = (match.view_name if match else "") or "unresolved"
+        status = response.status_code
+        bucket = self._stats().bucket
+        bucket.requests += 1
+        bucket.sampled += 1
+        if status >= 500:
+            bucket.server_errors += 1
+        bucket.latency_ms += elapsed_ms
+        bucket.histogram[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        bucket.status_codes[status] = bucket.status_codes.get(status, 0) + 1
+        bucket.db_queries += timer.count
+        bucket.db_time_ms += timer.time_ms
+        view = bucket.views.get(view_name)
+        if view is None:
+            view = bucket.views[view_name] = {
+                "count": 0,
+                "sum_ms": 0.0,
+                "db_queries": 0,
+                "db_time_ms": 0.0,
+                "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            }
+        view["count"] += 1
+        view["sum_ms"] += elapsed_ms
+        view["db_queries"] += timer.count
+        view["db_time_ms"] += timer.time_ms
+        view["histogram"][bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        bucket.overhead_ms += (time.perf_counter() - bookkeeping_start) * 1000.0
+
+    def _flush_due(self):
+        return time.monotonic() - self._last_flush >= self.flush_seconds
+
+    def _maybe_flush(self):
+        if not self._flush_due():
+            return
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self.flush()
+        except Exception as exc:
+            self.failed_flushes += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            logger.warning("Self-telemetry flush failed: %s", self.last_error, exc_info=True)
+        finally:
+            self._flush_lock.release()
+
+    def _collect(self):
+        merged = _Bucket()
+        with self._register_lock:
+            threads = self._threads
+            # Threaded servers may use a thread per connection; forget the
+            # ones that have exited once their last bucket is collected.
+            self._threads = [stats for stats in threads if stats.thread.is_alive()]
+        for stats in threads:
+            # Swapping the reference is atomic; an update racing the swap may
+            # land in the retired bucket and be dropped, which is acceptable.
+            bucket, stats.bucket = stats.bucket, _Bucket()
+            merged.requests += bucket.requests
+            merged.server_errors += bucket.server_errors
+            merged.sampled += bucket.sampled
+            merged.latency_ms += bucket.latency_ms
+            merged.overhead_ms += bucket.overhead_ms
+            merged.db_queries += bucket.db_queries
+            merged.db_time_ms += bucket.db_time_ms
+            for idx, count in enumerate(bucket.histogram):
+                merged.histogram[idx] += count
+            for status, count in bucket.status_codes.items():
+                merged.status_codes[status] = merged.status_codes.get(status, 0) + count
+            for name, view in bucket.views.items():
+                target = merged.views.setdefault(
+                    name,
+                    {
+                        "count": 0,
+                        "sum_ms": 0.0,
+                        "db_queries": 0,
+                        "db_time_ms": 0.0,
+                        "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                    },
+                )
+                for key in ("count", "sum_ms", "db_queries", "db_time_ms"):
+                    target[key] += view[key]
+                for idx, count in enumerate(view["histogram"]):
+                    target["histogram"][idx] += count
+        return merged
+
+    def _self_client(self):
+        if self._client is None:
+            self._client, _ = write_lane.run(
+                AppClient.objects.get_or_create,
+                name=self.app_name,
+                defaults={"api_key": secrets.token_hex(16), "secret": secrets.token_hex(32)},
+            )
+        return self._client
+
+    def _adjust_rate(self, overhead_per_request_ms):
+        if overhead_per_request_ms > self.overhead_budget_ms:
+            self.effective_rate = max(self.effective_rate / 2.0, 0.01)
+        elif overhead_per_request_ms < self.overhead_budget_ms / 2.0:
+            self.effective_rate = min(self.effective_rate * 2.0, self.sample_rate)
+
+    def flush(self):
+        """Store the interval's sample and any earlier unsent ones; raises if a write fails.
+
+        A sample whose write failed stays queued, so the caller may retry.
+        """
+        metric = self._interval_metric()
+        if metric is not None:
+            self._unsent.append(metric)
+        client = self._self_client() if self._unsent else None
+        while self._unsent:
+            store_sample(client, self._unsent[0])
+            self._unsent.popleft()
+        return metric
+
+    def _interval_metric(self):
+        now = time.monotonic()
+        wall_seconds = max(now - self._last_flush, 1e-6)
+        cpu_now = time.process_time()
+        cpu_seconds = cpu_now - self._last_cpu
+        self._last_flush = now
+        self._last_cpu = cpu_now
+
+        bucket = self._collect()
+        if not bucket.requests:
+            return None
+
+        sampled = bucket.sampled
+        overhead_per_request_ms = bucket.overhead_ms / sampled if sampled else 0.0
+        rate_used = self.effective_rate
+        self._adjust_rate(overhead_per_request_ms)
+
+        cpu_percent = cpu_seconds / wall_seconds / (os.cpu_count() or 1) * 100.0
+        self._flush_seq += 1
+        metric = {
+            "event_id": f"self-{self.host}-{os.getpid()}-{int(time.time())}-{self._flush_seq}"[:64],
+            "captured_at": timezone.now(),
+            "request_count": bucket.requests,
+            "error_count": bucket.server_errors,
+            "avg_latency_ms": round(bucket.latency_ms / sampled, 3) if sampled else 0.0,
+            "p95_latency_ms": _p95_from_histogram(bucket.histogram, sampled),
+            "cpu_percent": round(min(max(cpu_percent, 0.0), 100.0), 2),
+            "memory_percent": round(_memory_percent(), 2),
+            "uptime_percent": 100.0,
+            "env": "",
+            "region": "",
+            "host": self.host,
+            "meta": {
+                "pid": os.getpid(),
+                "interval_seconds": round(wall_seconds, 3),
+                "sample_rate": rate_used,
+                "sampled_requests": sampled,
+                "overhead_ms_per_request": round(overhead_per_request_ms, 4),
+                "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+                "status_codes": {str(k): v for k, v in sorted(bucket.status_codes.items())},
+                "db": {
+                    "queries": bucket.db_queries,
+                    "time_ms": round(bucket.db_time_ms, 3),
+                },
+                "views": {
+                    name: {
+                        "count": view["count"],
+                        "avg_ms": round(view["sum_ms"] / view["count"], 3),
+                        "db_queries": view["db_queries"],
+                        "db_time_ms": round(view["db_time_ms"], 3),
+                        "histogram": view["histogram"],
+                    }
+                    for name, view in sorted(bucket.views.items())
+                },
+            },
+        }
+        return metric
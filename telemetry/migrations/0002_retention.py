@@ -0,0 +1,59 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:39
+
+import django.db.models.deletion
+import telemetry.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetry', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('dry_run', models.BooleanField(default=False)),
+                ('samples_downsampled', models.PositiveBigIntegerField(default=0)),
+                ('samples_deleted', models.PositiveBigIntegerField(default=0)),
+                ('rollups_written', models.PositiveBigIntegerField(default=0)),
+                ('rollups_deleted', models.PositiveBigIntegerField(default=0)),
+                ('chunks', models.PositiveIntegerField(default=0)),
+                ('db_bytes_before', models.PositiveBigIntegerField(default=0)),
+                ('db_bytes_after', models.PositiveBigIntegerField(default=0)),
+                ('free_bytes_after', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='appclient',
+            name='retention_rules',
+            field=models.JSONField(default=telemetry.models.default_retention_rules),
+        ),
+        migrations.CreateModel(
+            name='HealthRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('bucket_minutes', models.PositiveIntegerField()),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('request_count', models.PositiveBigIntegerField(default=0)),
+                ('error_count', models.PositiveBigIntegerField(default=0)),
+                ('sum_avg_latency_ms', models.FloatField(default=0.0)),
+                ('sum_p95_latency_ms', models.FloatField(default=0.0)),
+                ('max_p95_latency_ms', models.FloatField(default=0.0)),
+                ('sum_cpu_percent', models.FloatField(default=0.0)),
+                ('sum_memory_percent', models.FloatField(default=0.0)),
+                ('sum_uptime_percent', models.FloatField(default=0.0)),
+                ('app', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='telemetry.appclient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket_start'], name='telemetry_h_bucket__b55d3e_idx')],
+                'constraints': [models.UniqueConstraint(fields=('app', 'bucket_minutes', 'bucket_start'), name='unique_rollup_bucket_per_app')],
+            },
+        ),
+    ]
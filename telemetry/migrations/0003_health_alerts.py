@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetry', '0002_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppHealthState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('unknown', 'Unknown'), ('healthy', 'Healthy'), ('warning', 'Warning'), ('critical', 'Critical')], default='unknown', max_length=20)),
+                ('breached_rules', models.JSONField(blank=True, default=list)),
+                ('changed_at', models.DateTimeField()),
+                ('app', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='health_state', to='telemetry.appclient')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HealthTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('unknown', 'Unknown'), ('healthy', 'Healthy'), ('warning', 'Warning'), ('critical', 'Critical')], max_length=20)),
+                ('to_status', models.CharField(choices=[('unknown', 'Unknown'), ('healthy', 'Healthy'), ('warning', 'Warning'), ('critical', 'Critical')], max_length=20)),
+                ('breached_rules', models.JSONField(blank=True, default=list)),
+                ('summary', models.JSONField(blank=True, default=dict)),
+                ('occurred_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('app', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='telemetry.appclient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['app', 'id'], name='telemetry_h_app_id_2fd904_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:44
+
+from django.db import migrations, models
+
+
+DIMENSIONS = ("env", "region", "host")
+
+
+def promote_meta_dimensions(apps, schema_editor):
+    HealthSample = apps.get_model("telemetry", "HealthSample")
+    last_id = 0
+    while True:
+        batch = list(HealthSample.objects.filter(id__gt=last_id).order_by("id")[:2000])
+        if not batch:
+            return
+        changed = []
+        for sample in batch:
+            meta = sample.meta if isinstance(sample.meta, dict) else {}
+            if not any(dim in meta for dim in DIMENSIONS):
+                continue
+            for dim in DIMENSIONS:
+                value = meta.pop(dim, "")
+                setattr(sample, dim, str(value).strip()[:64] if value is not None else "")
+            sample.meta = meta
+            changed.append(sample)
+        HealthSample.objects.bulk_update(changed, ["meta", *DIMENSIONS])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetry', '0003_health_alerts'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='healthrollup',
+            name='unique_rollup_bucket_per_app',
+        ),
+        migrations.AddField(
+            model_name='healthrollup',
+            name='env',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='healthrollup',
+            name='host',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='healthrollup',
+            name='region',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='healthsample',
+            name='env',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='healthsample',
+            name='host',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='healthsample',
+            name='region',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='healthrollup',
+            index=models.Index(fields=['app', 'region', 'bucket_start'], name='telemetry_h_app_id_9007a3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthsample',
+            index=models.Index(fields=['app', 'env', 'captured_at'], name='telemetry_h_app_id_8814d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthsample',
+            index=models.Index(fields=['app', 'region', 'captured_at'], name='telemetry_h_app_id_6c02bb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthsample',
+            index=models.Index(fields=['app', 'host', 'captured_at'], name='telemetry_h_app_id_01f547_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='healthrollup',
+            constraint=models.UniqueConstraint(fields=('app', 'bucket_minutes', 'bucket_start', 'env', 'region', 'host'), name='unique_rollup_bucket_per_app'),
+        ),
+        migrations.RunPython(promote_meta_dimensions, migrations.RunPython.noop),
+    ]
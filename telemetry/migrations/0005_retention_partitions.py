@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetry', '0004_sample_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='retentionrun',
+            name='partitions_dropped',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='retentionrun',
+            name='partitions_folded',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
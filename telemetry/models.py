@@ -12,12 +12,26 @@ def default_health_rules():
     }
 
 
+# meta keys promoted to indexed columns at ingest time.
+TELEMETRY_DIMENSIONS = ("env", "region", "host")
+DIMENSION_MAX_LENGTH = 64
+
+
+def default_retention_rules():
+    return {
+        "downsample_after_hours": 48,
+        "rollup_bucket_minutes": 60,
+        "rollup_retention_days": 90,
+    }
+
+
 class AppClient(models.Model):
     name = models.CharField(max_length=120, unique=True)
     api_key = models.CharField(max_length=64, unique=True)
     secret = models.CharField(max_length=128)
     is_active = models.BooleanField(default=True)
     health_rules = models.JSONField(default=default_health_rules)
+    retention_rules = models.JSONField(default=default_retention_rules)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -41,6 +55,9 @@ class HealthSample(models.Model):
     uptime_percent = models.FloatField(
         validators=[MinValueValidator(0.0), MaxValueValidator(100.0)]
     )
+    env = models.CharField(max_length=DIMENSION_MAX_LENGTH, blank=True, default="")
+    region = models.CharField(max_length=DIMENSION_MAX_LENGTH, blank=True, default="")
+    host = models.CharField(max_length=DIMENSION_MAX_LENGTH, blank=True, default="")
     meta = models.JSONField(default=dict, blank=True)
     received_at = models.DateTimeField(auto_now_add=True)
 
@@ -53,7 +70,99 @@ class HealthSample(models.Model):
         indexes = [
             models.Index(fields=["app", "captured_at"]),
             models.Index(fields=["captured_at"]),
+            models.Index(fields=["app", "env", "captured_at"]),
+            models.Index(fields=["app", "region", "captured_at"]),
+            models.Index(fields=["app", "host", "captured_at"]),
         ]
 
     def __str__(self):
         return f"{self.app.name} @ {self.captured_at.isoformat()}"
+
+
+class HealthRollup(models.Model):
+    # Downsampled aggregate of raw HealthSample rows for one time bucket.
+    app = models.ForeignKey(AppClient, on_delete=models.CASCADE, related_name="rollups")
+    bucket_start = models.DateTimeField()
+    bucket_minutes = models.PositiveIntegerField()
+    env = models.CharField(max_length=DIMENSION_MAX_LENGTH, blank=True, default="")
+    region = models.CharField(max_length=DIMENSION_MAX_LENGTH, blank=True, default="")
+    host = models.CharField(max_length=DIMENSION_MAX_LENGTH, blank=True, default="")
+    sample_count = models.PositiveIntegerField(default=0)
+    request_count = models.PositiveBigIntegerField(default=0)
+    error_count = models.PositiveBigIntegerField(default=0)
+    sum_avg_latency_ms = models.FloatField(default=0.0)
+    sum_p95_latency_ms = models.FloatField(default=0.0)
+    max_p95_latency_ms = models.FloatField(default=0.0)
+    sum_cpu_percent = models.FloatField(default=0.0)
+    sum_memory_percent = models.FloatField(default=0.0)
+    sum_uptime_percent = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["app", "bucket_minutes", "bucket_start", "env", "region", "host"],
+                name="unique_rollup_bucket_per_app",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["bucket_start"]),
+            models.Index(fields=["app", "region", "bucket_start"]),
+        ]
+
+    def __str__(self):
+        return f"{self.app.name} @ {self.bucket_start.isoformat()} ({self.bucket_minutes}m)"
+
+
+class RetentionRun(models.Model):
+    started_at = models.DateTimeField(auto_now_add=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
+    dry_run = models.BooleanField(default=False)
+    samples_downsampled = models.PositiveBigIntegerField(default=0)
+    samples_deleted = models.PositiveBigIntegerField(default=0)
+    rollups_written = models.PositiveBigIntegerField(default=0)
+    rollups_deleted = models.PositiveBigIntegerField(default=0)
+    chunks = models.PositiveIntegerField(default=0)
+    db_bytes_before = models.PositiveBigIntegerField(default=0)
+    db_bytes_after = models.PositiveBigIntegerField(default=0)
+    free_bytes_after = models.PositiveBigIntegerField(default=0)
+    partitions_folded = models.JSONField(default=list, blank=True)
+    partitions_dropped = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"retention run @ {self.started_at.isoformat()}"
+
+
+HEALTH_STATUS_CHOICES = [
+    ("unknown", "Unknown"),
+    ("healthy", "Healthy"),
+    ("warning", "Warning"),
+    ("critical", "Critical"),
+]
+
+
+class AppHealthState(models.Model):
+    app = models.OneToOneField(AppClient, on_delete=models.CASCADE, related_name="health_state")
+    status = models.CharField(max_length=20, choices=HEALTH_STATUS_CHOICES, default="unknown")
+    breached_rules = models.JSONField(default=list, blank=True)
+    changed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.app.name}: {self.status}"
+
+
+class HealthTransition(models.Model):
+    app = models.ForeignKey(AppClient, on_delete=models.CASCADE, related_name="transitions")
+    from_status = models.CharField(max_length=20, choices=HEALTH_STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=HEALTH_STATUS_CHOICES)
+    breached_rules = models.JSONField(default=list, blank=True)
+    summary = models.JSONField(default=dict, blank=True)
+    occurred_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["app", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.app.name}: {self.from_status} -> {self.to_status}"
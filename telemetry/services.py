@@ -0,0 +1,434 @@
+import hashlib
+import hmac
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from knowella.db import write_lane
+
+from .models import (
+    AppClient,
+    HealthRollup,
+    HealthSample,
+    RetentionRun,
+    TELEMETRY_DIMENSIONS,
+    default_health_rules,
+    default_retention_rules,
+)
+from .storage import get_storage
+
+# Signed requests (telemetry ingest, hot-topics engagement) are accepted
+# within this many seconds of "now" on either side.
+ALLOWED_CLOCK_SKEW_SECONDS = 300
+# API key -> AppClient lookups, cached per process. Kept out of the shared
+# default cache because clients carry their secret. Saving or deleting an
+# AppClient clears it; other processes see the change within the TTL.
+CLIENT_CACHE_ALIAS = "telemetry-clients"
+CLIENT_CACHE_TTL_SECONDS = 5
+RETENTION_CHUNK_SIZE = 500
+# Longest window health reports over. Health reads raw samples only, so raw
+# data is never downsampled before this has passed.
+MAX_LOOKBACK_MINUTES = 24 * 60
+MIN_DOWNSAMPLE_AFTER_HOURS = MAX_LOOKBACK_MINUTES // 60
+
+_ROLLUP_SOURCE_FIELDS = (
+    "id",
+    "captured_at",
+    "request_count",
+    "error_count",
+    "avg_latency_ms",
+    "p95_latency_ms",
+    "cpu_percent",
+    "memory_percent",
+    "uptime_percent",
+    *TELEMETRY_DIMENSIONS,
+)
+
+_ROLLUP_AGGREGATE_FIELDS = (
+    "sample_count",
+    "request_count",
+    "error_count",
+    "sum_avg_latency_ms",
+    "sum_p95_latency_ms",
+    "max_p95_latency_ms",
+    "sum_cpu_percent",
+    "sum_memory_percent",
+    "sum_uptime_percent",
+)
+
+
+def sign_payload(secret, timestamp, raw_body):
+    """HMAC-SHA256 hex digest that ingest expects in X-Signature.
+
+    The MAC covers "<timestamp>." followed by the body bytes exactly as sent
+    (compressed or binary bodies included), so no decode/re-encode is needed.
+    """
+    mac = hmac.new(secret.encode("utf-8"), f"{timestamp}.".encode("ascii"), hashlib.sha256)
+    mac.update(raw_body)
+    return mac.hexdigest()
+
+
+def parse_timestamp(header_value):
+    """The X-Timestamp value as an int, or None if malformed or outside the skew window."""
+    try:
+        ts = int(header_value)
+    except (TypeError, ValueError):
+        return None
+    now_ts = int(timezone.now().timestamp())
+    if abs(now_ts - ts) > ALLOWED_CLOCK_SKEW_SECONDS:
+        return None
+    return ts
+
+
+def valid_signature(client, timestamp, raw_body, signature):
+    if not signature:
+        return False
+    expected = sign_payload(client.secret, timestamp, raw_body)
+    return hmac.compare_digest(expected, signature)
+
+
+def _client_cache_key(api_key):
+    return "client:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def client_for_api_key(api_key):
+    """Active AppClient for ``api_key``, or None."""
+    if not api_key:
+        return None
+    clients = caches[CLIENT_CACHE_ALIAS]
+    cache_key = _client_cache_key(api_key)
+    client = clients.get(cache_key)
+    if client is not None:
+        return client
+    try:
+        client = AppClient.objects.get(api_key=api_key, is_active=True)
+    except AppClient.DoesNotExist:
+        return None
+    clients.set(cache_key, client, CLIENT_CACHE_TTL_SECONDS)
+    return client
+
+
+async def aclient_for_api_key(api_key):
+    if not api_key:
+        return None
+    clients = caches[CLIENT_CACHE_ALIAS]
+    cache_key = _client_cache_key(api_key)
+    client = await clients.aget(cache_key)
+    if client is not None:
+        return client
+    try:
+        client = await AppClient.objects.aget(api_key=api_key, is_active=True)
+    except AppClient.DoesNotExist:
+        return None
+    await clients.aset(cache_key, client, CLIENT_CACHE_TTL_SECONDS)
+    return client
+
+
+def clear_client_cache(**kwargs):
+    """post_save/post_delete receiver for AppClient (see TelemetryConfig.ready)."""
+    caches[CLIENT_CACHE_ALIAS].clear()
+
+
+def authenticate_signed(request):
+    """Check a request signed the way ingest expects.
+
+    Returns (client, None) on success, else (None, the reason to send with a 401).
+    """
+    client = client_for_api_key(request.headers.get("X-API-Key", "").strip())
+    if client is None:
+        return None, "Invalid API key"
+    timestamp = parse_timestamp(request.headers.get("X-Timestamp"))
+    if timestamp is None:
+        return None, "Invalid or stale X-Timestamp"
+    signature = request.headers.get("X-Signature", "").strip()
+    if not valid_signature(client, timestamp, request.body, signature):
+        return None, "Bad signature"
+    return client, None
+
+
+def effective_rules(client):
+    rules = default_health_rules()
+    if isinstance(client.health_rules, dict):
+        for key, value in client.health_rules.items():
+            if key in rules:
+                try:
+                    rules[key] = float(value)
+                except (TypeError, ValueError):
+                    pass
+    return rules
+
+
+def health_status(summary, rules):
+    warning = []
+    critical = []
+
+    if summary["error_rate"] > rules["max_error_rate"]:
+        critical.append("error_rate")
+    if summary["avg_uptime_percent"] < rules["min_uptime_percent"]:
+        critical.append("uptime")
+
+    if summary["avg_p95_latency_ms"] > rules["max_p95_latency_ms"]:
+        warning.append("latency")
+    if summary["avg_cpu_percent"] > rules["max_cpu_percent"]:
+        warning.append("cpu")
+    if summary["avg_memory_percent"] > rules["max_memory_percent"]:
+        warning.append("memory")
+
+    if critical:
+        return "critical", critical + warning
+    if warning:
+        return "warning", warning
+    return "healthy", []
+
+
+def effective_retention_rules(client):
+    rules = default_retention_rules()
+    if isinstance(client.retention_rules, dict):
+        for key, value in client.retention_rules.items():
+            if key in rules:
+                try:
+                    rules[key] = max(int(value), 1)
+                except (TypeError, ValueError):
+                    pass
+    rules["downsample_after_hours"] = max(
+        rules["downsample_after_hours"], MIN_DOWNSAMPLE_AFTER_HOURS
+    )
+    return rules
+
+
+def database_size():
+    """Return (total_bytes, free_bytes) of the SQLite file, or zeros elsewhere."""
+    if connection.vendor != "sqlite":
+        return 0, 0
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA page_size")
+        page_size = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_count")
+        page_count = cursor.fetchone()[0]
+        cursor.execute("PRAGMA freelist_count")
+        free_count = cursor.fetchone()[0]
+    return page_size * page_count, page_size * free_count
+
+
+def _bucket_floor(value, bucket_minutes):
+    bucket_seconds = bucket_minutes * 60
+    epoch = int(value.timestamp())
+    floored = epoch - (epoch % bucket_seconds)
+    return datetime.fromtimestamp(floored, tz=dt_timezone.utc)
+
+
+def _keyset_chunks(qs, chunk_size, time_field):
+    # Walk (time_field, id) in index order so each chunk is a short range scan
+    # and every delete transaction stays small.
+    last = None
+    while True:
+        page = qs
+        if last is not None:
+            last_ts, last_id = last
+            page = page.filter(
+                Q(**{f"{time_field}__gt": last_ts})
+                | Q(**{time_field: last_ts, "id__gt": last_id})
+            )
+        rows = list(page.order_by(time_field, "id")[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        tail = rows[-1]
+        last = (tail[time_field], tail["id"])
+
+
+def _merge_into_rollups(client, rows, bucket_minutes):
+    # Buckets are keyed by (start, *dimensions) so rollups keep the same
+    # filter/group-by columns as raw samples.
+    buckets = {}
+    for row in rows:
+        start = _bucket_floor(row["captured_at"], bucket_minutes)
+        key = (start, *(row[dim] for dim in TELEMETRY_DIMENSIONS))
+        agg = buckets.setdefault(key, dict.fromkeys(_ROLLUP_AGGREGATE_FIELDS, 0))
+        agg["sample_count"] += 1
+        agg["request_count"] += row["request_count"]
+        agg["error_count"] += row["error_count"]
+        agg["sum_avg_latency_ms"] += row["avg_latency_ms"]
+        agg["sum_p95_latency_ms"] += row["p95_latency_ms"]
+        agg["max_p95_latency_ms"] = max(agg["max_p95_latency_ms"], row["p95_latency_ms"])
+        agg["sum_cpu_percent"] += row["cpu_percent"]
+        agg["sum_memory_percent"] += row["memory_percent"]
+        agg["sum_uptime_percent"] += row["uptime_percent"]
+
+    existing = {
+        (rollup.bucket_start, *(getattr(rollup, dim) for dim in TELEMETRY_DIMENSIONS)): rollup
+        for rollup in HealthRollup.objects.filter(
+            app=client,
+            bucket_minutes=bucket_minutes,
+            bucket_start__in={key[0] for key in buckets},
+        )
+    }
+    to_create = []
+    to_update = []
+    for key, agg in buckets.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            dims = dict(zip(TELEMETRY_DIMENSIONS, key[1:]))
+            to_create.append(
+                HealthRollup(
+                    app=client, bucket_start=key[0], bucket_minutes=bucket_minutes, **dims, **agg
+                )
+            )
+            continue
+        for field, value in agg.items():
+            if field == "max_p95_latency_ms":
+                rollup.max_p95_latency_ms = max(rollup.max_p95_latency_ms, value)
+            else:
+                setattr(rollup, field, getattr(rollup, field) + value)
+        to_update.append(rollup)
+
+    HealthRollup.objects.bulk_create(to_create)
+    if to_update:
+        HealthRollup.objects.bulk_update(to_update, _ROLLUP_AGGREGATE_FIELDS)
+    return len(to_create)
+
+
+def downsample_samples(
+    client, cutoff, bucket_minutes, chunk_size=RETENTION_CHUNK_SIZE, dry_run=False
+):
+    """Fold raw samples older than cutoff into rollups, then delete them chunk by chunk."""
+    qs = HealthSample.objects.filter(app=client, captured_at__lt=cutoff).values(
+        *_ROLLUP_SOURCE_FIELDS
+    )
+    downsampled = 0
+    rollups_written = 0
+    chunks = 0
+    for rows in _keyset_chunks(qs, chunk_size, "captured_at"):
+        chunks += 1
+        downsampled += len(rows)
+        if dry_run:
+            continue
+        with transaction.atomic():
+            rollups_written += _merge_into_rollups(client, rows, bucket_minutes)
+            HealthSample.objects.filter(id__in=[row["id"] for row in rows]).delete()
+    return {"downsampled": downsampled, "rollups_written": rollups_written, "chunks": chunks}
+
+
+def prune_rollups(client, cutoff, chunk_size=RETENTION_CHUNK_SIZE, dry_run=False):
+    qs = HealthRollup.objects.filter(app=client, bucket_start__lt=cutoff).values(
+        "id", "bucket_start"
+    )
+    deleted = 0
+    chunks = 0
+    for rows in _keyset_chunks(qs, chunk_size, "bucket_start"):
+        chunks += 1
+        deleted += len(rows)
+        if dry_run:
+            continue
+        with transaction.atomic():
+            HealthRollup.objects.filter(id__in=[row["id"] for row in rows]).delete()
+    return {"deleted": deleted, "chunks": chunks}
+
+
+def _fold_chunk(client, model, rows, bucket_minutes):
+    # The rollup writes and the delete of the folded rows commit together, so
+    # a crash mid-partition leaves only unfolded rows behind.
+    with transaction.atomic():
+        written = _merge_into_rollups(client, rows, bucket_minutes)
+        model.objects.filter(id__in=[row["id"] for row in rows]).delete()
+    return written
+
+
+def fold_and_drop_partitions(storage, run, cutoff, chunk_size=RETENTION_CHUNK_SIZE, dry_run=False):
+    """Roll up whole expired partitions, then drop their tables.
+
+    Each keyset chunk is folded and deleted in its own short write-lane
+    transaction, so ingest is never blocked behind a whole partition. The
+    DROP runs afterwards in a transaction of its own; a run that stopped in
+    between finds the partition empty and only drops it.
+    """
+    clients = {client.id: client for client in AppClient.objects.all()}
+    for suffix in storage.expired_partitions(cutoff):
+        model = storage.partition_model(suffix)
+        app_ids = model.objects.values_list("app_id", flat=True).distinct()
+        for app_id in sorted(app_ids):
+            client = clients.get(app_id)
+            if client is None:
+                continue
+            bucket_minutes = effective_retention_rules(client)["rollup_bucket_minutes"]
+            qs = model.objects.filter(app_id=app_id).values(*_ROLLUP_SOURCE_FIELDS)
+            for rows in _keyset_chunks(qs, chunk_size, "captured_at"):
+                run.chunks += 1
+                run.samples_downsampled += len(rows)
+                if dry_run:
+                    continue
+                run.rollups_written += write_lane.run(
+                    _fold_chunk, client, model, rows, bucket_minutes
+                )
+                run.samples_deleted += len(rows)
+        if dry_run:
+            continue
+        run.partitions_folded.append(suffix)
+        run.save()
+        # Rows of apps deleted since they were written have nothing to fold into.
+        run.samples_deleted += model.objects.count()
+        storage.drop_expired_partition(suffix)
+        run.partitions_dropped.append(suffix)
+        run.save()
+    return run
+
+
+def run_retention(chunk_size=RETENTION_CHUNK_SIZE, dry_run=False, vacuum=False, now=None):
+    if now is None:
+        now = timezone.now()
+    db_bytes_before, _ = database_size()
+    run = RetentionRun.objects.create(dry_run=dry_run, db_bytes_before=db_bytes_before)
+
+    for client in AppClient.objects.order_by("id"):
+        rules = effective_retention_rules(client)
+        bucket_minutes = rules["rollup_bucket_minutes"]
+        sample_cutoff = _bucket_floor(
+            now - timezone.timedelta(hours=rules["downsample_after_hours"]), bucket_minutes
+        )
+        sample_result = downsample_samples(
+            client, sample_cutoff, bucket_minutes, chunk_size=chunk_size, dry_run=dry_run
+        )
+        rollup_cutoff = now - timezone.timedelta(days=rules["rollup_retention_days"])
+        rollup_result = prune_rollups(client, rollup_cutoff, chunk_size=chunk_size, dry_run=dry_run)
+
+        run.samples_downsampled += sample_result["downsampled"]
+        run.samples_deleted += 0 if dry_run else sample_result["downsampled"]
+        run.rollups_written += sample_result["rollups_written"]
+        run.rollups_deleted += rollup_result["deleted"]
+        run.chunks += sample_result["chunks"] + rollup_result["chunks"]
+
+    storage = get_storage()
+    if storage.name == "partitioned":
+        if not dry_run:
+            # Ingest never creates tables; a sample with no partition yet
+            # lands in HealthSample.
+            storage.ensure_upcoming(now)
+        # Partitions are shared by all apps, so a table can only go once the
+        # longest raw-data policy has passed it.
+        longest_hours = max(
+            [
+                effective_retention_rules(c)["downsample_after_hours"]
+                for c in AppClient.objects.all()
+            ]
+            or [default_retention_rules()["downsample_after_hours"]]
+        )
+        fold_and_drop_partitions(
+            storage,
+            run,
+            now - timezone.timedelta(hours=longest_hours),
+            chunk_size=chunk_size,
+            dry_run=dry_run,
+        )
+
+    if vacuum and not dry_run and connection.vendor == "sqlite":
+        # Full VACUUM rewrites the file and holds an exclusive lock while it runs.
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM")
+
+    run.db_bytes_after, run.free_bytes_after = database_size()
+    run.ended_at = timezone.now()
+    run.save()
+    return run
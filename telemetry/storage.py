@@ -0,0 +1,338 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, models
+from django.db.models import Count, Max, Sum
+
+from .models import HealthSample
+
+logger = logging.getLogger(__name__)
+
+PARTITION_TABLE_PREFIX = "telemetry_healthsample_p"
+PARTITION_LIST_TTL_SECONDS = 30
+# Periods past the current one that the retention command creates up front.
+PARTITIONS_AHEAD = 1
+
+_SUM_FIELDS = {
+    "total_requests": "request_count",
+    "total_errors": "error_count",
+    "sum_avg_latency_ms": "avg_latency_ms",
+    "sum_p95_latency_ms": "p95_latency_ms",
+    "sum_cpu_percent": "cpu_percent",
+    "sum_memory_percent": "memory_percent",
+    "sum_uptime_percent": "uptime_percent",
+}
+
+
+def _window_annotations():
+    annotations = {name: Sum(field) for name, field in _SUM_FIELDS.items()}
+    annotations["sample_count"] = Count("id")
+    annotations["max_p95_latency_ms"] = Max("p95_latency_ms")
+    return annotations
+
+
+def _combine(rows, group_by):
+    """Merge per-table aggregate rows into one row per group."""
+    combined = {}
+    for row in rows:
+        key = tuple(row[dim] for dim in group_by)
+        target = combined.get(key)
+        if target is None:
+            combined[key] = dict(row)
+            continue
+        for name in (*_SUM_FIELDS, "sample_count"):
+            target[name] = (target[name] or 0) + (row[name] or 0)
+        target["max_p95_latency_ms"] = max(
+            target["max_p95_latency_ms"] or 0.0, row["max_p95_latency_ms"] or 0.0
+        )
+    return [combined[key] for key in sorted(combined)]
+
+
+class SingleTableStorage:
+    """All samples in the HealthSample table (the original layout)."""
+
+    name = "single"
+
+    def models_since(self, start):
+        return [HealthSample]
+
+    async def amodels_since(self, start):
+        return self.models_since(start)
+
+    def all_models(self):
+        return [HealthSample]
+
+    def insert(self, client, metric):
+        return HealthSample.objects.create(app=client, **metric)
+
+    def is_fallback(self, sample):
+        return False
+
+    def latest(self, client, start, filters=None):
+        for model in self.models_since(start):
+            sample = (
+                model.objects.filter(app=client, captured_at__gte=start, **(filters or {}))
+                .order_by("-captured_at")
+                .first()
+            )
+            if sample is not None:
+                return sample
+        return None
+
+    async def alatest(self, client, start, filters=None):
+        for model in await self.amodels_since(start):
+            sample = await (
+                model.objects.filter(app=client, captured_at__gte=start, **(filters or {}))
+                .order_by("-captured_at")
+                .afirst()
+            )
+            if sample is not None:
+                return sample
+        return None
+
+    def summarize(self, client, start, filters=None, group_by=()):
+        """Per-group sums/counts over the window; one dict per group."""
+        group_by = list(group_by)
+        rows = []
+        for model in self.models_since(start):
+            qs = model.objects.filter(app=client, captured_at__gte=start, **(filters or {}))
+            if group_by:
+                qs = qs.values(*group_by).annotate(**_window_annotations()).order_by(*group_by)
+                rows.extend(row for row in qs if row["sample_count"])
+            else:
+                row = qs.aggregate(**_window_annotations())
+                if row["sample_count"]:
+                    rows.append(row)
+        return _combine(rows, group_by)
+
+    async def asummarize(self, client, start, filters=None, group_by=()):
+        group_by = list(group_by)
+        rows = []
+        for model in await self.amodels_since(start):
+            qs = model.objects.filter(app=client, captured_at__gte=start, **(filters or {}))
+            if group_by:
+                qs = qs.values(*group_by).annotate(**_window_annotations()).order_by(*group_by)
+                rows.extend([row async for row in qs if row["sample_count"]])
+            else:
+                row = await qs.aaggregate(**_window_annotations())
+                if row["sample_count"]:
+                    rows.append(row)
+        return _combine(rows, group_by)
+
+    def window_values(self, client, start, *fields):
+        rows = []
+        for model in reversed(self.models_since(start)):
+            rows.extend(
+                model.objects.filter(app=client, captured_at__gte=start)
+                .order_by("captured_at")
+                .values(*fields)
+            )
+        return rows
+
+    def count(self):
+        return sum(model.objects.count() for model in self.all_models())
+
+
+class PartitionedStorage(SingleTableStorage):
+    """One table per day or ISO week, routed by captured_at.
+
+    Partition tables share HealthSample's columns and indexes and are created
+    ahead of time by the retention command (outside any transaction, as the
+    SQLite schema editor requires), never on the ingest path: a sample whose
+    partition does not exist yet goes to HealthSample (logged once per
+    partition and counted per app in the scrape). Windowed reads only touch
+    partitions whose period ends after the window start, newest first, plus
+    the original HealthSample table so data written before the switch stays
+    visible. Expiry drops whole tables.
+    event_id uniqueness is enforced per partition, and an insert into a
+    partition also checks HealthSample, where a retry may have landed before
+    the partition existed. The in-memory duplicate filter covers retries
+    that straddle a period boundary.
+    """
+
+    name = "partitioned"
+
+    def __init__(self, period="day"):
+        if period not in ("day", "week"):
+            raise ValueError("TELEMETRY_PARTITION_PERIOD must be 'day' or 'week'")
+        self.period = period
+        self._models = {}
+        self._known = None
+        self._known_at = 0.0
+        self._lock = threading.Lock()
+        self._missing_logged = set()
+
+    def period_start(self, value):
+        value = value.astimezone(dt_timezone.utc)
+        start = datetime(value.year, value.month, value.day, tzinfo=dt_timezone.utc)
+        if self.period == "week":
+            start -= timedelta(days=start.weekday())
+        return start
+
+    def period_length(self):
+        return timedelta(days=7 if self.period == "week" else 1)
+
+    def suffix_for(self, value):
+        return self.period_start(value).strftime("%Y%m%d")
+
+    def _suffix_start(self, suffix):
+        return datetime.strptime(suffix, "%Y%m%d").replace(tzinfo=dt_timezone.utc)
+
+    def _model(self, suffix):
+        model = self._models.get(suffix)
+        if model is not None:
+            return model
+        with self._lock:
+            model = self._models.get(suffix)
+            if model is None:
+                model = self._models[suffix] = self._build_model(suffix)
+        return model
+
+    def _build_model(self, suffix):
+        attrs = {
+            "__module__": __name__,
+            "id": models.BigAutoField(primary_key=True),
+        }
+        for field in HealthSample._meta.local_fields:
+            if field.primary_key:
+                continue
+            _, path, args, kwargs = field.deconstruct()
+            if field.name == "app":
+                # No reverse accessor and no FK constraint: partitions are not
+                # part of AppClient's cascade and are dropped as a whole.
+                kwargs.update(
+                    related_name="+",
+                    on_delete=models.DO_NOTHING,
+                    db_constraint=False,
+                    db_index=False,
+                )
+            attrs[field.name] = type(field)(*args, **kwargs)
+
+        meta_attrs = {
+            "app_label": "telemetry",
+            "db_table": f"{PARTITION_TABLE_PREFIX}{suffix}",
+            "managed": False,
+            "constraints": [
+                models.UniqueConstraint(
+                    fields=["app", "event_id"], name=f"tsp_{suffix}_unique_event"
+                )
+            ],
+            "indexes": [
+                models.Index(fields=index.fields, name=f"tsp_{suffix}_{idx}")
+                for idx, index in enumerate(HealthSample._meta.indexes)
+                if index.fields != ["captured_at"]
+            ],
+        }
+        attrs["Meta"] = type("Meta", (), meta_attrs)
+        return type(f"HealthSampleP{suffix}", (models.Model,), attrs)
+
+    def partitions(self, refresh=False):
+        """Sorted suffixes of partition tables that exist in the database."""
+        now = time.monotonic()
+        if refresh or self._known is None or now - self._known_at > PARTITION_LIST_TTL_SECONDS:
+            tables = connection.introspection.table_names()
+            self._known = sorted(
+                name[len(PARTITION_TABLE_PREFIX) :]
+                for name in tables
+                if name.startswith(PARTITION_TABLE_PREFIX)
+            )
+            self._known_at = now
+        return list(self._known)
+
+    def ensure_partition(self, suffix):
+        model = self._model(suffix)
+        if suffix in self.partitions():
+            return model
+        if suffix in self.partitions(refresh=True):
+            return model
+        try:
+            with connection.schema_editor() as editor:
+                editor.create_model(model)
+        except DatabaseError:
+            # Another worker created it first.
+            if suffix not in self.partitions(refresh=True):
+                raise
+        self.partitions(refresh=True)
+        return model
+
+    def models_since(self, start):
+        length = self.period_length()
+        suffixes = [
+            suffix
+            for suffix in self.partitions()
+            if self._suffix_start(suffix) + length > start
+        ]
+        return [self._model(suffix) for suffix in reversed(suffixes)] + [HealthSample]
+
+    async def amodels_since(self, start):
+        # The partition list may need an introspection query.
+        return await sync_to_async(self.models_since)(start)
+
+    def all_models(self):
+        return [self._model(suffix) for suffix in self.partitions()] + [HealthSample]
+
+    def insert(self, client, metric):
+        suffix = self.suffix_for(metric["captured_at"])
+        if suffix not in self.partitions():
+            if suffix not in self._missing_logged:
+                self._missing_logged.add(suffix)
+                logger.warning(
+                    "Telemetry partition %s does not exist; its samples go to HealthSample "
+                    "until prune_telemetry creates it",
+                    suffix,
+                )
+            return HealthSample.objects.create(app=client, **metric)
+        if HealthSample.objects.filter(app=client, event_id=metric["event_id"]).exists():
+            raise IntegrityError(f"event_id {metric['event_id']!r} already stored in HealthSample")
+        return self._model(suffix).objects.create(app=client, **metric)
+
+    def is_fallback(self, sample):
+        """True if ``sample`` went to HealthSample because its partition was missing."""
+        return isinstance(sample, HealthSample)
+
+    def ensure_upcoming(self, now, periods=PARTITIONS_AHEAD):
+        """Create the partitions for the current period and the next ``periods``."""
+        start = self.period_start(now)
+        created = []
+        for step in range(periods + 1):
+            suffix = self.suffix_for(start + step * self.period_length())
+            if suffix not in self.partitions(refresh=True):
+                self.ensure_partition(suffix)
+                created.append(suffix)
+        return created
+
+    def expired_partitions(self, cutoff):
+        length = self.period_length()
+        return [
+            suffix
+            for suffix in self.partitions(refresh=True)
+            if self._suffix_start(suffix) + length <= cutoff
+        ]
+
+    def partition_model(self, suffix):
+        return self._model(suffix)
+
+    def drop_expired_partition(self, suffix):
+        with connection.schema_editor() as editor:
+            editor.delete_model(self._model(suffix))
+        self.partitions(refresh=True)
+
+
+_storage = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        backend = getattr(settings, "TELEMETRY_STORAGE_BACKEND", "single")
+        if backend == "partitioned":
+            _storage = PartitionedStorage(getattr(settings, "TELEMETRY_PARTITION_PERIOD", "day"))
+        elif backend == "single":
+            _storage = SingleTableStorage()
+        else:
+            raise ValueError(f"Unknown TELEMETRY_STORAGE_BACKEND: {backend}")
+    return _storage
@@ -1,3 +1,209 @@
-from django.test import TestCase
+import gzip
+import json
+import time
+import uuid
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .alerts import AlertEvaluator
+from .codecs import BINARY_CONTENT_TYPE, encode_binary
+from .models import AppClient, AppHealthState, HealthTransition
+from .services import clear_client_cache, sign_payload
+from .storage import get_storage
+from .views import _coerce_payload
+
+INGEST_URL = "/telemetry/ingest/"
+HEALTH_URL = "/telemetry/health/"
+
+
+def sample_payload(**overrides):
+    payload = {
+        "event_id": uuid.uuid4().hex,
+        "request_count": 100,
+        "error_count": 1,
+        "avg_latency_ms": 120.0,
+        "p95_latency_ms": 300.0,
+        "cpu_percent": 40.0,
+        "memory_percent": 50.0,
+        "uptime_percent": 100.0,
+    }
+    payload.update(overrides)
+    return payload
+
+
+def make_client():
+    suffix = uuid.uuid4().hex
+    return AppClient.objects.create(
+        name=f"app-{suffix}", api_key=f"key-{suffix}", secret=f"secret-{suffix}"
+    )
+
+
+@override_settings(TELEMETRY_SELF_INSTRUMENT=False)
+class TelemetryTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_client_cache()
+        self.app = make_client()
+
+    def post_signed(self, raw, content_type="application/json", **headers):
+        timestamp = int(time.time())
+        return self.client.post(
+            INGEST_URL,
+            data=raw,
+            content_type=content_type,
+            HTTP_X_API_KEY=self.app.api_key,
+            HTTP_X_TIMESTAMP=str(timestamp),
+            HTTP_X_SIGNATURE=sign_payload(self.app.secret, timestamp, raw),
+            **headers,
+        )
+
+
+class IngestCodecTests(TelemetryTestCase):
+    def test_json_body_is_accepted(self):
+        response = self.post_signed(json.dumps(sample_payload()).encode("utf-8"))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.app.samples.count(), 1)
+
+    def test_gzip_body_is_accepted(self):
+        raw = gzip.compress(json.dumps(sample_payload()).encode("utf-8"))
+        response = self.post_signed(raw, HTTP_CONTENT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.app.samples.count(), 1)
+
+    def test_binary_body_is_accepted(self):
+        payload = sample_payload(meta={"env": "prod"})
+        response = self.post_signed(encode_binary(payload), content_type=BINARY_CONTENT_TYPE)
+        self.assertEqual(response.status_code, 202)
+        sample = self.app.samples.get()
+        self.assertEqual(sample.event_id, payload["event_id"])
+        self.assertEqual(sample.env, "prod")
+        self.assertAlmostEqual(sample.cpu_percent, 40.0)
+
+    def test_malformed_json_is_rejected(self):
+        response = self.post_signed(b"{not json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Body must be valid JSON")
+
+    def test_invalid_gzip_is_rejected(self):
+        response = self.post_signed(b"plain bytes", HTTP_CONTENT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 400)
+
+    def test_truncated_binary_is_rejected(self):
+        raw = encode_binary(sample_payload())[:-4]
+        response = self.post_signed(raw, content_type=BINARY_CONTENT_TYPE)
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_content_encoding_is_unsupported(self):
+        raw = json.dumps(sample_payload()).encode("utf-8")
+        response = self.post_signed(raw, HTTP_CONTENT_ENCODING="br")
+        self.assertEqual(response.status_code, 415)
+
+    def test_duplicate_event_id_conflicts(self):
+        payload = sample_payload()
+        self.assertEqual(self.post_signed(json.dumps(payload).encode("utf-8")).status_code, 202)
+        # Same event, different encoding: still the same sample.
+        raw = gzip.compress(json.dumps(payload).encode("utf-8"))
+        response = self.post_signed(raw, HTTP_CONTENT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.app.samples.count(), 1)
+
+    def test_bad_signature_is_unauthorized(self):
+        raw = json.dumps(sample_payload()).encode("utf-8")
+        response = self.client.post(
+            INGEST_URL,
+            data=raw,
+            content_type="application/json",
+            HTTP_X_API_KEY=self.app.api_key,
+            HTTP_X_TIMESTAMP=str(int(time.time())),
+            HTTP_X_SIGNATURE="0" * 64,
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class HealthConditionalTests(TelemetryTestCase):
+    def get_health(self, **headers):
+        return self.client.get(
+            HEALTH_URL, HTTP_X_API_KEY=self.app.api_key, **headers
+        )
+
+    def test_matching_etag_returns_not_modified(self):
+        first = self.get_health()
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["ETag"]
+
+        second = self.get_health(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers["ETag"], etag)
+        self.assertEqual(second.content, b"")
+
+    def test_not_modified_needs_no_queries(self):
+        etag = self.get_health().headers["ETag"]
+        with self.assertNumQueries(0):
+            response = self.get_health(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_accepted_sample_changes_etag(self):
+        etag = self.get_health().headers["ETag"]
+        response = self.post_signed(json.dumps(sample_payload()).encode("utf-8"))
+        self.assertEqual(response.status_code, 202)
+
+        response = self.get_health(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.json()["summary"]["total_requests"], 100)
+
+    def test_unknown_api_key_is_unauthorized(self):
+        response = self.client.get(HEALTH_URL, HTTP_X_API_KEY="nope")
+        self.assertEqual(response.status_code, 401)
+
+
+class AlertHysteresisTests(TestCase):
+    def setUp(self):
+        self.app = make_client()
+        # One-minute window and samples two minutes apart: each evaluation
+        # sees only the latest sample, and transitions apply at once.
+        self.evaluator = AlertEvaluator(window_minutes=1, min_duration_seconds=0)
+        self.start = timezone.now() - timedelta(seconds=30)
+        self.step = 0
+
+    def observe(self, cpu_percent):
+        metric = _coerce_payload(
+            sample_payload(
+                cpu_percent=cpu_percent,
+                captured_at=(self.start + timedelta(minutes=2 * self.step)).isoformat(),
+            )
+        )
+        self.step += 1
+        # The first observe refills the window from storage.
+        get_storage().insert(self.app, metric)
+        return self.evaluator.observe(self.app, metric)
+
+    def status(self):
+        return self.evaluator.current(self.app.id)["status"]
+
+    def test_warning_clears_only_below_relaxed_threshold(self):
+        self.assertEqual(self.observe(50).to_status, "healthy")
+
+        transition = self.observe(95)
+        self.assertEqual((transition.from_status, transition.to_status), ("healthy", "warning"))
+        self.assertEqual(transition.breached_rules, ["cpu"])
+
+        # Back under the 90% limit but above the relaxed 81%: no flap.
+        self.assertIsNone(self.observe(85))
+        self.assertEqual(self.status(), "warning")
+
+        transition = self.observe(70)
+        self.assertEqual((transition.from_status, transition.to_status), ("warning", "healthy"))
+        statuses = HealthTransition.objects.filter(app=self.app).order_by("id")
+        self.assertEqual(
+            list(statuses.values_list("to_status", flat=True)), ["healthy", "warning", "healthy"]
+        )
+        self.assertEqual(AppHealthState.objects.get(app=self.app).status, "healthy")
+
+    def test_escalation_uses_the_strict_threshold(self):
+        self.observe(50)
+        self.assertIsNone(self.observe(89))
+        self.assertEqual(self.status(), "healthy")
@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Read-only endpoints: async views under ASGI (see ASYNC_API_VIEWS).
+api = async_views if getattr(settings, "ASYNC_API_VIEWS", False) else views
 
 urlpatterns = [
     path("ingest/", views.ingest, name="telemetry_ingest"),
-    path("health/", views.health, name="telemetry_health"),
+    path("health/", api.health, name="telemetry_health"),
+    path("alerts/", api.alerts, name="telemetry_alerts"),
+    path("metrics/", views.metrics, name="telemetry_metrics"),
 ]
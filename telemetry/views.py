@@ -1,18 +1,48 @@
 import hashlib
 import hmac
-import json
+import math
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import IntegrityError
-from django.db.models import Avg, Sum
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
 from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 
-from .models import AppClient, HealthSample, default_health_rules
-
-ALLOWED_CLOCK_SKEW_SECONDS = 300
-MAX_LOOKBACK_MINUTES = 24 * 60
+from knowella.db import write_lane
+
+from .alerts import AlertEvaluator
+from .codecs import UnsupportedEncoding, decode_body
+from .dedupe import RecentEventFilter
+from .metrics import OPENMETRICS_CONTENT_TYPE, PROMETHEUS_CONTENT_TYPE, MetricsSnapshot
+from .models import (
+    DIMENSION_MAX_LENGTH,
+    TELEMETRY_DIMENSIONS,
+    AppHealthState,
+    HealthTransition,
+)
+from .services import (
+    ALLOWED_CLOCK_SKEW_SECONDS,
+    MAX_LOOKBACK_MINUTES,
+    authenticate_signed,
+    client_for_api_key,
+    effective_rules,
+    health_status,
+)
+from .storage import get_storage
+
+MAX_ALERT_EVENTS = 200
+METRICS_STREAM_MIN_APPS = 500
+HEALTH_CACHE_TTL_SECONDS = 5
+
+# A signed request is only accepted within the skew window on either side of
+# "now", so retries of the same event arrive within twice that span.
+_recent_events = RecentEventFilter(window_seconds=2 * ALLOWED_CLOCK_SKEW_SECONDS)
+_alerts = AlertEvaluator()
+_metrics = MetricsSnapshot()
 
 
 def _error(message, status=400):
@@ -20,32 +50,21 @@ def _error(message, status=400):
 
 
 def _get_client(request):
-    api_key = request.headers.get("X-API-Key", "").strip()
-    if not api_key:
-        return None
-    try:
-        return AppClient.objects.get(api_key=api_key, is_active=True)
-    except AppClient.DoesNotExist:
-        return None
+    return client_for_api_key(request.headers.get("X-API-Key", "").strip())
 
 
-def _parse_timestamp(header_value):
-    try:
-        ts = int(header_value)
-    except (TypeError, ValueError):
-        return None
-    now_ts = int(timezone.now().timestamp())
-    if abs(now_ts - ts) > ALLOWED_CLOCK_SKEW_SECONDS:
-        return None
-    return ts
+def _health_version_key(app_id):
+    return f"telemetry:health-version:{app_id}"
 
 
-def _valid_signature(client, timestamp, raw_body, signature):
-    if not signature:
-        return False
-    message = f"{timestamp}.{raw_body.decode('utf-8')}".encode("utf-8")
-    expected = hmac.new(client.secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
-    return hmac.compare_digest(expected, signature)
+def _bump_health_version(app_id):
+    key = _health_version_key(app_id)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr(); any fresh value invalidates.
+        cache.set(key, 1, None)
 
 
 def _coerce_payload(payload):
@@ -67,13 +86,27 @@ def _coerce_payload(payload):
     if not event_id:
         raise ValueError("event_id cannot be empty")
 
-    request_count = int(payload["request_count"])
-    error_count = int(payload["error_count"])
-    avg_latency_ms = float(payload["avg_latency_ms"])
-    p95_latency_ms = float(payload["p95_latency_ms"])
-    cpu_percent = float(payload["cpu_percent"])
-    memory_percent = float(payload["memory_percent"])
-    uptime_percent = float(payload["uptime_percent"])
+    try:
+        request_count = int(payload["request_count"])
+        error_count = int(payload["error_count"])
+        avg_latency_ms = float(payload["avg_latency_ms"])
+        p95_latency_ms = float(payload["p95_latency_ms"])
+        cpu_percent = float(payload["cpu_percent"])
+        memory_percent = float(payload["memory_percent"])
+        uptime_percent = float(payload["uptime_percent"])
+    except (TypeError, OverflowError):
+        # int(None), int(float("inf")) and the like.
+        raise ValueError("counts must be integers and metrics numbers") from None
+    for field_name, val in [
+        ("avg_latency_ms", avg_latency_ms),
+        ("p95_latency_ms", p95_latency_ms),
+        ("cpu_percent", cpu_percent),
+        ("memory_percent", memory_percent),
+        ("uptime_percent", uptime_percent),
+    ]:
+        # NaN passes every range comparison below.
+        if not math.isfinite(val):
+            raise ValueError(f"{field_name} must be a finite number")
     if request_count < 0 or error_count < 0:
         raise ValueError("request_count and error_count must be >= 0")
     if error_count > request_count:
@@ -90,6 +123,8 @@ def _coerce_payload(payload):
 
     captured_at_raw = payload.get("captured_at")
     if captured_at_raw:
+        if not isinstance(captured_at_raw, str):
+            raise ValueError("captured_at must be ISO-8601 datetime")
         captured_at = parse_datetime(captured_at_raw)
         if captured_at is None:
             raise ValueError("captured_at must be ISO-8601 datetime")
@@ -105,6 +140,19 @@ def _coerce_payload(payload):
     if not isinstance(meta, dict):
         raise ValueError("meta must be an object")
 
+    meta = dict(meta)
+    dimensions = {}
+    for dim in TELEMETRY_DIMENSIONS:
+        value = meta.pop(dim, "")
+        if value is None:
+            value = ""
+        if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            raise ValueError(f"meta.{dim} must be a string")
+        value = str(value).strip()
+        if len(value) > DIMENSION_MAX_LENGTH:
+            raise ValueError(f"meta.{dim} must be at most {DIMENSION_MAX_LENGTH} characters")
+        dimensions[dim] = value
+
     return {
         "event_id": event_id,
         "request_count": request_count,
@@ -116,42 +164,34 @@ def _coerce_payload(payload):
         "uptime_percent": uptime_percent,
         "captured_at": captured_at,
         "meta": meta,
+        **dimensions,
     }
 
 
-def _effective_rules(client):
-    rules = default_health_rules()
-    if isinstance(client.health_rules, dict):
-        for key, value in client.health_rules.items():
-            if key in rules:
-                try:
-                    rules[key] = float(value)
-                except (TypeError, ValueError):
-                    pass
-    return rules
-
+def store_sample(client, metric):
+    """Persist one coerced sample and feed the in-process trackers.
 
-def _health_status(summary, rules):
-    warning = []
-    critical = []
-
-    if summary["error_rate"] > rules["max_error_rate"]:
-        critical.append("error_rate")
-    if summary["avg_uptime_percent"] < rules["min_uptime_percent"]:
-        critical.append("uptime")
-
-    if summary["avg_p95_latency_ms"] > rules["max_p95_latency_ms"]:
-        warning.append("latency")
-    if summary["avg_cpu_percent"] > rules["max_cpu_percent"]:
-        warning.append("cpu")
-    if summary["avg_memory_percent"] > rules["max_memory_percent"]:
-        warning.append("memory")
+    Returns False (and stores nothing) when event_id is a duplicate for the app.
+    """
+    if _recent_events.seen(client.id, metric["event_id"]):
+        _metrics.record_duplicate(client)
+        return False
 
-    if critical:
-        return "critical", critical + warning
-    if warning:
-        return "warning", warning
-    return "healthy", []
+    storage = get_storage()
+    try:
+        sample = write_lane.run(storage.insert, client, metric)
+    except IntegrityError:
+        _recent_events.record_backstop(client.id, metric["event_id"])
+        _metrics.record_duplicate(client)
+        return False
+    _recent_events.add(client.id, metric["event_id"])
+    if storage.is_fallback(sample):
+        _metrics.record_partition_fallback(client)
+    _bump_health_version(client.id)
+    _alerts.observe(client, metric)
+    alert_state = _alerts.current(client.id)
+    _metrics.record_sample(client, metric, status=alert_state["status"] if alert_state else None)
+    return True
 
 
 @csrf_exempt
@@ -159,107 +199,269 @@ def ingest(request):
     if request.method != "POST":
         return _error("POST only", status=405)
 
-    client = _get_client(request)
+    client, reason = authenticate_signed(request)
     if client is None:
-        return _error("Invalid API key", status=401)
-
-    raw_body = request.body
-    timestamp = _parse_timestamp(request.headers.get("X-Timestamp"))
-    if timestamp is None:
-        return _error("Invalid or stale X-Timestamp", status=401)
-
-    signature = request.headers.get("X-Signature", "").strip()
-    if not _valid_signature(client, timestamp, raw_body, signature):
-        return _error("Bad signature", status=401)
+        return _error(reason, status=401)
 
     try:
-        payload = json.loads(raw_body.decode("utf-8"))
+        payload = decode_body(
+            request.body, request.content_type, request.headers.get("Content-Encoding", "")
+        )
         metric = _coerce_payload(payload)
-    except (json.JSONDecodeError, UnicodeDecodeError):
-        return _error("Body must be valid JSON")
+    except UnsupportedEncoding as exc:
+        return _error(str(exc), status=415)
     except ValueError as exc:
         return _error(str(exc))
 
-    try:
-        HealthSample.objects.create(app=client, **metric)
-    except IntegrityError:
+    if not store_sample(client, metric):
         return _error("Duplicate event_id for this app", status=409)
 
     return JsonResponse({"status": "accepted"}, status=202)
 
 
-def health(request):
-    client = _get_client(request)
-    if client is None:
-        return _error("Invalid API key", status=401)
-
+def _health_params(request):
+    """(minutes, filters, group_by) from the query string; ValueError on bad input."""
     lookback_raw = request.GET.get("minutes", "15")
     try:
         lookback_minutes = int(lookback_raw)
     except ValueError:
-        return _error("minutes must be an integer")
+        raise ValueError("minutes must be an integer") from None
     if lookback_minutes < 1 or lookback_minutes > MAX_LOOKBACK_MINUTES:
-        return _error(f"minutes must be between 1 and {MAX_LOOKBACK_MINUTES}")
+        raise ValueError(f"minutes must be between 1 and {MAX_LOOKBACK_MINUTES}")
+
+    filters = {
+        dim: request.GET[dim].strip() for dim in TELEMETRY_DIMENSIONS if dim in request.GET
+    }
+    group_by = [dim.strip() for dim in request.GET.get("group_by", "").split(",") if dim.strip()]
+    unknown = [dim for dim in group_by if dim not in TELEMETRY_DIMENSIONS]
+    if unknown:
+        raise ValueError(
+            f"group_by must be one of: {', '.join(TELEMETRY_DIMENSIONS)} (got {', '.join(unknown)})"
+        )
+    group_by = sorted(set(group_by), key=TELEMETRY_DIMENSIONS.index)
+    return lookback_minutes, filters, group_by
+
+
+def _health_cache_key(client, lookback_minutes, filters, group_by, version):
+    view_key = hashlib.sha256(
+        repr((sorted(filters.items()), group_by)).encode("utf-8")
+    ).hexdigest()[:16]
+    return f"telemetry:health:{client.id}:{lookback_minutes}:{view_key}:{version}"
+
+
+def _health_entry(body):
+    return {
+        "body": body,
+        "etag": '"%s"' % hashlib.sha256(body).hexdigest()[:32],
+        "last_modified": int(timezone.now().timestamp()),
+    }
+
+
+def health(request):
+    client = _get_client(request)
+    if client is None:
+        return _error("Invalid API key", status=401)
+    try:
+        lookback_minutes, filters, group_by = _health_params(request)
+    except ValueError as exc:
+        return _error(str(exc))
+
+    # Entries are keyed on the app's ingest version, so an accepted sample
+    # makes the old entry unreachable; the TTL bounds how long a window can
+    # drift before it is recomputed.
+    version = cache.get(_health_version_key(client.id), 0)
+    cache_key = _health_cache_key(client, lookback_minutes, filters, group_by, version)
+    entry = cache.get(cache_key)
+    if entry is None:
+        entry = _health_entry(_health_response(client, lookback_minutes, filters, group_by).content)
+        cache.set(cache_key, entry, HEALTH_CACHE_TTL_SECONDS)
+    return _health_conditional(request, entry)
+
+
+def _health_conditional(request, entry):
+    response = get_conditional_response(
+        request, etag=entry["etag"], last_modified=entry["last_modified"]
+    )
+    if response is None:
+        response = HttpResponse(entry["body"], content_type="application/json")
+    response.headers["ETag"] = entry["etag"]
+    response.headers["Last-Modified"] = http_date(entry["last_modified"])
+    patch_cache_control(response, private=True, max_age=HEALTH_CACHE_TTL_SECONDS)
+    patch_vary_headers(response, ["X-API-Key"])
+    return response
+
+
+def _summarize(agg):
+    sample_count = agg["sample_count"] or 0
+    total_requests = agg["total_requests"] or 0
+    total_errors = agg["total_errors"] or 0
+    error_rate = (total_errors / total_requests * 100.0) if total_requests else 0.0
+
+    def mean(key):
+        return round((agg[key] or 0.0) / sample_count, 2) if sample_count else 0.0
 
+    return {
+        "total_requests": total_requests,
+        "total_errors": total_errors,
+        "error_rate": round(error_rate, 2),
+        "avg_latency_ms": mean("sum_avg_latency_ms"),
+        "avg_p95_latency_ms": mean("sum_p95_latency_ms"),
+        "max_p95_latency_ms": round(agg["max_p95_latency_ms"] or 0.0, 2),
+        "avg_cpu_percent": mean("sum_cpu_percent"),
+        "avg_memory_percent": mean("sum_memory_percent"),
+        "avg_uptime_percent": mean("sum_uptime_percent"),
+    }
+
+
+def _health_response(client, lookback_minutes, filters=None, group_by=None):
+    filters = filters or {}
     window_start = timezone.now() - timezone.timedelta(minutes=lookback_minutes)
-    qs = HealthSample.objects.filter(app=client, captured_at__gte=window_start)
-    latest = qs.order_by("-captured_at").first()
+    storage = get_storage()
+    # Dimension filters hit the (app, <dimension>, captured_at) indexes.
+    latest = storage.latest(client, window_start, filters)
+    if latest is None:
+        return _health_json(client, lookback_minutes, filters)
+    totals = storage.summarize(client, window_start, filters)[0]
+    groups = storage.summarize(client, window_start, filters, group_by) if group_by else []
+    return _health_json(client, lookback_minutes, filters, group_by, latest, totals, groups)
+
 
+def _health_json(
+    client, lookback_minutes, filters, group_by=None, latest=None, totals=None, group_rows=()
+):
     if latest is None:
         return JsonResponse(
             {
                 "app": client.name,
                 "window_minutes": lookback_minutes,
+                "filters": filters,
                 "status": "unknown",
                 "message": "No telemetry in selected window",
             }
         )
 
-    agg = qs.aggregate(
-        total_requests=Sum("request_count"),
-        total_errors=Sum("error_count"),
-        avg_latency_ms=Avg("avg_latency_ms"),
-        avg_p95_latency_ms=Avg("p95_latency_ms"),
-        avg_cpu_percent=Avg("cpu_percent"),
-        avg_memory_percent=Avg("memory_percent"),
-        avg_uptime_percent=Avg("uptime_percent"),
-    )
-    total_requests = agg["total_requests"] or 0
-    total_errors = agg["total_errors"] or 0
-    error_rate = (total_errors / total_requests * 100.0) if total_requests else 0.0
+    summary = _summarize(totals)
+    rules = effective_rules(client)
+    status, breached = health_status(summary, rules)
+
+    payload = {
+        "app": client.name,
+        "window_minutes": lookback_minutes,
+        "filters": filters,
+        "status": status,
+        "breached_rules": breached,
+        "rules": rules,
+        "summary": summary,
+        "duplicate_filter": _recent_events.stats(client.id),
+        "latest": {
+            "event_id": latest.event_id,
+            "captured_at": latest.captured_at.isoformat(),
+            "request_count": latest.request_count,
+            "error_count": latest.error_count,
+            "avg_latency_ms": latest.avg_latency_ms,
+            "p95_latency_ms": latest.p95_latency_ms,
+            "cpu_percent": latest.cpu_percent,
+            "memory_percent": latest.memory_percent,
+            "uptime_percent": latest.uptime_percent,
+            **{dim: getattr(latest, dim) for dim in TELEMETRY_DIMENSIONS},
+        },
+    }
 
-    summary = {
-        "total_requests": total_requests,
-        "total_errors": total_errors,
-        "error_rate": round(error_rate, 2),
-        "avg_latency_ms": round(agg["avg_latency_ms"] or 0.0, 2),
-        "avg_p95_latency_ms": round(agg["avg_p95_latency_ms"] or 0.0, 2),
-        "avg_cpu_percent": round(agg["avg_cpu_percent"] or 0.0, 2),
-        "avg_memory_percent": round(agg["avg_memory_percent"] or 0.0, 2),
-        "avg_uptime_percent": round(agg["avg_uptime_percent"] or 0.0, 2),
+    if group_by:
+        groups = []
+        for row in group_rows:
+            group_summary = _summarize(row)
+            group_status, group_breached = health_status(group_summary, rules)
+            groups.append(
+                {
+                    **{dim: row[dim] for dim in group_by},
+                    "status": group_status,
+                    "breached_rules": group_breached,
+                    "summary": group_summary,
+                }
+            )
+        payload["group_by"] = group_by
+        payload["groups"] = groups
+
+    return JsonResponse(payload)
+
+
+def _alert_params(request):
+    """(after, limit) from the query string; ValueError on bad input."""
+    try:
+        after = int(request.GET.get("after", "0"))
+        limit = int(request.GET.get("limit", "50"))
+    except ValueError:
+        raise ValueError("after and limit must be integers") from None
+    if limit < 1 or limit > MAX_ALERT_EVENTS:
+        raise ValueError(f"limit must be between 1 and {MAX_ALERT_EVENTS}")
+    return after, limit
+
+
+def _stored_state(state):
+    # Alert state as persisted, for when this process has not evaluated the app yet.
+    return {
+        "status": state.status if state else "unknown",
+        "breached_rules": state.breached_rules if state else [],
+        "changed_at": state.changed_at.isoformat() if state else None,
+        "pending_status": None,
     }
 
-    rules = _effective_rules(client)
-    status, breached = _health_status(summary, rules)
 
+def alerts(request):
+    client = _get_client(request)
+    if client is None:
+        return _error("Invalid API key", status=401)
+    try:
+        after, limit = _alert_params(request)
+    except ValueError as exc:
+        return _error(str(exc))
+
+    current = _alerts.current(client.id)
+    if current is None:
+        current = _stored_state(AppHealthState.objects.filter(app=client).first())
+
+    events = list(
+        HealthTransition.objects.filter(app=client, id__gt=after).order_by("id")[:limit]
+    )
+    return _alerts_json(client, current, after, events)
+
+
+def _alerts_json(client, current, after, events):
     return JsonResponse(
         {
             "app": client.name,
-            "window_minutes": lookback_minutes,
-            "status": status,
-            "breached_rules": breached,
-            "rules": rules,
-            "summary": summary,
-            "latest": {
-                "event_id": latest.event_id,
-                "captured_at": latest.captured_at.isoformat(),
-                "request_count": latest.request_count,
-                "error_count": latest.error_count,
-                "avg_latency_ms": latest.avg_latency_ms,
-                "p95_latency_ms": latest.p95_latency_ms,
-                "cpu_percent": latest.cpu_percent,
-                "memory_percent": latest.memory_percent,
-                "uptime_percent": latest.uptime_percent,
-            },
+            "current": current,
+            "count": len(events),
+            "next_after": events[-1].id if events else after,
+            "events": [
+                {
+                    "id": event.id,
+                    "from_status": event.from_status,
+                    "to_status": event.to_status,
+                    "breached_rules": event.breached_rules,
+                    "summary": event.summary,
+                    "occurred_at": event.occurred_at.isoformat(),
+                }
+                for event in events
+            ],
         }
     )
+
+
+def metrics(request):
+    token = getattr(settings, "TELEMETRY_METRICS_TOKEN", "")
+    if token:
+        provided = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        # compare_digest raises TypeError on non-ASCII str; bytes always compare.
+        if not hmac.compare_digest(provided.encode(), token.encode()):
+            return _error("Invalid metrics token", status=401)
+    elif not settings.DEBUG:
+        return _error("Metrics token not configured", status=403)
+
+    openmetrics = "application/openmetrics-text" in request.headers.get("Accept", "")
+    content_type = OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE
+    chunks = _metrics.render(openmetrics=openmetrics)
+    if _metrics.app_count() >= METRICS_STREAM_MIN_APPS:
+        return StreamingHttpResponse(chunks, content_type=content_type)
+    return HttpResponse("".join(chunks), content_type=content_type)